@@ -0,0 +1,39 @@
+from typing import AsyncIterator, Awaitable, Callable, Optional, Sequence, Tuple, TypeVar
+import asyncio
+import os
+
+# Items processed at the same time for one batch request; a request may ask for fewer.
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+async def run_batch(units: Sequence[T], worker: Callable[[T], Awaitable[R]],
+                    concurrency: int = BATCH_MAX_CONCURRENCY) -> AsyncIterator[Tuple[int, Optional[R], Optional[Exception]]]:
+    """Run ``worker`` over ``units`` with at most ``concurrency`` in flight, yielding in completion order.
+
+    Yields ``(position, result, None)`` or ``(position, None, error)``; one
+    failing unit does not stop the others. A fixed pool of workers pulls units
+    one at a time, so a batch of thousands holds only ``concurrency`` tasks.
+    Closing the iterator early (e.g. the client disconnected) cancels the
+    work still in flight.
+    """
+    done: asyncio.Queue = asyncio.Queue()
+    positions = iter(range(len(units)))
+
+    async def pull() -> None:
+        for position in positions:
+            try:
+                done.put_nowait((position, await worker(units[position]), None))
+            except Exception as e:
+                done.put_nowait((position, None, e))
+
+    workers = [asyncio.create_task(pull()) for _ in range(max(1, min(concurrency, len(units))))]
+    try:
+        for _ in range(len(units)):
+            yield await done.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
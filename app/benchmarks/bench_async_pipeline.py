@@ -0,0 +1,115 @@
+"""Throughput of the async shared-client pipeline vs. the old thread-offload design.
+
+The "thread" mode reproduces the previous endpoint behaviour: every call builds a
+fresh ChatOpenAI / OpenAIModerationChain (and HTTP client) and runs the sync
+``invoke`` through ``asyncio.to_thread``. The "async" mode awaits the ``a*`` stage
+functions against the long-lived clients from llm_clients.
+
+    python benchmarks/bench_async_pipeline.py --concurrency 50 200 1000 --latency-ms 200
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from harness import fake_openai_server, format_row
+import argparse
+import asyncio
+import time
+
+GOAL = "Learn Python"
+PLAN = "Study an hour a day"
+DETAILS = [{"keyword": "Timeline", "details": "Three months"}]
+FURTHER_INFO = {"flag": False, "info_needed": []}
+FINAL_PLAN = "# Plan\n\n## Phase 1\n- Study every weekday.\n"
+
+
+# ---------- Previous design: per-call clients + thread offload ----------
+
+def _legacy_chat(base_url: str):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model_name="gpt-4o", temperature=1.0, openai_api_base=base_url)
+
+
+def legacy_stage(stage: str, base_url: str):
+    import openai
+    from langchain.chains import OpenAIModerationChain
+    from final_plan_generator import _build_messages as final_plan_messages
+    from further_info_analyzer import _build_pydantic_schema_messages, further_info_schema
+    from time_series_tasks_generator import _build_messages as time_series_messages, Tasks
+
+    if stage == "moderation":
+        chain = OpenAIModerationChain(error=False)
+        chain.client = openai.OpenAI(base_url=base_url)
+        return chain.invoke(GOAL + PLAN)
+    if stage == "further_info":
+        return _legacy_chat(base_url).invoke(
+            _build_pydantic_schema_messages(GOAL, PLAN),
+            functions=[further_info_schema], function_call={"name": "further_info_analyzer"},
+        )
+    if stage == "final_plan":
+        return _legacy_chat(base_url).invoke(final_plan_messages(GOAL, DETAILS), top_p=0.95, temperature=1.02)
+    return _legacy_chat(base_url).with_structured_output(Tasks).invoke(
+        time_series_messages(GOAL, PLAN, FURTHER_INFO, FINAL_PLAN)
+    )
+
+
+# ---------- New design: shared clients + native async ----------
+
+async def async_stage(stage: str):
+    from moderation import acheck_policy
+    from further_info_analyzer import aget_further_info_fc_pydantic_schema
+    from final_plan_generator import aget_final_plan
+    from time_series_tasks_generator import aget_time_series_data_tool_call
+
+    if stage == "moderation":
+        return await acheck_policy(GOAL, PLAN)
+    if stage == "further_info":
+        return await aget_further_info_fc_pydantic_schema(GOAL, PLAN)
+    if stage == "final_plan":
+        return await aget_final_plan(GOAL, DETAILS)
+    return await aget_time_series_data_tool_call(GOAL, PLAN, FURTHER_INFO, FINAL_PLAN)
+
+
+async def run_level(mode: str, stage: str, concurrency: int, base_url: str) -> str:
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            if mode == "thread":
+                await asyncio.to_thread(legacy_stage, stage, base_url)
+            else:
+                await async_stage(stage)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return format_row(f"{stage}/{mode}@{concurrency}", concurrency, elapsed, latencies, errors)
+
+
+async def main(args):
+    from llm_clients import ModelClients, set_clients
+    from pre_moderation import PreModerator, set_pre_moderator
+
+    with fake_openai_server(args.port, args.latency_ms) as base_url:
+        clients = ModelClients(base_url=base_url, api_key="sk-fake")
+        set_clients(clients)
+        # The legacy path has no local pre-moderation; compare upstream calls only.
+        set_pre_moderator(PreModerator(enabled=False))
+        for stage in args.stages:
+            for concurrency in args.concurrency:
+                for mode in ("thread", "async"):
+                    print(await run_level(mode, stage, concurrency, base_url), flush=True)
+        await clients.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--stages", nargs="+", default=["final_plan"],
+                        choices=["moderation", "further_info", "final_plan", "time_series"])
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--port", type=int, default=8100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,61 @@
+"""Bulk policy checks: one request per user vs. the packed batch path.
+
+Checks ``--users`` distinct goal/plan pairs three ways: sequentially (a client
+looping over /check-policy/), with unbounded concurrency, and through
+run_batch over MODERATION_BATCH_SIZE packs as /batch/check-policy does. Upstream
+moderation calls should drop by the pack size.
+
+    python benchmarks/bench_batch.py --users 1000 --concurrency 16
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from harness import fake_openai_server, fake_server_stats, reset_fake_server_stats
+import argparse
+import asyncio
+import time
+
+
+async def main(args):
+    from batching import run_batch
+    from llm_cache import ResponseCache, set_response_cache
+    from llm_clients import ModelClients, set_clients
+    from moderation import acheck_policy, acheck_policy_batch, MODERATION_BATCH_SIZE
+    from pre_moderation import PreModerator, set_pre_moderator
+
+    set_response_cache(ResponseCache([], enabled=False))
+    # Every pair goes upstream, as the comparison is about packing.
+    set_pre_moderator(PreModerator(enabled=False))
+    items = [(f"Learn skill {i}", f"Practice {i} times a week") for i in range(args.users)]
+    with fake_openai_server(args.port, args.latency_ms) as base_url:
+        clients = ModelClients(base_url=base_url, api_key="sk-fake")
+        set_clients(clients)
+
+        async def sequential():
+            for goal, plan in items:
+                await acheck_policy(goal, plan, False)
+
+        async def concurrent():
+            await asyncio.gather(*(acheck_policy(goal, plan, False) for goal, plan in items))
+
+        async def packed():
+            packs = [items[i:i + MODERATION_BATCH_SIZE] for i in range(0, len(items), MODERATION_BATCH_SIZE)]
+            async for _, _, e in run_batch(packs, lambda pack: acheck_policy_batch(pack, False), args.concurrency):
+                if e is not None:
+                    raise e
+
+        for label, run in (("one-by-one", sequential), ("concurrent", concurrent), ("batch", packed)):
+            reset_fake_server_stats(base_url)
+            started = time.perf_counter()
+            await run()
+            elapsed = time.perf_counter() - started
+            print(f"users={args.users:<6} {label:<11} upstream calls={fake_server_stats(base_url).get('moderation', 0):<6} "
+                  f"wall={elapsed * 1000:9.1f}ms", flush=True)
+        await clients.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--port", type=int, default=8100)
+    asyncio.run(main(parser.parse_args()))
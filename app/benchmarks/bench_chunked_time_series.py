@@ -0,0 +1,53 @@
+"""Latency of single-call vs. section-chunked time-series generation as plans grow.
+
+The fake OpenAI server returns one task per "##"/"###" heading in the prompt and
+adds ``--task-delay-ms`` per task, so generation time follows output size. Each
+plan has ``N`` phases of four steps; chunked latency should follow one phase,
+single-call latency the whole plan.
+
+    python benchmarks/bench_chunked_time_series.py --phases 2 4 8 16
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from harness import fake_openai_server
+import argparse
+import asyncio
+import time
+
+
+def make_plan(phases: int, steps: int = 4) -> str:
+    parts = ["# Plan", "A long plan used for benchmarking."]
+    for phase in range(1, phases + 1):
+        parts.append(f"## Phase {phase}")
+        for step in range(1, steps + 1):
+            parts.append(f"### Phase {phase} step {step}\n- Practice for 30 minutes.")
+    return "\n\n".join(parts)
+
+
+async def main(args):
+    from llm_clients import ModelClients, set_clients
+    from time_series_tasks_generator import aget_time_series_data_tool_call, aget_time_series_data_chunked
+
+    extra = ["--task-delay-ms", str(args.task_delay_ms)]
+    with fake_openai_server(args.port, args.latency_ms, *extra) as base_url:
+        clients = ModelClients(base_url=base_url, api_key="sk-fake")
+        set_clients(clients)
+        for phases in args.phases:
+            plan = make_plan(phases)
+            for label, generate in (("single", aget_time_series_data_tool_call),
+                                    ("chunked", aget_time_series_data_chunked)):
+                started = time.perf_counter()
+                tasks = await generate("Learn Python", "", {}, plan)
+                elapsed = time.perf_counter() - started
+                print(f"phases={phases:<3} {label:<8} tasks={len(tasks.tasks):<4} "
+                      f"names_consistent={tasks.tasks_name == [t.task_name for t in tasks.tasks]} "
+                      f"latency={elapsed * 1000:8.1f}ms", flush=True)
+        await clients.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phases", type=int, nargs="+", default=[2, 4, 8, 16])
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--task-delay-ms", type=float, default=150)
+    parser.add_argument("--port", type=int, default=8100)
+    asyncio.run(main(parser.parse_args()))
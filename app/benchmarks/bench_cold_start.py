@@ -0,0 +1,87 @@
+"""Cold start: import time of main and latency of the first requests of a fresh server.
+
+Imports main in ``--runs`` fresh interpreters, then starts the service
+``--runs`` times against the fake OpenAI server (real openai/LangChain client
+path) and reports, per start, when the port opened, when GET /ready first
+answered 200, and the latency of the first further-info, time-series and
+second further-info requests. Responses are not cached (X-Cache-Bypass), so
+every request reaches the model. With --wait-ready the first request is sent
+only once /ready says so, as a load balancer would.
+
+    python benchmarks/bench_cold_start.py --runs 5 --mode off
+    python benchmarks/bench_cold_start.py --runs 5 --mode background --wait-ready
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from harness import APP_DIR, fake_openai_server, _wait_for_port
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+GOAL = {"goal": "I want to learn to play the guitar in 3 months", "plan": "Practice every evening"}
+SERIES = {"user_goal": GOAL["goal"], "user_plan": GOAL["plan"], "further_info": {"info_needed": []},
+          "final_plan": "## Phase 1\n- Chords\n## Phase 2\n- Songs"}
+
+
+def import_ms() -> float:
+    code = "import time; t = time.perf_counter(); import main; print((time.perf_counter() - t) * 1000)"
+    return float(subprocess.check_output([sys.executable, "-c", code], cwd=APP_DIR, text=True).strip())
+
+
+def start(port: int, wait_ready: bool, mode: str) -> dict:
+    import httpx
+
+    data = tempfile.mkdtemp()
+    env = {**os.environ, "LLM_BACKEND": "openai", "PLAN_STORE_SQLITE_PATH": os.path.join(data, "plans.sqlite3"),
+           "SIMILAR_GOALS_SQLITE_PATH": os.path.join(data, "similar.sqlite3"), "WARMUP_MODE": mode}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env,
+    )
+    try:
+        _wait_for_port(port, process)
+        row = {"listen_s": time.perf_counter() - started, "ready_s": None}
+        base = f"http://127.0.0.1:{port}"
+        headers = {"X-Cache-Bypass": "1"}
+        with httpx.Client(base_url=base, timeout=60) as client:
+            if wait_ready:
+                while client.get("/ready").status_code != 200:
+                    time.sleep(0.01)
+                row["ready_s"] = time.perf_counter() - started
+            for name, path, body in [("first_further_info", "/get-further-info/", GOAL),
+                                     ("first_time_series", "/get-time-series/", SERIES),
+                                     ("second_further_info", "/get-further-info/", GOAL)]:
+                sent = time.perf_counter()
+                client.post(path, json=body, headers=headers).raise_for_status()
+                row[name + "_ms"] = (time.perf_counter() - sent) * 1000
+                row.setdefault("first_response_s", time.perf_counter() - started)
+        return row
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(args):
+    imports = [import_ms() for _ in range(args.runs)]
+    print(f"import main: median {statistics.median(imports):.0f}ms  (min {min(imports):.0f}, max {max(imports):.0f})")
+    with fake_openai_server(args.fake_port, args.latency_ms):
+        rows = [start(args.port, args.wait_ready, args.mode) for _ in range(args.runs)]
+    for key in rows[0]:
+        values = [row[key] for row in rows if row[key] is not None]
+        unit = "ms" if key.endswith("_ms") else "s"
+        print(f"{key:<24} " + (f"median {statistics.median(values):8.2f}{unit}" if values else "n/a"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--fake-port", type=int, default=8110)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--mode", default="background", choices=["background", "blocking", "off"], help="WARMUP_MODE of the server")
+    parser.add_argument("--wait-ready", action="store_true", help="send the first request only once /ready answers 200")
+    main(parser.parse_args())
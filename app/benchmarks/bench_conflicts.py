@@ -0,0 +1,41 @@
+"""Time-slot conflict detection latency for growing task lists.
+
+Tasks come from bench_expand_occurrences.make_tasks (every repeat type) with
+start times drawn from ``--times`` distinct half-hour slots; fewer slots means
+more tasks per slot and more candidate pairs.
+
+    python benchmarks/bench_conflicts.py --tasks 100 300 1000 --times 34 4
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from bench_expand_occurrences import make_tasks
+import argparse
+import random
+import time
+
+
+def main(args):
+    from task_conflicts import find_conflicts
+
+    for slots in args.times:
+        choices = [f"{6 + i // 2:02d}:{30 * (i % 2):02d}" for i in range(slots)]
+        for count in args.tasks:
+            tasks = make_tasks(count, args.years)
+            rng = random.Random(count)
+            for task in tasks.tasks:
+                task.time_in_day = rng.choice(choices)
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                conflicts = find_conflicts(tasks)
+                timings.append(time.perf_counter() - started)
+            print(f"tasks={count:<5} slots={slots:<3} conflicts={len(conflicts):<6} "
+                  f"best={min(timings) * 1000:7.1f}ms", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--times", type=int, nargs="+", default=[34, 4])
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,127 @@
+"""Occurrence expansion throughput: vectorized chunks vs. a per-day Python loop.
+
+Builds ``--tasks`` random tasks covering every repeat type and expands them over
+``--years``. The per-day loop is what a downstream calendar does today; it runs
+on a ``--sample`` of the tasks (and is checked against the vectorized result
+for those tasks), then its time is scaled to the full task count.
+
+    python benchmarks/bench_expand_occurrences.py --tasks 10000 --years 5
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+import argparse
+import calendar
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+WINDOW_START = date(2025, 1, 1)
+
+
+def make_tasks(count: int, years: int, seed: int = 7):
+    from time_series_tasks_generator import Tasks
+
+    rng = random.Random(seed)
+    horizon = years * 365
+    tasks = []
+    for index in range(count):
+        start = WINDOW_START + timedelta(days=rng.randrange(0, horizon // 2))
+        end = start + timedelta(days=rng.randrange(30, horizon))
+        kind = rng.choice(["Everyday", "On workday", "On Weekend", "On weekday", "On monthday", "Periodic", "Specific", "single"])
+        if kind == "single":
+            duration = {"date": start.isoformat()}
+        else:
+            schedule = {
+                "Everyday": {"periodic": 1},
+                "On workday": {"on_workday": rng.sample(range(1, 6), rng.randint(1, 5))},
+                "On Weekend": {"on_weekend": rng.sample([1, 2], rng.randint(1, 2))},
+                "On weekday": {"on_weekday": rng.sample(range(1, 8), rng.randint(1, 7))},
+                "On monthday": {"on_monthday": rng.sample(range(1, 32), rng.randint(1, 4))},
+                "Periodic": {"periodic": rng.randint(2, 30)},
+                "Specific": {"specific": [{"date": (start + timedelta(days=rng.randrange(0, 60))).isoformat()}
+                                          for _ in range(rng.randint(1, 5))]},
+            }[kind]
+            duration = {"start_date": start.isoformat(), "end_date": end.isoformat(), "repeat": kind, "schedule": schedule}
+        tasks.append({"task_name": f"Task {index}", "description": "", "task_duration": duration,
+                      "time_in_day": "08:00", "quantization": None, "notes": ""})
+    return Tasks(tasks_name=[t["task_name"] for t in tasks], tasks=tasks)
+
+
+def naive_dates(task, first: date, last: date) -> list:
+    """One Python iteration per day of the window, the way the calendar service expands tasks."""
+    duration = task.task_duration
+    if hasattr(duration, "date"):
+        day = date.fromisoformat(duration.date)
+        return [day] if first <= day <= last else []
+    start, end = date.fromisoformat(duration.start_date), date.fromisoformat(duration.end_date)
+    schedule, repeat = duration.schedule, duration.repeat.value
+    specific = {date.fromisoformat(d.date) for d in getattr(schedule, "specific", [])}
+    found = []
+    day = max(start, first)
+    while day <= min(end, last):
+        if repeat == "Everyday":
+            hit = True
+        elif hasattr(schedule, "on_workday"):
+            hit = day.isoweekday() in schedule.on_workday
+        elif hasattr(schedule, "on_weekend"):
+            hit = day.isoweekday() - 5 in schedule.on_weekend
+        elif hasattr(schedule, "on_weekday"):
+            hit = day.isoweekday() in schedule.on_weekday
+        elif hasattr(schedule, "on_monthday"):
+            last_day = calendar.monthrange(day.year, day.month)[1]
+            hit = day.day in schedule.on_monthday or (day.day == last_day and max(schedule.on_monthday) > last_day)
+        elif hasattr(schedule, "periodic"):
+            hit = (day - start).days % schedule.periodic == 0
+        else:
+            hit = day in specific
+        if hit:
+            found.append(day)
+        day += timedelta(days=1)
+    return found
+
+
+def main(args):
+    from time_series_tasks_generator import Tasks
+    from occurrence_expander import iter_occurrence_chunks, iter_occurrence_lines
+
+    tasks = make_tasks(args.tasks, args.years)
+    first, last = WINDOW_START, WINDOW_START + timedelta(days=365 * args.years - 1)
+    print(f"{args.tasks} tasks, window {first} .. {last}", flush=True)
+
+    sample = Tasks(tasks_name=tasks.tasks_name[:args.sample], tasks=tasks.tasks[:args.sample])
+    started = time.perf_counter()
+    expected = [naive_dates(task, first, last) for task in sample.tasks]
+    naive_elapsed = (time.perf_counter() - started) * args.tasks / args.sample
+    got = [[] for _ in sample.tasks]
+    for indexes, dates in iter_occurrence_chunks(sample, first.isoformat(), last.isoformat()):
+        for index, day in zip(indexes.tolist(), dates.tolist()):
+            got[index].append(day)
+    mismatches = sum(a != b for a, b in zip(expected, got))
+    print(f"per-day loop   {naive_elapsed:8.2f}s (scaled from {args.sample} tasks)  mismatches vs vectorized: {mismatches}")
+
+    started = time.perf_counter()
+    count = sum(len(dates) for _, dates in iter_occurrence_chunks(tasks, first.isoformat(), last.isoformat(), args.chunk_days))
+    elapsed = time.perf_counter() - started
+    print(f"vectorized     {elapsed:8.2f}s  occurrences={count}  ({args.chunk_days}-day chunks)")
+
+    started = time.perf_counter()
+    size = sum(len(block) for block in iter_occurrence_lines(tasks, first.isoformat(), last.isoformat()))
+    elapsed = time.perf_counter() - started
+    print(f"NDJSON stream  {elapsed:8.2f}s  {size / 2**20:.0f} MiB, {count / elapsed / 1e6:.2f}M occurrences/s")
+
+    # Separate pass: tracemalloc slows allocation-heavy code down.
+    tracemalloc.start()
+    for _ in iter_occurrence_chunks(tasks, first.isoformat(), last.isoformat(), args.chunk_days):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"peak memory while streaming {peak / 2**20:.1f} MiB vs {size / 2**20:.0f} MiB for the whole response", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--sample", type=int, default=500)
+    parser.add_argument("--chunk-days", type=int, default=92)
+    main(parser.parse_args())
@@ -0,0 +1,76 @@
+"""Final-plan latency with and without hedging, against a heavy-tailed fake model.
+
+gpt-4o answers in a log-normal around --latency-ms with a wide spread, the
+faster gpt-4o-mini tier around --fast-latency-ms. After a warm-up that fills
+the router's rolling window, the same calls run once with hedging off and once
+with it on. With --budget, each call also gets that deadline and the run
+counts how many ran out (a 504 at the endpoint).
+
+    python benchmarks/bench_hedging.py --calls 400 --latency-ms 200 --sigma 0.8
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from harness import percentile
+import argparse
+import asyncio
+import time
+
+
+async def run(calls: int, concurrency: int, hedge: bool, budget: float) -> tuple:
+    from final_plan_generator import aget_final_plan
+    from model_router import DeadlineExceeded, get_router, set_deadline
+
+    router = get_router()
+    router.hedge = hedge
+    router.counts.clear()
+    gate = asyncio.Semaphore(concurrency)
+    latencies, deadlines = [], 0
+
+    async def one(i: int) -> None:
+        nonlocal deadlines
+        async with gate:
+            set_deadline(budget or None)
+            started = time.perf_counter()
+            try:
+                await aget_final_plan(f"Learn Spanish {i}", [{"keyword": "Timeline", "details": "3 months"}])
+            except DeadlineExceeded:
+                deadlines += 1
+            latencies.append(time.perf_counter() - started)
+
+    # Each task gets its own copy of the context, so every call has its own deadline.
+    await asyncio.gather(*(asyncio.create_task(one(i)) for i in range(calls)))
+    return latencies, deadlines, dict(router.counts)
+
+
+async def main(args):
+    from fake_llm import FakeBehaviour, FakeModelClients
+    from llm_clients import set_clients
+    from model_router import ModelRouter, get_router, set_router
+    from scheduler import AdmissionScheduler, set_scheduler
+
+    behaviour = FakeBehaviour(latency_ms=args.latency_ms, latency_sigma=args.sigma, errors={},
+                              model_latency_ms={"gpt-4o-mini": args.fast_latency_ms})
+    set_clients(FakeModelClients(behaviour))
+    # Rate limits would add queueing to every sample; this measures the model latency alone.
+    set_scheduler(AdmissionScheduler({"gpt-4o": {"rpm": 10**9}, "gpt-4o-mini": {"rpm": 10**9}}))
+    set_router(ModelRouter(tiers={"default": ["gpt-4o", "gpt-4o-mini"]}, min_samples=20))
+    await run(args.warmup, args.concurrency, False, 0)
+    print(f"gpt-4o p95 after warm-up: {get_router().p95('gpt-4o', 'final_plan') * 1000:.0f}ms")
+    for hedge in (False, True):
+        latencies, deadlines, counts = await run(args.calls, args.concurrency, hedge, args.budget)
+        hedged = sum(v for (_, event), v in counts.items() if event == "hedged")
+        won = sum(v for (_, event), v in counts.items() if event == "hedge_won")
+        print(f"hedge={'on ' if hedge else 'off'}  p50={percentile(latencies, 50) * 1000:7.1f}ms  "
+              f"p95={percentile(latencies, 95) * 1000:7.1f}ms  p99={percentile(latencies, 99) * 1000:7.1f}ms  "
+              f"max={max(latencies) * 1000:7.1f}ms  hedged={hedged / args.calls:5.1%}  hedge_won={won}  deadline={deadlines}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--fast-latency-ms", type=float, default=80)
+    parser.add_argument("--sigma", type=float, default=0.8, help="log-normal spread of the fake model latency")
+    parser.add_argument("--budget", type=float, default=0, help="per-call deadline in seconds (0 = none)")
+    asyncio.run(main(parser.parse_args()))
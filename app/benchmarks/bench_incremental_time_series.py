@@ -0,0 +1,63 @@
+"""Time-series regeneration after a plan edit: one call, full chunked regeneration, incremental.
+
+Each plan has ``N`` phases; the edit rewrites ``--edited`` of them. The fake
+server adds ``--task-delay-ms`` per generated task, so generation time follows
+the amount of output. Incremental latency and upstream calls should follow the
+size of the edit, not of the plan.
+
+    python benchmarks/bench_incremental_time_series.py --phases 4 8 16 --edited 1
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from harness import fake_openai_server, fake_server_stats, reset_fake_server_stats
+from bench_chunked_time_series import make_plan
+import argparse
+import asyncio
+import time
+
+
+def edit_plan(plan: str, phases: int) -> str:
+    for phase in range(1, phases + 1):
+        plan = plan.replace(f"### Phase {phase} step 1\n- Practice for 30 minutes.",
+                            f"### Phase {phase} step 1\n- Practice for 45 minutes, then review.")
+    return plan
+
+
+async def main(args):
+    from llm_cache import ResponseCache, set_response_cache
+    from llm_clients import ModelClients, set_clients
+    from time_series_tasks_generator import aget_time_series_data_tool_call, aget_time_series_sections
+
+    set_response_cache(ResponseCache([], enabled=False))
+    extra = ["--task-delay-ms", str(args.task_delay_ms)]
+    with fake_openai_server(args.port, args.latency_ms, *extra) as base_url:
+        clients = ModelClients(base_url=base_url, api_key="sk-fake")
+        set_clients(clients)
+        for phases in args.phases:
+            plan = make_plan(phases)
+            previous, _ = await aget_time_series_sections("Learn Python", "", {}, plan)
+            edited = edit_plan(plan, args.edited)
+            reset_fake_server_stats(base_url)
+            started = time.perf_counter()
+            await aget_time_series_data_tool_call("Learn Python", "", {}, edited)
+            print(f"phases={phases:<3} edited={args.edited} {'single-call':<12} reused=0   "
+                  f"upstream calls={fake_server_stats(base_url).get('chat', 0):<3} "
+                  f"latency={(time.perf_counter() - started) * 1000:8.1f}ms", flush=True)
+            for label, reuse in (("full", None), ("incremental", previous)):
+                reset_fake_server_stats(base_url)
+                started = time.perf_counter()
+                sections, reused = await aget_time_series_sections("Learn Python", "", {}, edited, reuse)
+                elapsed = time.perf_counter() - started
+                print(f"phases={phases:<3} edited={args.edited} {label:<12} reused={reused:<3} "
+                      f"upstream calls={fake_server_stats(base_url).get('chat', 0):<3} latency={elapsed * 1000:8.1f}ms",
+                      flush=True)
+        await clients.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phases", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--edited", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--task-delay-ms", type=float, default=150)
+    parser.add_argument("--port", type=int, default=8100)
+    asyncio.run(main(parser.parse_args()))
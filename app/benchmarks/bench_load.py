@@ -0,0 +1,158 @@
+"""Concurrent load against the four planning endpoints with the fake model backend.
+
+Starts the service under uvicorn with LLM_BACKEND=fake (no network, no spend)
+and the scheduler's rate limits lifted, then sends ``--requests`` requests per
+endpoint with ``--concurrency`` in flight. Every request uses a distinct goal
+and bypasses the response cache, so each one reaches the (fake) model. Reports
+RPS, latency percentiles and resident memory per worker.
+
+Save a run as a baseline and compare later runs against it; the script exits
+with status 1 when an endpoint's RPS drops, or its p95 or memory grows, by more
+than ``--tolerance``:
+
+    python benchmarks/bench_load.py --workers 2 --save-baseline benchmarks/baselines/local.json
+    python benchmarks/bench_load.py --workers 2 --baseline benchmarks/baselines/local.json
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from harness import format_row, percentile, service_process, worker_rss_mib
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+
+ENDPOINTS = ["/check-policy/", "/get-further-info/", "/get-final-plan/", "/get-time-series/"]
+# Headroom so the scheduler never throttles the fake backend.
+UNLIMITED = {"rpm": 10 ** 9, "tpm": None}
+
+
+def request_body(endpoint: str, index: int) -> dict:
+    from fake_llm import plan_markdown
+
+    goal = f"Learn skill number {index}"
+    if endpoint in ("/check-policy/", "/get-further-info/"):
+        return {"goal": goal, "plan": "Practice a little every day"}
+    if endpoint == "/get-final-plan/":
+        return {"goal": goal, "info_needed": [{"keyword": "Timeline", "details": "Three months"}]}
+    return {"user_goal": goal, "user_plan": "", "further_info": {"info_needed": []}, "final_plan": plan_markdown(goal)}
+
+
+async def run_endpoint(client, endpoint: str, requests: int, concurrency: int, offset: int, report: bool = True) -> dict:
+    latencies, errors = [], 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for index in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json=request_body(endpoint, offset + index),
+                                             headers={"X-Cache-Bypass": "1"})
+                errors += response.status_code >= 400
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    if report:
+        print(format_row(endpoint, requests, elapsed, latencies, errors), flush=True)
+    return {
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "errors": errors,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for endpoint, current in results["endpoints"].items():
+        base = baseline["endpoints"].get(endpoint)
+        if not base:
+            continue
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint} rps {base['rps']} -> {current['rps']}")
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint} p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["max_rss_mib"] > base["max_rss_mib"] * (1 + tolerance):
+            regressions.append(f"{endpoint} rss {base['max_rss_mib']}MiB -> {current['max_rss_mib']}MiB")
+    return regressions
+
+
+async def load(args, base_url: str, pid: int) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        for number, endpoint in enumerate(args.endpoints):
+            # Warm up imports, pools and the per-worker clients before measuring.
+            await run_endpoint(client, endpoint, args.concurrency, args.concurrency,
+                               offset=-10 ** 6 * (number + 1), report=False)
+            results[endpoint] = await run_endpoint(client, endpoint, args.requests, args.concurrency, offset=10 ** 6 * number)
+            rss = worker_rss_mib(pid)
+            results[endpoint]["max_rss_mib"] = round(max(rss), 1)
+            print(f"{'':<28} rss per worker: {', '.join(f'{value:.0f}MiB' for value in rss)}", flush=True)
+    return results
+
+
+def main(args):
+    env = {
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+        "FAKE_LLM_LATENCY_SIGMA": str(args.latency_sigma),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_LLM_ERRORS": args.errors,
+        "LLM_RATE_LIMITS": json.dumps({"gpt-4o": UNLIMITED, "gpt-4o-mini": UNLIMITED, "moderation": UNLIMITED}),
+        "LLM_SCHEDULER_MAX_QUEUE": str(10 ** 6),
+        # Keep /check-policy/ on the model path instead of deciding locally.
+        "PRE_MODERATION_ENABLED": "0",
+    }
+    with service_process(args.port, args.workers, **env) as (base_url, process):
+        endpoints = asyncio.run(load(args, base_url, process.pid))
+
+    results = {
+        "config": {key: getattr(args, key) for key in ("workers", "concurrency", "requests", "latency_ms",
+                                                       "latency_sigma", "tokens_per_second", "errors")},
+        "machine": {"python": platform.python_version(), "cpus": os.cpu_count()},
+        "endpoints": endpoints,
+    }
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"] != results["config"]:
+            print("warning: the baseline was recorded with different settings", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=ENDPOINTS, choices=ENDPOINTS)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=0)
+    parser.add_argument("--errors", default="{}", help='Injected failure rates, e.g. {"rate_limit": 0.01}')
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a saved baseline and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--port", type=int, default=8000)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+"""Goodput at the upstream quota ceiling, with and without the admission scheduler.
+
+The fake OpenAI server enforces ``--rpm`` for gpt-4o and ``2 * --rpm`` for moderation over a
+short sliding window. Open-loop load arrives at ``--overload`` times the quota: moderation
+checks, plus gpt-4o traffic split into a quarter further-info analyses (high priority) and
+three quarters time-series generations (low priority). "direct" admits everything
+immediately (no local budget, the OpenAI client's own retries); "scheduled" uses the
+AdmissionScheduler with budgets that match the quota.
+
+    python benchmarks/bench_rate_limit.py --rpm 600 --duration 20 --overload 2
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from harness import fake_openai_server, fake_server_stats, percentile, reset_fake_server_stats
+import argparse
+import asyncio
+import time
+
+GOAL = "Learn Python"
+FINAL_PLAN = "# Plan\n\n## Phase 1\n- Study every weekday.\n"
+
+
+async def drive(args, stage_fn, rate: float) -> tuple:
+    latencies, failures, tasks = [], 0, []
+
+    async def one():
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            await stage_fn()
+            latencies.append(time.perf_counter() - started)
+        except Exception:
+            failures += 1
+
+    started = time.perf_counter()
+    for _ in range(int(rate * args.duration)):
+        tasks.append(asyncio.create_task(one()))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    return latencies, failures, time.perf_counter() - started
+
+
+async def run_mode(mode: str, args, base_url: str) -> None:
+    from llm_cache import ResponseCache, set_response_cache
+    from llm_clients import ModelClients, set_clients
+    from scheduler import AdmissionScheduler, set_scheduler
+    from further_info_analyzer import aget_further_info_fc_pydantic_schema
+    from moderation import acheck_policy
+    from pre_moderation import PreModerator, set_pre_moderator
+    from time_series_tasks_generator import aget_time_series_data_tool_call
+
+    set_response_cache(ResponseCache([], enabled=False))
+    set_pre_moderator(PreModerator(enabled=False))
+    if mode == "direct":
+        clients = ModelClients(base_url=base_url, api_key="sk-fake", max_retries=2)
+        unlimited = {"gpt-4o": {"rpm": 10**9}, "moderation": {"rpm": 10**9}}
+        set_scheduler(AdmissionScheduler(unlimited, max_concurrency=10**6, max_queue=10**6, retries=0))
+    else:
+        clients = ModelClients(base_url=base_url, api_key="sk-fake", max_retries=0)
+        limits = {"gpt-4o": {"rpm": args.rpm}, "moderation": {"rpm": args.rpm * 2}}
+        set_scheduler(AdmissionScheduler(limits, burst_seconds=args.window_seconds / 2, max_wait=args.max_wait))
+    set_clients(clients)
+    reset_fake_server_stats(base_url)
+
+    counter = iter(range(10**9))
+    quota = args.rpm / 60
+    results = await asyncio.gather(
+        drive(args, lambda: aget_further_info_fc_pydantic_schema(f"{GOAL} {next(counter)}", ""), quota * args.overload / 4),
+        drive(args, lambda: aget_time_series_data_tool_call(GOAL, "", {}, f"{FINAL_PLAN} {next(counter)}"),
+              quota * args.overload * 3 / 4),
+        drive(args, lambda: acheck_policy(f"{GOAL} {next(counter)}", ""), quota * 2 * args.overload),
+    )
+    elapsed = max(r[2] for r in results)
+    gpt4o_goodput = (len(results[0][0]) + len(results[1][0])) / elapsed
+    print(f"{mode}: gpt-4o goodput {gpt4o_goodput:.2f}/s (quota {quota:.2f}/s), "
+          f"moderation goodput {len(results[2][0]) / elapsed:.2f}/s (quota {quota * 2:.2f}/s), "
+          f"upstream 429s {fake_server_stats(base_url).get('rate_limited', 0)}")
+    for label, (latencies, failures, _) in zip(("further_info", "time_series", "check_policy"), results):
+        print(f"    {label:<13} ok={len(latencies):<5} failed={failures:<5} p50={percentile(latencies, 50):6.2f}s"
+              f" p95={percentile(latencies, 95):6.2f}s", flush=True)
+    await clients.aclose()
+
+
+async def main(args):
+    extra = ["--rpm", f"gpt-4o={args.rpm}", "--rpm", f"moderation={args.rpm * 2}",
+             "--window-seconds", str(args.window_seconds)]
+    with fake_openai_server(args.port, args.latency_ms, *extra) as base_url:
+        for mode in ("direct", "scheduled"):
+            await run_mode(mode, args, base_url)
+            await asyncio.sleep(args.window_seconds)  # let the server-side window drain
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--window-seconds", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--overload", type=float, default=2.0)
+    parser.add_argument("--max-wait", type=float, default=10)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--port", type=int, default=8100)
+    asyncio.run(main(parser.parse_args()))
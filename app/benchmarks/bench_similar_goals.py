@@ -0,0 +1,79 @@
+"""Near-duplicate goal index: lookup latency and reuse rate at a given size.
+
+Fills a SimilarGoalIndex with ``--entries`` synthetic goal/plan pairs, then
+looks up three kinds of queries: light edits of stored goals (dropped articles,
+case, punctuation, an extra word), the same goals with a different number, and
+unrelated goals. Edits should be reused; the other two should miss.
+
+    python benchmarks/bench_similar_goals.py --entries 100000
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from harness import percentile
+import argparse
+import random
+import time
+
+ACTIVITIES = ["learn to play the guitar", "run a marathon", "learn Spanish", "pass the bar exam", "write a novel",
+              "get a job as a data analyst", "lose weight", "learn to cook Thai food", "build a mobile app",
+              "train for a triathlon", "read more books", "learn to swim", "save for a house", "start a podcast"]
+QUALIFIERS = ["in {n} months", "by the end of the year", "before my {n}th birthday", "within {n} weeks", "this spring"]
+PLANS = ["", "Practice every morning for {n} minutes", "Take an online course and review on weekends",
+         "Join a local club and track progress in a notebook"]
+
+
+def goal(rng: random.Random, index: int) -> str:
+    n = rng.randint(2, 40)
+    text = f"I want to {rng.choice(ACTIVITIES)} {rng.choice(QUALIFIERS).format(n=n)} (goal {index})"
+    return text + "\n" + rng.choice(PLANS).format(n=n)
+
+
+def edit(rng: random.Random, text: str) -> str:
+    choice = rng.randrange(4)
+    if choice == 0:
+        return text.replace(" the ", " ", 1)
+    if choice == 1:
+        return text.upper()
+    if choice == 2:
+        return text.replace("\n", ".\n", 1)
+    return text.replace("I want to", "I really want to", 1)
+
+
+def timed_lookups(index, queries):
+    latencies, hits = [], 0
+    for query in queries:
+        started = time.perf_counter()
+        hits += index.lookup(query) is not None
+        latencies.append(time.perf_counter() - started)
+    return hits, latencies
+
+
+def main(args):
+    from similar_goals import SimilarGoalIndex
+
+    rng = random.Random(args.seed)
+    index = SimilarGoalIndex(max_entries=args.entries, threshold=args.threshold, path=None)
+    stored = [goal(rng, i) for i in range(args.entries)]
+    started = time.perf_counter()
+    for i, text in enumerate(stored):
+        index.add(text, {"flag": True, "info_needed": [], "i": i})
+    print(f"add: {(time.perf_counter() - started) / len(stored) * 1e6:.1f}us per entry ({len(index)} entries)")
+
+    samples = rng.sample(stored, args.queries)
+    kinds = {
+        "edited": [edit(rng, text) for text in samples],
+        "other number": [text.replace("(goal ", "(goal 9") for text in samples],
+        "unrelated": [f"Plan a trip to city number {i} with friends" for i in range(args.queries)],
+    }
+    for kind, queries in kinds.items():
+        hits, latencies = timed_lookups(index, queries)
+        print(f"{kind:<13} reused={hits / len(queries):6.1%}  p50={percentile(latencies, 50) * 1e6:7.1f}us  "
+              f"p99={percentile(latencies, 99) * 1e6:7.1f}us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
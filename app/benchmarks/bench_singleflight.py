@@ -0,0 +1,70 @@
+"""Upstream call count for bursts of identical requests, with and without coalescing.
+
+The response cache is disabled so every saved call comes from single-flight
+deduplication rather than from cached results.
+
+    python benchmarks/bench_singleflight.py --concurrency 1 10 100 1000
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from harness import fake_openai_server, fake_server_stats, reset_fake_server_stats
+import argparse
+import asyncio
+import time
+
+
+async def burst(concurrency: int, coalesce: bool) -> tuple:
+    import further_info_analyzer
+    import moderation
+    from singleflight import SingleFlight
+
+    if not coalesce:
+        # Skip deduplication so every call goes upstream.
+        class NoCoalescing(SingleFlight):
+            async def do(self, key, fn):
+                return await fn()
+        further_info_analyzer._further_info_flight = NoCoalescing("further_info_off")
+        moderation._moderation_flight = NoCoalescing("check_policy_off")
+    else:
+        further_info_analyzer._further_info_flight = SingleFlight("further_info")
+        moderation._moderation_flight = SingleFlight("check_policy")
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(further_info_analyzer.aget_further_info_fc_pydantic_schema("Learn Python", "Daily practice") for _ in range(concurrency)),
+        *(moderation.acheck_policy("Learn Python", "Daily practice") for _ in range(concurrency)),
+        return_exceptions=True,
+    )
+    errors = sum(isinstance(r, Exception) for r in results)
+    return time.perf_counter() - started, errors, further_info_analyzer._further_info_flight.stats()
+
+
+async def main(args):
+    from llm_cache import ResponseCache, set_response_cache
+    from llm_clients import ModelClients, set_clients
+    from pre_moderation import PreModerator, set_pre_moderator
+    import similar_goals
+
+    set_response_cache(ResponseCache([], enabled=False))
+    set_pre_moderator(PreModerator(enabled=False))
+    # The near-duplicate index would answer the repeated goal much like the cache.
+    similar_goals.SIMILAR_GOALS_ENABLED = False
+    with fake_openai_server(args.port, args.latency_ms) as base_url:
+        clients = ModelClients(base_url=base_url, api_key="sk-fake")
+        set_clients(clients)
+        for concurrency in args.concurrency:
+            for coalesce in (False, True):
+                reset_fake_server_stats(base_url)
+                elapsed, errors, stats = await burst(concurrency, coalesce)
+                upstream = fake_server_stats(base_url)
+                print(f"identical={concurrency:<5} coalescing={'on ' if coalesce else 'off'} "
+                      f"upstream chat={upstream.get('chat', 0):<5} moderation={upstream.get('moderation', 0):<5} "
+                      f"coalesced={stats['coalesced']:<5} wall={elapsed:6.2f}s errors={errors}", flush=True)
+        await clients.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--port", type=int, default=8100)
+    asyncio.run(main(parser.parse_args()))
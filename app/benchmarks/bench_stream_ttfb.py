@@ -0,0 +1,70 @@
+"""Time-to-first-byte of /get-final-plan/stream vs. the buffered /get-final-plan/.
+
+Runs the service under uvicorn against the fake OpenAI server, which waits
+``--latency-ms`` before the first token and ``--token-delay-ms`` between tokens.
+Also checks that dropping the SSE connection early cancels the upstream stream.
+
+    python benchmarks/bench_stream_ttfb.py --requests 20 --token-delay-ms 20
+"""
+import harness  # noqa: F401  (puts app/ on sys.path)
+from harness import fake_openai_server, fake_server_stats, percentile, reset_fake_server_stats, service_server
+import argparse
+import asyncio
+import time
+import httpx
+
+BODY = {"goal": "Learn Python", "info_needed": [{"keyword": "Timeline", "details": "Three months"}]}
+
+
+async def buffered(client: httpx.AsyncClient, base: str) -> tuple:
+    started = time.perf_counter()
+    response = await client.post(f"{base}/get-final-plan/", json=BODY)
+    response.raise_for_status()
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+async def streamed(client: httpx.AsyncClient, base: str, stop_after: int = 0) -> tuple:
+    started = time.perf_counter()
+    first = None
+    events = 0
+    async with client.stream("POST", f"{base}/get-final-plan/stream", json=BODY) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("data:"):
+                events += 1
+                if first is None:
+                    first = time.perf_counter() - started
+                if stop_after and events >= stop_after:
+                    break
+    return first, time.perf_counter() - started
+
+
+async def main(args):
+    extra = ["--token-delay-ms", str(args.token_delay_ms), "--plan-repeat", str(args.plan_repeat)]
+    with fake_openai_server(args.fake_port, args.latency_ms, *extra) as base_url:
+        with service_server(args.port, OPENAI_BASE_URL=base_url, OPENAI_API_KEY="sk-fake") as base:
+            async with httpx.AsyncClient(timeout=None) as client:
+                for label, fn in (("buffered", buffered), ("stream", streamed)):
+                    results = await asyncio.gather(*(fn(client, base) for _ in range(args.requests)))
+                    ttfb = [r[0] for r in results]
+                    total = [r[1] for r in results]
+                    print(f"{label:<10} ttfb p50={percentile(ttfb, 50) * 1000:7.1f}ms p95={percentile(ttfb, 95) * 1000:7.1f}ms"
+                          f"   total p50={percentile(total, 50) * 1000:7.1f}ms")
+
+                reset_fake_server_stats(base_url)
+                await asyncio.gather(*(streamed(client, base, stop_after=3) for _ in range(args.requests)))
+                await asyncio.sleep(1)
+                stats = fake_server_stats(base_url)
+                print(f"disconnect after 3 events: upstream cancelled={stats.get('stream_cancelled', 0)}"
+                      f" completed={stats.get('stream_completed', 0)} tokens_sent={stats.get('stream_tokens', 0)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Delay before the first token")
+    parser.add_argument("--token-delay-ms", type=float, default=20)
+    parser.add_argument("--plan-repeat", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--fake-port", type=int, default=8100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,247 @@
+"""A local stand-in for the OpenAI HTTP API used by the benchmarks.
+
+Serves /v1/chat/completions and /v1/moderations with a configurable delay
+(streamed completions emit one token per ``--token-delay-ms`` after the first) and
+returns payloads that validate against the service's pydantic models, so the
+real client code paths (httpx pool, openai SDK, LangChain parsing) are exercised
+without spending tokens. ``--rpm`` enforces per-model request quotas over a
+sliding window and answers 429 like the real API when they are exceeded.
+
+    python benchmarks/fake_openai_server.py --port 8100 --latency-ms 200
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from collections import Counter, defaultdict, deque
+from fastapi.responses import JSONResponse
+import argparse
+import asyncio
+import json
+import re
+import time
+import uuid
+
+FURTHER_INFO_PAYLOAD = {
+    "flag": True,
+    "info_needed": [
+        {"keyword": "Timeline", "guide": "When do you want to start and finish?", "auto_gen": "From 2025-01-01 to 2025-03-31"},
+        {"keyword": "Personality", "guide": "Describe how you like to work.", "auto_gen": "I prefer short daily sessions."},
+    ],
+}
+
+TASKS_PAYLOAD = {
+    "tasks_name": ["Buy groceries", "Practice coding algorithms"],
+    "tasks": [
+        {
+            "task_name": "Buy groceries",
+            "description": "Pick up items from the supermarket",
+            "task_duration": {"date": "2025-12-01"},
+            "time_in_day": "09:00",
+            "quantization": None,
+            "notes": "Ensure to buy fresh fruits and vegetables",
+        },
+        {
+            "task_name": "Practice coding algorithms",
+            "description": "Work on data structure and algorithm problems",
+            "task_duration": {
+                "start_date": "2025-12-01",
+                "end_date": "2026-01-31",
+                "repeat": "On Weekend",
+                "schedule": {"on_weekend": [1, 2]},
+            },
+            "time_in_day": "10:30",
+            "quantization": {"progress_start": 0, "goal": 12},
+            "notes": "Focus on graph and DP problems",
+        },
+    ],
+}
+
+PLAN_MARKDOWN = (
+    "# Plan\n\n"
+    "## Phase 1: Foundations\n- Study for 30 minutes every weekday morning.\n\n"
+    "## Phase 2: Practice\n- Solve two problems every weekend.\n"
+)
+
+app = FastAPI(title="Fake OpenAI")
+app.state.latency = 0.2
+app.state.token_delay = 0.0
+app.state.plan_repeat = 1
+app.state.task_delay = 0.0
+app.state.calls = Counter()
+app.state.rpm = {}
+app.state.window = 60.0
+app.state.recent = defaultdict(deque)
+
+
+def _completion(body: dict, message: dict, finish_reason: str = "stop") -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+        "usage": _usage(body, json.dumps(message)),
+    }
+
+
+def _usage(body: dict, output: str) -> dict:
+    # Roughly four characters per token, like scheduler.estimate_tokens.
+    prompt = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+    completion = len(output) // 4
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+def _rate_limited(model: str):
+    """Return a 429 response if ``model`` is over its quota, else record the request."""
+    limit = app.state.rpm.get(model)
+    if not limit:
+        return None
+    now = time.monotonic()
+    recent = app.state.recent[model]
+    while recent and recent[0] <= now - app.state.window:
+        recent.popleft()
+    if len(recent) >= limit * app.state.window / 60:
+        app.state.calls["rate_limited"] += 1
+        return JSONResponse(status_code=429, content={"error": {
+            "message": f"Rate limit reached for {model} on requests per min.",
+            "type": "requests", "param": None, "code": "rate_limit_exceeded",
+        }})
+    recent.append(now)
+    return None
+
+
+_SECTION_HEADING = re.compile(r"^#{2,6}\s+(.+)$", re.M)
+
+
+def _tasks_payload(body: dict) -> dict:
+    """One task per "##" heading in the prompt (so chunked generation sees distinct tasks)."""
+    prompt = body["messages"][-1]["content"] if body.get("messages") else ""
+    headings = _SECTION_HEADING.findall(prompt)
+    if not headings:
+        return TASKS_PAYLOAD
+    template = TASKS_PAYLOAD["tasks"][1]
+    tasks = [{**template, "task_name": heading.strip(), "description": f"Work on {heading.strip()}"} for heading in headings]
+    return {"tasks_name": [task["task_name"] for task in tasks], "tasks": tasks}
+
+
+def _structured_payload(name: str, body: dict) -> dict:
+    return _tasks_payload(body) if name == "Tasks" else FURTHER_INFO_PAYLOAD
+
+
+async def _output_delay(payload: dict) -> None:
+    # Generation time grows with the amount of output, approximated per task.
+    await asyncio.sleep(app.state.task_delay * len(payload.get("tasks", [])))
+
+
+async def _stream_plan(body: dict):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    tokens = (PLAN_MARKDOWN * app.state.plan_repeat).split(" ")
+    completed = False
+    try:
+        await asyncio.sleep(app.state.latency)
+        for index, token in enumerate(tokens):
+            if index:
+                await asyncio.sleep(app.state.token_delay)
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "gpt-4o"),
+                "choices": [{"index": 0, "delta": {"content": token if index == 0 else " " + token}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            app.state.calls["stream_tokens"] += 1
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "gpt-4o"), "choices": [], "usage": _usage(body, " ".join(tokens)),
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+        completed = True
+    finally:
+        app.state.calls["stream_completed" if completed else "stream_cancelled"] += 1
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    limited = _rate_limited(body.get("model", "gpt-4o"))
+    if limited is not None:
+        return limited
+    app.state.calls["chat"] += 1
+    if body.get("stream"):
+        return StreamingResponse(_stream_plan(body), media_type="text/event-stream")
+    await asyncio.sleep(app.state.latency)
+    if body.get("functions"):
+        name = body["functions"][0]["name"]
+        payload = _structured_payload(name, body)
+        await _output_delay(payload)
+        message = {"role": "assistant", "content": None,
+                   "function_call": {"name": name, "arguments": json.dumps(payload)}}
+        return _completion(body, message, "function_call")
+    if body.get("tools"):
+        name = body["tools"][0]["function"]["name"]
+        payload = _structured_payload(name, body)
+        await _output_delay(payload)
+        message = {"role": "assistant", "content": None, "tool_calls": [{
+            "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(payload)},
+        }]}
+        return _completion(body, message, "tool_calls")
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        name = response_format["json_schema"]["name"]
+        payload = _structured_payload(name, body)
+        await _output_delay(payload)
+        message = {"role": "assistant", "content": json.dumps(payload), "refusal": None}
+        return _completion(body, message)
+    content = PLAN_MARKDOWN * app.state.plan_repeat
+    await asyncio.sleep(app.state.token_delay * len(content.split(" ")))
+    return _completion(body, {"role": "assistant", "content": content, "refusal": None})
+
+
+@app.post("/v1/moderations")
+async def moderations(request: Request):
+    body = await request.json()
+    limited = _rate_limited("moderation")
+    if limited is not None:
+        return limited
+    app.state.calls["moderation"] += 1
+    await asyncio.sleep(app.state.latency)
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    return {
+        "id": f"modr-{uuid.uuid4().hex}",
+        "model": "omni-moderation-latest",
+        "results": [{"flagged": "FLAGGED" in text, "categories": {}, "category_scores": {}} for text in inputs],
+    }
+
+
+@app.get("/stats")
+async def stats():
+    return dict(app.state.calls)
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    app.state.calls.clear()
+    return {}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--token-delay-ms", type=float, default=0)
+    parser.add_argument("--plan-repeat", type=int, default=1, help="Repeat the markdown plan to lengthen it")
+    parser.add_argument("--task-delay-ms", type=float, default=0, help="Extra delay per generated task")
+    parser.add_argument("--rpm", action="append", default=[], metavar="MODEL=N",
+                        help="Requests per minute allowed for MODEL (repeatable), e.g. gpt-4o=300")
+    parser.add_argument("--window-seconds", type=float, default=60, help="Sliding window used to enforce --rpm")
+    args = parser.parse_args()
+    app.state.rpm = {model: int(n) for model, n in (item.split("=") for item in args.rpm)}
+    app.state.window = args.window_seconds
+    app.state.latency = args.latency_ms / 1000
+    app.state.token_delay = args.token_delay_ms / 1000
+    app.state.plan_repeat = args.plan_repeat
+    app.state.task_delay = args.task_delay_ms / 1000
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
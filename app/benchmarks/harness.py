@@ -0,0 +1,134 @@
+"""Shared helpers for the benchmark scripts in this directory."""
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+import os
+import sys
+import socket
+import subprocess
+import warnings
+import time
+
+# The service modules use flat imports (``from moderation import ...``), so make app/ importable.
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+# The openai SDK's parsed structured-output responses trip a harmless pydantic serializer warning.
+warnings.filterwarnings("ignore", message="Pydantic serializer warnings", category=UserWarning)
+
+
+@contextmanager
+def fake_openai_server(port: int = 8100, latency_ms: float = 200, *extra_args: str) -> Iterator[str]:
+    """Run the fake OpenAI server in a subprocess and point the clients at it.
+
+    The server gets its own process so its event loop does not compete with the
+    code under test for the GIL.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_openai_server.py")
+    process = subprocess.Popen(
+        [sys.executable, script, "--port", str(port), "--latency-ms", str(latency_ms), *extra_args]
+    )
+    base_url = f"http://127.0.0.1:{port}/v1"
+    try:
+        _wait_for_port(port, process)
+        os.environ["OPENAI_BASE_URL"] = base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextmanager
+def service_server(port: int = 8000, **env: str) -> Iterator[str]:
+    """Run the planning service (main:app) under uvicorn in a subprocess."""
+    with service_process(port, 1, **env) as (base_url, _):
+        yield base_url
+
+
+@contextmanager
+def service_process(port: int = 8000, workers: int = 1, **env: str) -> Iterator[Tuple[str, subprocess.Popen]]:
+    """Like service_server with ``workers`` uvicorn workers; also yields the server process."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--workers", str(workers)],
+        cwd=APP_DIR, env={**os.environ, **env},
+    )
+    try:
+        _wait_for_port(port, process)
+        _wait_for_ready(f"http://127.0.0.1:{port}", process)
+        yield f"http://127.0.0.1:{port}", process
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def worker_rss_mib(pid: int) -> List[float]:
+    """Resident memory of a server process, or of each of its worker children if it has any (Linux)."""
+    def children(parent: int) -> List[int]:
+        pids = []
+        for task in os.listdir(f"/proc/{parent}/task"):
+            with open(f"/proc/{parent}/task/{task}/children") as f:
+                pids += [int(p) for p in f.read().split()]
+        return pids
+
+    def rss(process_id: int) -> float:
+        with open(f"/proc/{process_id}/status") as f:
+            kib = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        return kib / 1024
+
+    def is_helper(process_id: int) -> bool:
+        with open(f"/proc/{process_id}/cmdline", "rb") as f:
+            return b"resource_tracker" in f.read()
+
+    # uvicorn --workers N runs a supervisor whose children (bar multiprocessing's resource tracker) serve requests.
+    workers = [p for p in children(pid) if not is_helper(p)]
+    return [rss(p) for p in workers] or [rss(pid)]
+
+
+def _wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"server on port {port} failed to start")
+            time.sleep(0.05)
+
+
+def _wait_for_ready(base_url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    # The service warms up in the background after it starts listening; measure it warm.
+    import httpx
+    deadline = time.monotonic() + timeout
+    while httpx.get(base_url + "/ready").status_code == 503:
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError(f"{base_url} did not become ready")
+        time.sleep(0.05)
+
+
+def fake_server_stats(base_url: str) -> dict:
+    import httpx
+    return httpx.get(base_url.removesuffix("/v1") + "/stats").json()
+
+
+def reset_fake_server_stats(base_url: str) -> None:
+    import httpx
+    httpx.post(base_url.removesuffix("/v1") + "/stats/reset")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def format_row(label: str, count: int, elapsed: float, latencies: List[float], errors: int = 0) -> str:
+    return (
+        f"{label:<28} n={count:<5} wall={elapsed:7.2f}s  rps={count / elapsed:8.1f}  "
+        f"p50={percentile(latencies, 50) * 1000:7.1f}ms  p95={percentile(latencies, 95) * 1000:7.1f}ms  "
+        f"p99={percentile(latencies, 99) * 1000:7.1f}ms  errors={errors}"
+    )
@@ -0,0 +1,203 @@
+"""Run the planning chain over a JSONL file of goals without interaction.
+
+Each input line holds ``goal``, optional ``plan`` and optional ``details``
+(the ``{"keyword", "details"}`` answers). Lines shaped like requests.jsonl
+(``request_id``, ``title``, ``body``) are read as id, goal and plan. Items
+without details are answered with the analyzer's ``auto_gen`` suggestions.
+
+Every item runs moderation -> further info -> final plan -> time series ->
+validation, ``--workers`` at a time, and its result is appended to the output
+JSONL as soon as it finishes. Finished ids are recorded in ``<output>.ckpt``;
+running the same command again skips them and retries the failed ones.
+
+    python bulk_runner.py goals.jsonl results.jsonl --workers 16
+    python bulk_runner.py goals.jsonl results.jsonl --fake-llm
+"""
+from typing import Dict, List, Set
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from moderation import acheck_policy
+from further_info_analyzer import aget_further_info_fc_pydantic_schema
+from final_plan_generator import aget_final_plan
+from time_series_tasks_generator import aget_time_series_data_tool_call
+from task_validation import avalidate_tasks, repair_further_info
+from batching import run_batch
+
+STAGES = ["check_policy", "further_info", "final_plan", "time_series", "validation"]
+
+
+class _StageFailed(Exception):
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"{type(error).__name__}: {error}")
+        self.stage = stage
+
+
+# ---------- Input / checkpoint ----------
+
+def read_items(path: str) -> List[Dict]:
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            items.append({
+                "id": str(raw.get("id") or raw.get("request_id") or number),
+                "goal": raw.get("goal") or raw.get("title", ""),
+                "plan": raw.get("plan") or raw.get("body", ""),
+                "details": raw.get("details"),
+            })
+    return items
+
+
+def _read_ids(path: str) -> Set[str]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        # A crash can leave the last line torn; only newline-terminated ids count.
+        return {line[:-1] for line in f if line.endswith("\n")}
+
+
+def resume(output: str, checkpoint: str) -> Set[str]:
+    """Ids finished by earlier runs; output lines of anything else are dropped so it is rerun cleanly."""
+    done = _read_ids(checkpoint)
+    if not os.path.exists(output):
+        return done
+    kept, dropped = [], 0
+    with open(output, encoding="utf-8") as f:
+        for line in f:
+            try:
+                finished = line.endswith("\n") and json.loads(line)["id"] in done
+            except (ValueError, KeyError):
+                finished = False
+            if finished:
+                kept.append(line)
+            else:
+                dropped += 1
+    if dropped:
+        with open(output + ".tmp", "w", encoding="utf-8") as f:
+            f.writelines(kept)
+        os.replace(output + ".tmp", output)
+    return done
+
+
+# ---------- Pipeline ----------
+
+async def _stage(timings: Dict[str, float], stage: str, coro):
+    started = time.perf_counter()
+    try:
+        return await coro
+    except Exception as e:
+        raise _StageFailed(stage, e)
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 2)
+
+
+async def run_item(item: Dict, use_cache: bool = True) -> Dict:
+    goal, plan, timings = item["goal"], item["plan"], {}
+    record = {"id": item["id"], "ok": True, "timings": timings}
+    record["compliant"] = await _stage(timings, "check_policy", acheck_policy(goal, plan, use_cache))
+    if not record["compliant"]:
+        return record
+    further_info, _ = repair_further_info(
+        await _stage(timings, "further_info", aget_further_info_fc_pydantic_schema(goal, plan, use_cache))
+    )
+    record["further_info"] = further_info.model_dump()
+    details = item["details"] or [{"keyword": i.keyword, "details": i.auto_gen} for i in further_info.info_needed]
+    record["details"] = details
+    record["final_plan"] = await _stage(timings, "final_plan", aget_final_plan(goal, details))
+    answers = {"info_needed": details}
+    tasks = await _stage(timings, "time_series",
+                         aget_time_series_data_tool_call(goal, plan, answers, record["final_plan"]))
+    tasks, report = await _stage(timings, "validation", avalidate_tasks(tasks, goal, answers, record["final_plan"]))
+    record["time_series"] = tasks.model_dump()
+    record["validation"] = report.model_dump()
+    return record
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+async def run(args) -> Dict:
+    checkpoint = args.checkpoint or args.output + ".ckpt"
+    done = resume(args.output, checkpoint) if not args.restart else set()
+    if args.restart:
+        for path in (args.output, checkpoint):
+            if os.path.exists(path):
+                os.remove(path)
+    items = [item for item in read_items(args.input) if item["id"] not in done]
+    print(f"{len(done)} items already done, {len(items)} to run", file=sys.stderr, flush=True)
+
+    latencies: Dict[str, List[float]] = {stage: [] for stage in STAGES + ["total"]}
+    ok = failed = 0
+    started = time.perf_counter()
+    with open(args.output, "a", encoding="utf-8") as out, open(checkpoint, "a", encoding="utf-8") as ckpt:
+        async for position, record, e in run_batch(items, lambda item: run_item(item, not args.no_cache), args.workers):
+            item_id = items[position]["id"]
+            if e is not None:
+                failed += 1
+                record = {"id": item_id, "ok": False, "stage": getattr(e, "stage", None), "error": str(e)}
+            else:
+                ok += 1
+                for stage, ms in record["timings"].items():
+                    latencies[stage].append(ms)
+                latencies["total"].append(sum(record["timings"].values()))
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            if e is None:
+                # Checkpoint only after the result is on disk; failed items are retried on resume.
+                ckpt.write(item_id + "\n")
+                ckpt.flush()
+            if args.progress and (ok + failed) % args.progress == 0:
+                print(f"{ok + failed}/{len(items)} done", file=sys.stderr, flush=True)
+    elapsed = time.perf_counter() - started
+
+    summary = {"items": len(items), "ok": ok, "failed": failed, "seconds": round(elapsed, 2),
+               "items_per_second": round(len(items) / elapsed, 2) if elapsed else 0.0, "stages": {}}
+    for stage, values in latencies.items():
+        if values:
+            summary["stages"][stage] = {f"p{p}": round(_percentile(values, p), 1) for p in (50, 95, 99)}
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of goals")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--workers", type=int, default=8, help="Items in flight at once")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.ckpt)")
+    parser.add_argument("--restart", action="store_true", help="Discard earlier output and checkpoint")
+    parser.add_argument("--no-cache", action="store_true", help="Skip response cache lookups")
+    parser.add_argument("--progress", type=int, default=100, help="Report progress every N items (0 to disable)")
+    parser.add_argument("--fake-llm", action="store_true",
+                        help="Use the in-process fake models from fake_llm.py instead of the network")
+    parser.add_argument("--fake-latency-ms", type=float, default=50)
+    args = parser.parse_args(argv)
+
+    async def start():
+        from llm_clients import set_clients, close_clients
+        if args.fake_llm:
+            from fake_llm import FakeBehaviour, FakeModelClients
+            set_clients(FakeModelClients(FakeBehaviour(latency_ms=args.fake_latency_ms)))
+        try:
+            return await run(args)
+        finally:
+            await close_clients()
+
+    summary = asyncio.run(start())
+
+    print(f"{summary['ok']} ok, {summary['failed']} failed in {summary['seconds']}s "
+          f"({summary['items_per_second']} items/s)")
+    for stage, pcts in summary["stages"].items():
+        print(f"  {stage:<13} " + "  ".join(f"{name}={value:8.1f}ms" for name, value in pcts.items()))
+    return 0 if not summary["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
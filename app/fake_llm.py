@@ -0,0 +1,278 @@
+"""In-process stand-in for the OpenAI models, selected with LLM_BACKEND=fake.
+
+FakeModelClients has the interface of llm_clients.ModelClients, so every module
+runs its real code path (function calling, structured output, streaming,
+scheduler, cache) against it. Responses depend only on the prompt: further-info
+calls return a valid FurtherInfoResponse, plans are markdown with
+FAKE_LLM_PLAN_PHASES phases, and Tasks carry one task per plan heading.
+Latency, streaming rate and injected errors follow the FAKE_LLM_* settings.
+"""
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import httpx
+import json
+import math
+import openai
+import os
+import random
+import re
+import time
+import uuid
+from datetime import date, timedelta
+from metrics import UsageCallback
+
+load_dotenv()
+# Median time to the first token, and the spread of a log-normal around it (0 = constant).
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+# Per-model medians overriding FAKE_LLM_LATENCY_MS, as JSON (e.g. {"gpt-4o-mini": 80}).
+FAKE_LLM_MODEL_LATENCY_MS: Dict[str, float] = json.loads(os.getenv("FAKE_LLM_MODEL_LATENCY_MS", "{}"))
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.3"))
+# Output rate after the first token; 0 returns the whole output at once.
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))
+# Probability of each injected failure per call, as JSON; kinds: rate_limit, timeout, server_error, invalid_output.
+FAKE_LLM_ERRORS: Dict[str, float] = json.loads(os.getenv("FAKE_LLM_ERRORS", "{}"))
+FAKE_LLM_PLAN_PHASES = int(os.getenv("FAKE_LLM_PLAN_PHASES", "3"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
+_START_DATE = date(2025, 1, 6)
+# Plan headings, also where a prompt label runs straight into them ("...final plan:## Phase 1").
+_HEADING = re.compile(r"(?:^|(?<=:))#{2,6}[ \t]+(.+)$", re.M)
+_REPEATS = [
+    ("Everyday", {"periodic": 1}),
+    ("On workday", {"on_workday": [1, 3, 5]}),
+    ("On Weekend", {"on_weekend": [1]}),
+    ("On weekday", {"on_weekday": [2, 4]}),
+    ("On monthday", {"on_monthday": [1, 15]}),
+    ("Periodic", {"periodic": 3}),
+]
+
+
+class FakeBehaviour:
+    """Latency and failure sampling shared by the fake models of one FakeModelClients."""
+
+    def __init__(self, latency_ms: float = FAKE_LLM_LATENCY_MS, latency_sigma: float = FAKE_LLM_LATENCY_SIGMA,
+                 tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND, errors: Optional[Dict[str, float]] = None,
+                 seed: int = FAKE_LLM_SEED, model_latency_ms: Optional[Dict[str, float]] = None):
+        self.latency_ms = latency_ms
+        self.model_latency_ms = FAKE_LLM_MODEL_LATENCY_MS if model_latency_ms is None else model_latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.errors = FAKE_LLM_ERRORS if errors is None else errors
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def first_token_delay(self, model: Optional[str] = None) -> float:
+        delay = self.model_latency_ms.get(model, self.latency_ms) / 1000
+        return delay * math.exp(self.rng.gauss(0, self.latency_sigma)) if self.latency_sigma else delay
+
+    def token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def failure(self) -> Optional[str]:
+        self.calls += 1
+        draw = self.rng.random()
+        for kind, probability in self.errors.items():
+            if draw < probability:
+                return kind
+            draw -= probability
+        return None
+
+
+def _raise(kind: str) -> None:
+    request = httpx.Request("POST", "https://fake-llm.local/v1/chat/completions")
+    if kind == "rate_limit":
+        raise openai.RateLimitError("Rate limit reached (injected)", response=httpx.Response(429, request=request), body=None)
+    if kind == "timeout":
+        raise openai.APITimeoutError(request=request)
+    if kind == "server_error":
+        raise openai.InternalServerError("Server error (injected)", response=httpx.Response(500, request=request), body=None)
+
+
+# ---------- Deterministic payloads ----------
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+def _tokens(text: str) -> int:
+    # Roughly four characters per token, like scheduler.estimate_tokens.
+    return max(1, len(text) // 4)
+
+def further_info_payload(prompt: str) -> Dict[str, Any]:
+    questions = [
+        ("Timeline", "When do you want to start and finish?", "From 2025-01-06 to 2025-03-30"),
+        ("Availability", "Which days and times can you commit?", "Weekday mornings, about 45 minutes"),
+        ("Experience", "What is your current level?", "Complete beginner"),
+        ("Personality", "Describe how you like to work.", "I prefer short daily sessions."),
+    ]
+    count = 2 + _digest(prompt) % 3
+    return {"flag": True, "info_needed": [{"keyword": k, "guide": g, "auto_gen": a} for k, g, a in questions[:count]]}
+
+def plan_markdown(prompt: str, phases: int = FAKE_LLM_PLAN_PHASES) -> str:
+    lines = ["# Plan", ""]
+    for phase in range(1, phases + 1):
+        lines += [f"## Phase {phase}", f"- Practice for {15 * (1 + (_digest(prompt) + phase) % 4)} minutes each session.",
+                  f"- Review progress at the end of week {phase * 2}.", ""]
+    return "\n".join(lines)
+
+def _task(name: str, index: int, seed: int) -> Dict[str, Any]:
+    start = _START_DATE + timedelta(days=7 * index)
+    repeat, schedule = _REPEATS[(seed + index) % len(_REPEATS)]
+    return {
+        "task_name": name,
+        "description": f"Work on {name}",
+        "task_duration": {"start_date": start.isoformat(), "end_date": (start + timedelta(days=55)).isoformat(),
+                          "repeat": repeat, "schedule": schedule},
+        "time_in_day": f"{7 + index % 12:02d}:{30 * (index % 2):02d}",
+        "quantization": {"progress_start": 0, "goal": 8},
+        "notes": "",
+    }
+
+def tasks_payload(prompt: str) -> Dict[str, Any]:
+    """One task per plan heading in the prompt (two generic tasks without headings)."""
+    names = [heading.strip() for heading in _HEADING.findall(prompt)] or ["Daily practice", "Weekly review"]
+    seed = _digest(prompt)
+    tasks = [_task(name, index, seed) for index, name in enumerate(dict.fromkeys(names))]
+    return {"tasks_name": [task["task_name"] for task in tasks], "tasks": tasks}
+
+def _structured_payload(name: str, prompt: str) -> Dict[str, Any]:
+    if name == "Tasks":
+        return tasks_payload(prompt)
+    if name == "TimeSeriesTask":
+        return _task("Regenerated task", 0, _digest(prompt))
+    return further_info_payload(prompt)
+
+
+# ---------- Models ----------
+
+class FakeChatModel(BaseChatModel):
+    """A chat model answering function calls, tool calls (structured output) and plain prompts."""
+
+    model_name: str = "gpt-4o"
+    behaviour: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-openai"
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        # with_structured_output binds the schema as a single forced tool.
+        kwargs.pop("tool_choice", None)
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _respond(self, messages: List[Any], **kwargs: Any) -> AIMessage:
+        failure = self.behaviour.failure()
+        if failure and failure != "invalid_output":
+            _raise(failure)
+        prompt = "\n".join(str(m.content) for m in messages)
+        content, extra, tool_calls = "", {}, []
+        if kwargs.get("functions"):
+            name = kwargs["functions"][0]["name"]
+            payload = _structured_payload(name, prompt)
+            if failure:
+                payload = {"info_needed": "not a list"}
+            extra = {"function_call": {"name": name, "arguments": json.dumps(payload)}}
+            output = extra["function_call"]["arguments"]
+        elif kwargs.get("tools"):
+            name = kwargs["tools"][0]["function"]["name"]
+            payload = _structured_payload(name, prompt)
+            if failure:
+                payload = {key: value for key, value in payload.items() if key not in ("tasks", "task_duration")}
+            tool_calls = [{"name": name, "args": payload, "id": f"call_{uuid.uuid4().hex[:12]}"}]
+            output = json.dumps(payload)
+        else:
+            content = output = plan_markdown(prompt)
+        usage = {"input_tokens": _tokens(prompt), "output_tokens": _tokens(output),
+                 "total_tokens": _tokens(prompt) + _tokens(output)}
+        return AIMessage(content=content, additional_kwargs=extra, tool_calls=tool_calls, usage_metadata=usage,
+                         response_metadata={"model_name": self.model_name})
+
+    def _duration(self, message: AIMessage) -> float:
+        return self.behaviour.first_token_delay(self.model_name) + self.behaviour.token_delay() * message.usage_metadata["output_tokens"]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._respond(messages, **kwargs)
+        time.sleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._respond(messages, **kwargs)
+        await asyncio.sleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._respond(messages, **kwargs)
+        await asyncio.sleep(self.behaviour.first_token_delay(self.model_name))
+        pieces = message.content.split(" ")
+        for index, piece in enumerate(pieces):
+            if index:
+                await asyncio.sleep(self.behaviour.token_delay())
+            chunk = AIMessageChunk(content=piece if index == 0 else " " + piece)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=chunk)
+            yield ChatGenerationChunk(message=chunk)
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=message.usage_metadata))
+
+
+class FakeModerationChain:
+    """Same result shape as OpenAIModerationChain; inputs containing "FLAGGED" are flagged."""
+
+    VIOLATION_OUTPUT = "Text was found that violates OpenAI's content policy."
+
+    def __init__(self, behaviour: FakeBehaviour):
+        self.behaviour = behaviour
+
+    def flagged(self, texts: List[str]) -> List[bool]:
+        failure = self.behaviour.failure()
+        if failure and failure != "invalid_output":
+            _raise(failure)
+        return ["FLAGGED" in text for text in texts]
+
+    def _result(self, text: str) -> Dict[str, str]:
+        return {"input": text, "output": self.VIOLATION_OUTPUT if self.flagged([text])[0] else text}
+
+    def invoke(self, text: str) -> Dict[str, str]:
+        time.sleep(self.behaviour.first_token_delay())
+        return self._result(text)
+
+    async def ainvoke(self, text: str) -> Dict[str, str]:
+        await asyncio.sleep(self.behaviour.first_token_delay())
+        return self._result(text)
+
+
+class FakeModelClients:
+    """Drop-in replacement for llm_clients.ModelClients backed by FakeChatModel."""
+
+    def __init__(self, behaviour: Optional[FakeBehaviour] = None):
+        self.behaviour = behaviour or FakeBehaviour()
+        self._chat_models: Dict[tuple, FakeChatModel] = {}
+        self._structured_models: Dict[tuple, Any] = {}
+        self._moderation_chain = FakeModerationChain(self.behaviour)
+
+    def chat(self, model_name: str, temperature: float = 1.0) -> FakeChatModel:
+        key = (model_name, temperature)
+        if key not in self._chat_models:
+            self._chat_models[key] = FakeChatModel(model_name=model_name, behaviour=self.behaviour,
+                                                   callbacks=[UsageCallback()])
+        return self._chat_models[key]
+
+    def structured(self, model_name: str, schema: Any, temperature: float = 1.0):
+        key = (model_name, temperature, schema if isinstance(schema, type) else json.dumps(schema, sort_keys=True))
+        if key not in self._structured_models:
+            self._structured_models[key] = self.chat(model_name, temperature).with_structured_output(schema)
+        return self._structured_models[key]
+
+    def moderation(self) -> FakeModerationChain:
+        return self._moderation_chain
+
+    async def amoderate(self, inputs: List[str]) -> List[bool]:
+        await asyncio.sleep(self.behaviour.first_token_delay())
+        return self._moderation_chain.flagged(inputs)
+
+    async def aclose(self) -> None:
+        pass
@@ -1,7 +1,10 @@
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
+from typing import AsyncIterator
+from langchain_core.messages import SystemMessage, HumanMessage
+from llm_clients import get_clients
+from scheduler import get_scheduler, estimate_tokens
+from model_router import get_router
 
-def get_final_plan(user_goal: str, user_details: list) -> str:
+def _build_messages(user_goal: str, user_details: list) -> list:
     # Construct the final prompt by combining the user’s original goal and further details.
     combined_details = "\n".join(
         [f"{detail['keyword']}: {detail['details']}" for detail in user_details]
@@ -12,12 +15,14 @@ def get_final_plan(user_goal: str, user_details: list) -> str:
                     f"User's original goal: {user_goal}"
                     f"Additional details:{combined_details}")
 
-    messages = [
+    return [
         SystemMessage(content="You are a helpful planner that creates a comprehensive, detailed plan in markdown format for user by provided information."),
         HumanMessage(content=prompt_text)
     ]
 
-    model = ChatOpenAI(model_name="gpt-4o", temperature=1.0)
+def get_final_plan(user_goal: str, user_details: list) -> str:
+    messages = _build_messages(user_goal, user_details)
+    model = get_clients().chat("gpt-4o", temperature=1.0)
     response = model.invoke(
         messages,
         top_p=0.95,
@@ -25,4 +30,42 @@ def get_final_plan(user_goal: str, user_details: list) -> str:
     )
     final_plan = response.content
 
-    return final_plan
\ No newline at end of file
+    return final_plan
+
+async def aget_final_plan(user_goal: str, user_details: list) -> str:
+    messages = _build_messages(user_goal, user_details)
+
+    async def call(model_name: str):
+        model = get_clients().chat(model_name, temperature=1.0)
+        return await get_scheduler().run(
+            model_name, "final_plan", estimate_tokens(messages, "final_plan"),
+            lambda: model.ainvoke(
+                messages,
+                top_p=0.95,
+                temperature=1.02,
+            ),
+        )
+
+    response, _ = await get_router().run("final_plan", call)
+    return response.content
+
+async def astream_final_plan(user_goal: str, user_details: list) -> AsyncIterator[str]:
+    """Yield the markdown plan piece by piece as the model generates it.
+
+    Closing the generator early (e.g. when the client disconnects) closes the
+    upstream stream, so generation stops instead of running to completion.
+    """
+    messages = _build_messages(user_goal, user_details)
+    model = get_clients().chat("gpt-4o", temperature=1.0)
+    async with get_scheduler().slot("gpt-4o", "final_plan", estimate_tokens(messages, "final_plan")):
+        stream = model.astream(
+            messages,
+            top_p=0.95,
+            temperature=1.02,
+        )
+        try:
+            async for chunk in stream:
+                if chunk.content:
+                    yield chunk.content
+        finally:
+            await stream.aclose()
@@ -1,13 +1,19 @@
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
+from langchain_core.messages import SystemMessage, HumanMessage
 from pydantic import BaseModel, Field, ValidationError
 from typing import List
 import json
-from dotenv import load_dotenv
-import os
+from llm_clients import get_clients
+from llm_cache import get_response_cache, make_cache_key
+from singleflight import SingleFlight
+from scheduler import get_scheduler, estimate_tokens
+from metrics import record_structured_failure
+from similar_goals import get_similar_goal_index
+from model_router import get_router
 
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Bump whenever the prompt or schema below changes so cached responses are not reused.
+FURTHER_INFO_PROMPT_VERSION = "1"
+
+_further_info_flight = SingleFlight("further_info")
 
 # ---------- Function Calling with Pydantic Schema ----------
 class InfoNeeded(BaseModel):
@@ -25,51 +31,46 @@ further_info_schema = {
     "parameters": FurtherInfoResponse.model_json_schema()
 }
 
-def get_further_info_fc_pydantic_schema(user_goal: str, user_plan: str) -> FurtherInfoResponse:
-    # TODO: Add start and end time request if not mentioned.
-    # TODO: Add the personality of the user if not mentioned.
-    # TODO: Control the scaling more concisely.
+FURTHER_INFO_SYSTEM_PROMPT = (
+    "You are a meticulous planning consultant whose expertise lies in helping users design comprehensive and actionable plans. "
+    "Follow a clear, step-by-step reasoning process as outlined below:"
+    "Initial Review:"
+    "- Examine the user's provided information, including their goal, idea, or plan."
+    "- Identify the key elements and the level of detail already provided."
+    "Specificity Analysis:"
+    "- Assess how specific the user's plan is."
+    "- Determine what additional details are required to make the plan fully actionable."
+    "- Decide on the number of follow-up questions needed (between 1 to 8) based on the current specificity."
+    "Additional Information:"
+    "- Analyze if the personality of the user and the start and end time of the user are necessary."
+    "- IF the personality and start and end time of the user are not mentioned, add them to the list of questions needed."
+    "Question Generation:"
+    "- Create a targeted list of specific and actionable questions that gather the precise details necessary for plan creation."
+    "- Ensure each question is directly relevant to the user's goal and adapts to different types of objectives."
 
-    system_prompt = (
-        "You are a meticulous planning consultant whose expertise lies in helping users design comprehensive and actionable plans. "
-        "Follow a clear, step-by-step reasoning process as outlined below:"
-        "Initial Review:"
-        "- Examine the user's provided information, including their goal, idea, or plan."
-        "- Identify the key elements and the level of detail already provided."
-        "Specificity Analysis:"
-        "- Assess how specific the user's plan is."
-        "- Determine what additional details are required to make the plan fully actionable."
-        "- Decide on the number of follow-up questions needed (between 1 to 8) based on the current specificity."
-        "Additional Information:"
-        "- Analyze if the personality of the user and the start and end time of the user are necessary."
-        "- IF the personality and start and end time of the user are not mentioned, add them to the list of questions needed."
-        "Question Generation:"
-        "- Create a targeted list of specific and actionable questions that gather the precise details necessary for plan creation."
-        "- Ensure each question is directly relevant to the user's goal and adapts to different types of objectives."
-
-        "- Focus on questions that are critical for finalizing the plan."
-        "Your responses should clearly outline each step, ensuring the questions and insights you provide are precise, actionable, and tailored to the user's needs."
-    )
-    
-    user_prompt = (
+    "- Focus on questions that are critical for finalizing the plan."
+    "Your responses should clearly outline each step, ensuring the questions and insights you provide are precise, actionable, and tailored to the user's needs."
+)
+# Built once: the system message is the same for every request.
+_further_info_system_message = SystemMessage(content=FURTHER_INFO_SYSTEM_PROMPT)
+
+def _user_prompt(user_goal: str, user_plan: str) -> str:
+    return (
         "The information provided by the user:"
         f"Goal or Idea: {user_goal}"
         f"Plan: {user_plan or 'No plan provided.'}"
     )
 
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=user_prompt)
+def _build_pydantic_schema_messages(user_goal: str, user_plan: str) -> list:
+    # TODO: Add start and end time request if not mentioned.
+    # TODO: Add the personality of the user if not mentioned.
+    # TODO: Control the scaling more concisely.
+    return [
+        _further_info_system_message,
+        HumanMessage(content=_user_prompt(user_goal, user_plan))
     ]
 
-    model = ChatOpenAI(model_name="gpt-4o", temperature=1.0, openai_api_key=OPENAI_API_KEY)
-
-    response = model.invoke(
-        messages,
-        functions=[further_info_schema],
-        function_call={"name": "further_info_analyzer"}
-    )
-
+def _parse_further_info_response(response) -> FurtherInfoResponse:
     # Extract and validate the response
     fc = response.additional_kwargs.get("function_call")
     if not fc:
@@ -83,53 +84,109 @@ def get_further_info_fc_pydantic_schema(user_goal: str, user_plan: str) -> Furth
     except json.JSONDecodeError as e:
         raise ValueError(f"Invalid JSON in LLM response: {str(e)}")
 
+def get_further_info_fc_pydantic_schema(user_goal: str, user_plan: str) -> FurtherInfoResponse:
+    messages = _build_pydantic_schema_messages(user_goal, user_plan)
+    model = get_clients().chat("gpt-4o", temperature=1.0)
+    response = model.invoke(
+        messages,
+        functions=[further_info_schema],
+        function_call={"name": "further_info_analyzer"}
+    )
+    return _parse_further_info_response(response)
+
+async def aget_further_info_fc_pydantic_schema(user_goal: str, user_plan: str, use_cache: bool = True) -> FurtherInfoResponse:
+    cache = get_response_cache()
+    key = make_cache_key("further_info", "gpt-4o", FURTHER_INFO_PROMPT_VERSION, {"temperature": 1.0}, user_goal, user_plan)
+    cached = await cache.alookup(key, use_cache)
+    if cached is not None:
+        return FurtherInfoResponse.model_validate(cached)
+    # Reworded requests ask for the same questions; reuse those of a near-identical goal and plan.
+    # The goal is also compared on its own, so a long shared plan cannot hide a different goal.
+    index = get_similar_goal_index(FURTHER_INFO_PROMPT_VERSION)
+    similar = index.lookup(f"{user_goal}\n{user_plan}", goal=user_goal) if index is not None and use_cache else None
+    if similar is not None:
+        return FurtherInfoResponse.model_validate(similar[1])
+
+    messages = _build_pydantic_schema_messages(user_goal, user_plan)
+
+    async def call(model_name: str) -> FurtherInfoResponse:
+        model = get_clients().chat(model_name, temperature=1.0)
+        response = await get_scheduler().run(
+            model_name, "further_info", estimate_tokens(messages, "further_info"),
+            lambda: model.ainvoke(
+                messages,
+                functions=[further_info_schema],
+                function_call={"name": "further_info_analyzer"}
+            ),
+        )
+        try:
+            return _parse_further_info_response(response)
+        except ValueError:
+            record_structured_failure(model_name, "further_info")
+            raise
+
+    async def analyze() -> FurtherInfoResponse:
+        router = get_router()
+        result, model_name = await router.run("further_info", call)
+        # Answers from a hedge or fallback tier serve this request only.
+        if model_name == router.preferred("further_info"):
+            await cache.aset(key, result.model_dump())
+            if index is not None:
+                await index.aadd(f"{user_goal}\n{user_plan}", result.model_dump(), goal=user_goal)
+        return result
+
+    # Identical requests already in flight wait on the same upstream call.
+    return await _further_info_flight.do(key, analyze)
+
 
 # ---------- OpenAi Style Function Calling ---------- 
 
-def get_further_info_fc(user_goal: str) -> dict:
-    further_info_schema = {
-        "name": "further_info_analyzer",
-        "description": "Analyze the user's goal or plan to determine what further information is needed to tailor a plan."
-                       "In addition, the user's personality should be considered. ",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "flag": {
-                    "type": "boolean",
-                    "description": "Indicates whether further information is needed."
-                },
-                "info_needed": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "keyword": {"type": "string", "description": "A keyword of information needed."},
-                            "guide": {"type": "string", "description": "Instructions on what to provide."},
-                            "auto_gen": {"type": "string", "description": "An example text that could give users a reference."}
-                        },
-                        "required": ["keyword", "guide", "auto_gen"]
+further_info_fc_schema = {
+    "name": "further_info_analyzer",
+    "description": "Analyze the user's goal or plan to determine what further information is needed to tailor a plan."
+                   "In addition, the user's personality should be considered. ",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "flag": {
+                "type": "boolean",
+                "description": "Indicates whether further information is needed."
+            },
+            "info_needed": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "keyword": {"type": "string", "description": "A keyword of information needed."},
+                        "guide": {"type": "string", "description": "Instructions on what to provide."},
+                        "auto_gen": {"type": "string", "description": "An example text that could give users a reference."}
                     },
-                    "description": "List of additional information requirements for making a perfect plan.",
-                    "additionalProperties": False
+                    "required": ["keyword", "guide", "auto_gen"]
                 },
-                "strict": True
+                "description": "List of additional information requirements for making a perfect plan.",
+                "additionalProperties": False
             },
-            "required": ["flag", "info_needed"]
-        }
+            "strict": True
+        },
+        "required": ["flag", "info_needed"]
     }
+}
+
+_fc_system_message = SystemMessage(content="You are a plan consultant who analyzes what further information is needed.")
 
+def get_further_info_fc(user_goal: str) -> dict:
     # Build messages (using system and human messages)
     messages = [
-        SystemMessage(content="You are a plan consultant who analyzes what further information is needed."),
+        _fc_system_message,
         HumanMessage(content=f"User's goal/idea/plan: {user_goal}")
     ]
 
     # Initialize the ChatOpenAI model (using GPT-4o)
-    chat = ChatOpenAI(model_name="gpt-4o-mini", temperature=1.0, openai_api_key=OPENAI_API_KEY)
+    chat = get_clients().chat("gpt-4o-mini", temperature=1.0)
     # Call the API with function calling enabled (forcing the call to further_info_analyzer)
     response = chat.invoke(
         messages,
-        functions=[further_info_schema],
+        functions=[further_info_fc_schema],
         function_call={"name": "further_info_analyzer"}
     )
 
@@ -143,69 +200,60 @@ def get_further_info_fc(user_goal: str) -> dict:
 
 # ---------- Structured Output with JSON Schema ----------
 
-def get_further_info_structured_output(user_goal: str, user_plan: str) -> dict:
-
-    json_schema  = {
-        "name": "further_info_analyzer",
-        "description": "Analyze the user's input comprehensively to determine what crucial information is needed for creating a detailed, personalized plan.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "flag": {
-                    "type": "boolean",
-                    "description": "Indicates whether further information is needed."
-                },
-                "info_needed": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "keyword": {"type": "string", "description": "A keyword of information needed."},
-                            "guide": {"type": "string", "description": "Instructions on what to provide."},
-                            "auto_gen": {"type": "string", "description": "An example text that could give users a reference."}
-                        },
-                        "required": ["keyword", "guide", "auto_gen"]
+further_info_json_schema = {
+    "name": "further_info_analyzer",
+    "description": "Analyze the user's input comprehensively to determine what crucial information is needed for creating a detailed, personalized plan.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "flag": {
+                "type": "boolean",
+                "description": "Indicates whether further information is needed."
+            },
+            "info_needed": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "keyword": {"type": "string", "description": "A keyword of information needed."},
+                        "guide": {"type": "string", "description": "Instructions on what to provide."},
+                        "auto_gen": {"type": "string", "description": "An example text that could give users a reference."}
                     },
-                    "description": "List of additional information requirements for making a perfect plan.",
-                    "additionalProperties": False
+                    "required": ["keyword", "guide", "auto_gen"]
                 },
-                "strict": True
+                "description": "List of additional information requirements for making a perfect plan.",
+                "additionalProperties": False
             },
-            "required": ["flag", "info_needed"]
-        }
+            "strict": True
+        },
+        "required": ["flag", "info_needed"]
     }
+}
 
-    system_prompt = (
-        "You are a meticulous planning consultant whose expertise lies in helping users design comprehensive and actionable plans. "
-        "Follow a clear, step-by-step reasoning process as outlined below:"
-        "Initial Review:"
-        "- Examine the user's provided information, including their goal, idea, or plan."
-        "- Identify the key elements and the level of detail already provided."
-        "Specificity Analysis:"
-        "- Assess how specific the user's plan is."
-        "- Determine what additional details are required to make the plan fully actionable."
-        "- Decide on the number of follow-up questions needed (between 1 to 8) based on the current specificity."
-        "Question Generation:"
-        "- Create a targeted list of specific and actionable questions that gather the precise details necessary for plan creation."
-        "- Ensure each question is directly relevant to the user's goal and adapts to different types of objectives."
-        "- Focus on questions that are critical for finalizing the plan."
-        "Your responses should clearly outline each step, ensuring the questions and insights you provide are precise, actionable, and tailored to the user's needs."
-    )
-    
-    user_prompt = (
-        "The information provided by the user:"
-        f"Goal or Idea: {user_goal}"
-        f"Plan: {user_plan or 'No plan provided.'}"
-    )
+_structured_output_system_message = SystemMessage(content=(
+    "You are a meticulous planning consultant whose expertise lies in helping users design comprehensive and actionable plans. "
+    "Follow a clear, step-by-step reasoning process as outlined below:"
+    "Initial Review:"
+    "- Examine the user's provided information, including their goal, idea, or plan."
+    "- Identify the key elements and the level of detail already provided."
+    "Specificity Analysis:"
+    "- Assess how specific the user's plan is."
+    "- Determine what additional details are required to make the plan fully actionable."
+    "- Decide on the number of follow-up questions needed (between 1 to 8) based on the current specificity."
+    "Question Generation:"
+    "- Create a targeted list of specific and actionable questions that gather the precise details necessary for plan creation."
+    "- Ensure each question is directly relevant to the user's goal and adapts to different types of objectives."
+    "- Focus on questions that are critical for finalizing the plan."
+    "Your responses should clearly outline each step, ensuring the questions and insights you provide are precise, actionable, and tailored to the user's needs."
+))
 
+def get_further_info_structured_output(user_goal: str, user_plan: str) -> dict:
     messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=user_prompt)
+        _structured_output_system_message,
+        HumanMessage(content=_user_prompt(user_goal, user_plan))
     ]
 
-
-    llm = ChatOpenAI(model_name="gpt-4o", temperature=1.0, openai_api_key=OPENAI_API_KEY)
-    structured_llm = llm.with_structured_output(json_schema)
+    structured_llm = get_clients().structured("gpt-4o", further_info_json_schema)
     response = structured_llm.invoke(messages)
 
-    return response["info_needed"]
\ No newline at end of file
+    return response["info_needed"]
@@ -0,0 +1,259 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+load_dotenv()
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "4096"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+# Optional on-disk tier, shared by every uvicorn worker on the host and kept across restarts.
+LLM_CACHE_SQLITE_PATH = os.getenv("LLM_CACHE_SQLITE_PATH") or None
+LLM_CACHE_SQLITE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_SQLITE_MAX_ENTRIES", "100000"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of user input used for cache keys."""
+    return _WHITESPACE.sub(" ", (text or "").casefold()).strip()
+
+def make_cache_key(stage: str, model: str, prompt_version: str, params: Dict[str, Any], *inputs: str) -> str:
+    """Key a stage result on its normalized inputs, model, prompt version and sampling params."""
+    material = json.dumps(
+        [stage, model, prompt_version, params, [normalize_text(i) for i in inputs]],
+        sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# ---------- Cache tiers ----------
+
+class CacheBackend:
+    """A key/value store for JSON-serializable stage results."""
+
+    name = "backend"
+    # Tiers doing blocking I/O are called from a thread on the async paths.
+    blocking = False
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self),
+        }
+
+class MemoryLRUCache(CacheBackend):
+    """Bounded in-process cache with least-recently-used eviction and per-entry TTL."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteCache(CacheBackend):
+    """File-backed cache tier; WAL mode lets several worker processes share one file."""
+
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = LLM_CACHE_SQLITE_MAX_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            self._writes += 1
+            # Trim occasionally rather than on every write to keep writes cheap.
+            if self._writes % 256 == 0:
+                self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        expired = self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+        self.expirations += max(expired, 0)
+        overflow = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class ResponseCache:
+    """Read-through chain of cache tiers; hits in a lower tier are promoted to the tiers above."""
+
+    def __init__(self, tiers: List[CacheBackend], ttl: float = LLM_CACHE_TTL_SECONDS, enabled: bool = True):
+        self.tiers = tiers
+        self.ttl = ttl
+        self.enabled = enabled
+        self.bypasses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        for index, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for upper in self.tiers[:index]:
+                    upper.set(key, value, self.ttl)
+                return value
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        for tier in self.tiers:
+            tier.set(key, value, ttl or self.ttl)
+
+    def lookup(self, key: str, use_cache: bool = True) -> Optional[Any]:
+        """Return the cached value, or None when missing or when the caller asked to bypass the cache."""
+        if not use_cache:
+            self.bypasses += 1
+            return None
+        return self.get(key)
+
+    # Async variants for request paths: blocking tiers run in a thread, so a contended SQLite
+    # file (up to its 5 s lock timeout) no longer stalls the event loop. Memory tiers stay inline.
+
+    async def aget(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        for index, tier in enumerate(self.tiers):
+            value = await asyncio.to_thread(tier.get, key) if tier.blocking else tier.get(key)
+            if value is not None:
+                for upper in self.tiers[:index]:
+                    await _aset(upper, key, value, self.ttl)
+                return value
+        return None
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        for tier in self.tiers:
+            await _aset(tier, key, value, ttl or self.ttl)
+
+    async def alookup(self, key: str, use_cache: bool = True) -> Optional[Any]:
+        if not use_cache:
+            self.bypasses += 1
+            return None
+        return await self.aget(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "bypasses": self.bypasses,
+            "tiers": {tier.name: tier.stats() for tier in self.tiers},
+        }
+
+
+async def _aset(tier: CacheBackend, key: str, value: Any, ttl: float) -> None:
+    if tier.blocking:
+        await asyncio.to_thread(tier.set, key, value, ttl)
+    else:
+        tier.set(key, value, ttl)
+
+
+_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache, built from the LLM_CACHE_* settings."""
+    global _cache
+    if _cache is None:
+        tiers: List[CacheBackend] = [MemoryLRUCache(LLM_CACHE_MAX_ENTRIES)]
+        if LLM_CACHE_SQLITE_PATH:
+            tiers.append(SQLiteCache(LLM_CACHE_SQLITE_PATH, LLM_CACHE_SQLITE_MAX_ENTRIES))
+        _cache = ResponseCache(tiers, LLM_CACHE_TTL_SECONDS, LLM_CACHE_ENABLED)
+    return _cache
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    global _cache
+    _cache = cache
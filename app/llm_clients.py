@@ -0,0 +1,149 @@
+from dotenv import load_dotenv
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+import httpx
+import json
+import os
+from metrics import UsageCallback
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from langchain.chains import OpenAIModerationChain
+
+load_dotenv()
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Point every client at a different OpenAI-compatible server (e.g. a local fake for benchmarks).
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# ---------- Connection pool settings ----------
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "1000"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "200"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+# Rate limits and transient errors on async calls are retried by the admission scheduler.
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "0"))
+# "fake" swaps every model for the in-process stand-in in fake_llm.py (load tests, offline runs).
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+
+
+class ModelClients:
+    """Long-lived model clients sharing one keep-alive connection pool.
+
+    Chat models are created once per (model, temperature) pair and reused by every
+    request, so the service keeps its HTTP connections to OpenAI warm instead of
+    opening a new client per call. langchain_openai and the openai SDK take seconds
+    to import, so they are imported by the first chat() or moderation() call
+    (see warmup.py) rather than with this module.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        max_keepalive_connections: int = LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = LLM_KEEPALIVE_EXPIRY,
+        request_timeout: float = LLM_REQUEST_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+    ):
+        self.api_key = api_key or OPENAI_API_KEY
+        self.base_url = base_url or OPENAI_BASE_URL
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        timeout = httpx.Timeout(request_timeout, connect=LLM_CONNECT_TIMEOUT)
+        self.http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        self.http_client = httpx.Client(limits=limits, timeout=timeout)
+        self._chat_models: Dict[Tuple[str, float], "ChatOpenAI"] = {}
+        self._moderation_chain: Optional["OpenAIModerationChain"] = None
+        self._structured_models: Dict[Tuple[str, float, Any], Any] = {}
+
+    def chat(self, model_name: str, temperature: float = 1.0) -> "ChatOpenAI":
+        key = (model_name, temperature)
+        model = self._chat_models.get(key)
+        if model is None:
+            from langchain_openai import ChatOpenAI
+            model = ChatOpenAI(
+                model_name=model_name,
+                temperature=temperature,
+                openai_api_key=self.api_key,
+                openai_api_base=self.base_url,
+                http_client=self.http_client,
+                http_async_client=self.http_async_client,
+                request_timeout=self.request_timeout,
+                max_retries=self.max_retries,
+                # Ask streams for a final usage chunk so streamed plans are metered too.
+                stream_usage=True,
+                callbacks=[UsageCallback()],
+            )
+            self._chat_models[key] = model
+        return model
+
+    def structured(self, model_name: str, schema: Any, temperature: float = 1.0):
+        """``chat(model_name).with_structured_output(schema)``, built once per model and schema.
+
+        Building it converts the schema to a tool definition, which takes
+        milliseconds for the larger task models.
+        """
+        key = (model_name, temperature, schema if isinstance(schema, type) else json.dumps(schema, sort_keys=True))
+        runnable = self._structured_models.get(key)
+        if runnable is None:
+            runnable = self._structured_models[key] = self.chat(model_name, temperature).with_structured_output(schema)
+        return runnable
+
+    def moderation(self) -> "OpenAIModerationChain":
+        if self._moderation_chain is None:
+            from langchain.chains import OpenAIModerationChain
+            import openai
+            chain = OpenAIModerationChain(error=False, openai_api_key=self.api_key)
+            # The chain builds its own OpenAI clients; swap them for ones on the shared pool.
+            chain.client = openai.OpenAI(
+                api_key=self.api_key, base_url=self.base_url,
+                http_client=self.http_client, max_retries=self.max_retries,
+            )
+            chain.async_client = openai.AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url,
+                http_client=self.http_async_client, max_retries=self.max_retries,
+            )
+            self._moderation_chain = chain
+        return self._moderation_chain
+
+    async def amoderate(self, inputs: List[str]) -> List[bool]:
+        """Moderate several inputs in one upstream call; returns whether each one was flagged."""
+        response = await self.moderation().async_client.moderations.create(input=inputs)
+        return [result.flagged for result in response.results]
+
+    async def aclose(self) -> None:
+        await self.http_async_client.aclose()
+        self.http_client.close()
+
+
+_clients: Optional[ModelClients] = None
+
+
+def get_clients() -> ModelClients:
+    """Return the process-wide clients, creating them on first use."""
+    global _clients
+    if _clients is None:
+        if LLM_BACKEND == "fake":
+            from fake_llm import FakeModelClients
+            _clients = FakeModelClients()
+        else:
+            _clients = ModelClients()
+    return _clients
+
+
+def set_clients(clients: Optional[ModelClients]) -> None:
+    global _clients
+    _clients = clients
+
+
+async def close_clients() -> None:
+    global _clients
+    if _clients is not None:
+        await _clients.aclose()
+        _clients = None
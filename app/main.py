@@ -1,15 +1,69 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import List, Dict
-import asyncio
-from moderation import check_policy
-from further_info_analyzer import get_further_info_fc_pydantic_schema
-from final_plan_generator import get_final_plan
-from time_series_tasks_generator import get_time_series_data_tool_call
-from time_series_tasks_generator import Tasks
+from typing import List, Dict, Optional
+from contextlib import asynccontextmanager
+import json
+import math
+from llm_clients import get_clients, close_clients
+from llm_cache import get_response_cache
+from singleflight import singleflight_stats
+from similar_goals import get_similar_goal_index, close_similar_goal_index
+from scheduler import get_scheduler, SchedulerSaturated
+from model_router import get_router, set_deadline, DeadlineExceeded, LLM_LATENCY_BUDGETS
+from moderation import acheck_policy, acheck_policy_batch, moderation_stats, MODERATION_BATCH_SIZE
+from further_info_analyzer import aget_further_info_fc_pydantic_schema, FURTHER_INFO_PROMPT_VERSION
+from final_plan_generator import aget_final_plan, astream_final_plan
+from time_series_tasks_generator import aget_time_series_data_tool_call, aget_time_series_sections
+from time_series_tasks_generator import Tasks, TimeSeriesPatch, merge_tasks, diff_tasks
 from further_info_analyzer import FurtherInfoResponse
-app = FastAPI(title="AI Planning Service", version="1.0.0")
+from plan_pipeline import run_plan_pipeline, PlanPipelineResponse
+from occurrence_expander import iter_occurrence_lines, window_days, OCCURRENCE_MAX_WINDOW_DAYS
+from task_conflicts import find_conflicts, TaskConflict
+from task_validation import avalidate_tasks, repair_further_info, validation_stats, ValidationReport
+from plan_store import UnknownSession, get_plan_store, close_plan_store, to_document_tasks, from_document_tasks
+from plan_store import to_document_sections, from_document_sections
+from batching import run_batch, BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS
+from metrics import MetricsMiddleware, register_collector, render_metrics
+from warmup import start_warm_up, is_ready, warmup_status
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the shared model clients once so every request reuses the same connection pool.
+    get_clients()
+    get_plan_store()
+    # Loads the persisted near-duplicate index before the first request rather than during it.
+    get_similar_goal_index(FURTHER_INFO_PROMPT_VERSION)
+    # Imports and builds the model clients and structured-output schemas (see WARMUP_MODE).
+    warming = await start_warm_up()
+    yield
+    if warming is not None:
+        warming.cancel()
+    await close_clients()
+    close_plan_store()
+    close_similar_goal_index()
+
+async def apply_latency_budget(request: Request) -> None:
+    """Start the request's deadline: X-Latency-Budget (seconds) if given, else the endpoint's default budget.
+
+    Applied to every route; async so the deadline is set in the context the endpoint runs in.
+    """
+    header = request.headers.get("x-latency-budget")
+    if header is None:
+        route = request.scope.get("route")
+        set_deadline(LLM_LATENCY_BUDGETS.get(getattr(route, "path", None)))
+        return
+    try:
+        budget = float(header)
+    except ValueError:
+        budget = math.nan
+    if not budget > 0 or math.isinf(budget):
+        raise HTTPException(status_code=422, detail="X-Latency-Budget must be a positive number of seconds")
+    set_deadline(budget)
+
+app = FastAPI(title="AI Planning Service", version="1.0.0", lifespan=lifespan,
+              dependencies=[Depends(apply_latency_budget)])
 
 # Allow all CORS origins
 app.add_middleware(
@@ -19,27 +73,174 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request latency histograms and the optional Server-Timing header.
+app.add_middleware(MetricsMiddleware)
 
 # ---------------------------
 # Request & Response Models
 # ---------------------------
 
+# Every stage saves its inputs and output in a planning session and returns its id in the
+# X-Session-Id header. Later stages given that session_id may leave out what the session holds.
+
 class GoalRequest(BaseModel):
     goal: str
     plan: str
+    session_id: Optional[str] = None
 
 class FinalPlanRequest(BaseModel):
-    goal: str
+    goal: Optional[str] = None
     info_needed: List[Dict]
+    session_id: Optional[str] = None
 
 class FinalPlanResponse(BaseModel):
     plan: str
 
 class TimeSeriesPlanRequest(BaseModel):
-    user_goal: str
-    user_plan: str
-    further_info: Dict
+    user_goal: Optional[str] = None
+    user_plan: Optional[str] = None
+    further_info: Optional[Dict] = None
+    final_plan: Optional[str] = None
+    session_id: Optional[str] = None
+    # Generate tasks per plan section concurrently instead of in one call.
+    chunked: bool = False
+    # Report tasks that share a time slot on the same days.
+    detect_conflicts: bool = False
+
+class TimeSeriesUpdateRequest(BaseModel):
+    session_id: str
+    # The edited plan; the session holds the previous one and its tasks.
     final_plan: str
+    user_goal: Optional[str] = None
+    user_plan: Optional[str] = None
+    further_info: Optional[Dict] = None
+
+class TimeSeriesResponse(Tasks):
+    conflicts: Optional[List[TaskConflict]] = None
+
+class ExpandOccurrencesRequest(BaseModel):
+    tasks: Optional[Tasks] = None
+    start_date: str
+    end_date: str
+    session_id: Optional[str] = None
+
+# Batch variants: items are processed with at most `concurrency` in flight (capped by
+# BATCH_MAX_CONCURRENCY) and answered as NDJSON lines in completion order.
+
+class GoalBatchRequest(BaseModel):
+    items: List[GoalRequest]
+    concurrency: Optional[int] = None
+
+class FinalPlanBatchRequest(BaseModel):
+    items: List[FinalPlanRequest]
+    concurrency: Optional[int] = None
+
+class PlanPipelineRequest(BaseModel):
+    goal: str
+    plan: str = ""
+    details: Optional[List[Dict]] = None
+    session_id: Optional[str] = None
+
+# ---------------------------
+# Dependencies
+# ---------------------------
+
+def allow_cached_response(request: Request) -> bool:
+    """False when the caller asked for a fresh sample via X-Cache-Bypass or Cache-Control: no-cache."""
+    bypass = request.headers.get("x-cache-bypass", "").lower() in ("1", "true", "yes")
+    no_cache = "no-cache" in request.headers.get("cache-control", "").lower()
+    return not (bypass or no_cache)
+
+def _http_error(e: Exception, message: str) -> HTTPException:
+    # Saturation is the caller's cue to back off, not a server fault.
+    if isinstance(e, SchedulerSaturated):
+        return HTTPException(status_code=e.status_code, detail=f"{message}: {str(e)}",
+                             headers={"Retry-After": str(math.ceil(e.retry_after))})
+    if isinstance(e, DeadlineExceeded):
+        return HTTPException(status_code=e.status_code, detail=f"{message}: {str(e)}")
+    if isinstance(e, UnknownSession):
+        return HTTPException(status_code=e.status_code, detail=str(e))
+    return HTTPException(status_code=500, detail=f"{message}: {str(e)}")
+
+async def _load_session(session_id: Optional[str]) -> Dict:
+    if not session_id:
+        return {}
+    document = await get_plan_store().aget(session_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session: {session_id}")
+    return document
+
+def _required(value, field: str):
+    if value is None:
+        raise HTTPException(status_code=422, detail=f"{field} is required unless the session_id refers to a session holding it")
+    return value
+
+async def _save_session(response: Response, session_id: Optional[str], **fields) -> str:
+    session_id = (await get_plan_store().aupdate(session_id, **fields))["_id"]
+    response.headers["X-Session-Id"] = session_id
+    return session_id
+
+def _stage_further_info(request_further_info: Optional[Dict], session: Dict) -> Dict:
+    if request_further_info is not None:
+        return request_further_info
+    # The user's answers are what the final plan was built from; fall back to the questions.
+    return {"info_needed": session["details"]} if session.get("details") else session.get("further_info", {})
+
+def _section_validator(user_goal: str, further_info: Dict, final_plan: str):
+    """A validate hook for aget_time_series_sections and the report it adds each section's results to."""
+    report = ValidationReport()
+
+    async def validate(tasks: Tasks) -> Tasks:
+        validated, part = await avalidate_tasks(tasks, user_goal, further_info, final_plan)
+        report.include(part)
+        return validated
+
+    return validate, report
+
+def _report_headers(response: Response, report: ValidationReport) -> None:
+    response.headers["X-Validation-Repaired"] = str(report.repaired)
+    response.headers["X-Validation-Regenerated"] = str(report.regenerated)
+    response.headers["X-Validation-Dropped"] = str(report.dropped)
+
+async def _further_info_stage(request: GoalRequest, use_cache: bool):
+    result = await aget_further_info_fc_pydantic_schema(request.goal, request.plan, use_cache)
+    result, report = repair_further_info(result)
+    session_id = (await get_plan_store().aupdate(request.session_id, goal=request.goal, plan=request.plan,
+                                                 further_info=result.model_dump()))["_id"]
+    return result, report, session_id
+
+async def _final_plan_stage(request: FinalPlanRequest, goal: str):
+    # Here we assume the user's additional details come as a list of dicts
+    user_details = request.info_needed
+    result = await aget_final_plan(goal, user_details)
+    session_id = (await get_plan_store().aupdate(request.session_id, goal=goal, details=user_details, final_plan=result))["_id"]
+    return result, session_id
+
+def _batch_response(request, packs: list, worker, message: str) -> StreamingResponse:
+    """Stream one NDJSON line per item as packs of (index, item) finish.
+
+    ``worker`` returns ``(index, payload or exception)`` for each item of its
+    pack; if it raises, every item of the pack gets that error line. Failed
+    items never stop the rest of the batch.
+    """
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch holds at most {BATCH_MAX_ITEMS} items")
+    concurrency = max(1, min(request.concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+
+    def line(index: int, payload) -> str:
+        if isinstance(payload, Exception):
+            error = payload if isinstance(payload, HTTPException) else _http_error(payload, message)
+            payload = {"ok": False, "status": error.status_code, "detail": error.detail}
+        else:
+            payload = {"ok": True, **payload}
+        return json.dumps({"index": index, **payload}) + "\n"
+
+    async def lines():
+        async for position, results, e in run_batch(packs, worker, concurrency):
+            for index, payload in (results if e is None else [(index, e) for index, _ in packs[position]]):
+                yield line(index, payload)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 # ---------------------------
 # API Endpoints
@@ -47,39 +248,273 @@ class TimeSeriesPlanRequest(BaseModel):
 
 @app.post("/check-policy/", summary="Check if the provided goal and plan comply with our policies")
 
-async def check_policy_endpoint(request: GoalRequest):
+async def check_policy_endpoint(request: GoalRequest, response: Response, use_cache: bool = Depends(allow_cached_response)):
+    await _load_session(request.session_id)
     try:
-        # Wrap the synchronous function using asyncio.to_thread
-        result = await asyncio.to_thread(check_policy, request.goal, request.plan)
+        result = await acheck_policy(request.goal, request.plan, use_cache)
+        await _save_session(response, request.session_id, goal=request.goal, plan=request.plan, compliant=result)
         return {"compliant": result}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Policy check failed: {str(e)}")
+        raise _http_error(e, "Policy check failed")
 
 @app.post("/get-further-info/", response_model=FurtherInfoResponse, summary="Analyze input to determine further information requirements")
-async def further_info_endpoint(request: GoalRequest):
+async def further_info_endpoint(request: GoalRequest, response: Response, use_cache: bool = Depends(allow_cached_response)):
+    await _load_session(request.session_id)
     try:
-        result = await asyncio.to_thread(get_further_info_fc_pydantic_schema, request.goal, request.plan)
+        result, report, session_id = await _further_info_stage(request, use_cache)
+        _report_headers(response, report)
+        response.headers["X-Session-Id"] = session_id
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get further info: {str(e)}")
+        raise _http_error(e, "Failed to get further info")
 
 @app.post("/get-final-plan/", response_model=FinalPlanResponse, summary="Generate a final plan based on user input")
-async def final_plan_endpoint(request: FinalPlanRequest):
+async def final_plan_endpoint(request: FinalPlanRequest, response: Response):
+    session = await _load_session(request.session_id)
+    goal = _required(request.goal or session.get("goal"), "goal")
     try:
-        # Here we assume the user's additional details come as a list of dicts
-        user_details = request.info_needed
-        result = await asyncio.to_thread(get_final_plan, request.goal, user_details)
+        result, session_id = await _final_plan_stage(request, goal)
+        response.headers["X-Session-Id"] = session_id
         return {"plan": result}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Plan generation failed: {str(e)}")
+        raise _http_error(e, "Plan generation failed")
+
+async def _final_plan_events(goal: str, user_details: list, session_id: str):
+    # Server-Sent Events: one "data" event per token chunk, then "done" (or "error").
+    # If the client disconnects the server cancels this generator, and closing the
+    # upstream stream in the finally block stops the model from generating further.
+    stream = astream_final_plan(goal, user_details)
+    chunks = []
+    try:
+        async for chunk in stream:
+            chunks.append(chunk)
+            yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        await get_plan_store().aupdate(session_id, final_plan="".join(chunks))
+        yield "event: done\ndata: {}\n\n"
+    except Exception as e:
+        error = _http_error(e, "Plan generation failed")
+        payload = {"status": error.status_code, "detail": error.detail, "retry_after": (error.headers or {}).get("Retry-After")}
+        yield f"event: error\ndata: {json.dumps(payload)}\n\n"
+    finally:
+        await stream.aclose()
+
+@app.post("/get-final-plan/stream", summary="Stream the final plan as Server-Sent Events while it is generated")
+async def final_plan_stream_endpoint(request: FinalPlanRequest):
+    session = await _load_session(request.session_id)
+    goal = _required(request.goal or session.get("goal"), "goal")
+    # Headers go out before the plan exists, so the session is created up front.
+    session_id = (await get_plan_store().aupdate(request.session_id, goal=goal, details=request.info_needed))["_id"]
+    return StreamingResponse(
+        _final_plan_events(goal, request.info_needed, session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Session-Id": session_id},
+    )
+
+@app.post("/get-time-series/", response_model=TimeSeriesResponse, summary="Generate time series data from the final plan")
+async def time_series_endpoint(request: TimeSeriesPlanRequest, response: Response):
+    session = await _load_session(request.session_id)
+    user_goal = _required(request.user_goal or session.get("goal"), "user_goal")
+    user_plan = request.user_plan if request.user_plan is not None else session.get("plan", "")
+    final_plan = _required(request.final_plan or session.get("final_plan"), "final_plan")
+    further_info = _stage_further_info(request.further_info, session)
+    try:
+        sections = None
+        if request.chunked:
+            validate, report = _section_validator(user_goal, further_info, final_plan)
+            sections, _ = await aget_time_series_sections(user_goal, user_plan, further_info, final_plan, validate=validate)
+            result = merge_tasks([section.tasks for section in sections], [section.heading for section in sections])
+        else:
+            result = await aget_time_series_data_tool_call(user_goal, user_plan, further_info, final_plan)
+            result, report = await avalidate_tasks(result, user_goal, further_info, final_plan)
+        _report_headers(response, report)
+        # Validated per-section results let /update-time-series/ reuse unchanged sections as they are.
+        await _save_session(response, request.session_id, goal=user_goal, plan=user_plan, final_plan=final_plan,
+                      time_series=to_document_tasks(result),
+                      time_series_sections=to_document_sections(sections) if sections else None)
+        conflicts = find_conflicts(result) if request.detect_conflicts else None
+        return TimeSeriesResponse(**dict(result), conflicts=conflicts)
+    except Exception as e:
+        raise _http_error(e, "Time series generation failed")
 
-@app.post("/get-time-series/", response_model=Tasks, summary="Generate time series data from the final plan")
-async def time_series_endpoint(request: TimeSeriesPlanRequest):
+@app.post("/update-time-series/", response_model=TimeSeriesPatch, summary="Regenerate tasks only for the edited sections of the final plan")
+async def update_time_series_endpoint(request: TimeSeriesUpdateRequest, response: Response):
+    session = await _load_session(request.session_id)
+    stored = _required(session.get("time_series"), "A previous /get-time-series/ result in the session")
+    previous = from_document_tasks(stored)
+    previous_sections = from_document_sections(session.get("time_series_sections") or [])
+    user_goal = _required(request.user_goal or session.get("goal"), "user_goal")
+    user_plan = request.user_plan if request.user_plan is not None else session.get("plan", "")
+    further_info = _stage_further_info(request.further_info, session)
     try:
-        result = await asyncio.to_thread(get_time_series_data_tool_call, request.user_goal, request.user_plan, request.further_info, request.final_plan)
+        validate, report = _section_validator(user_goal, further_info, request.final_plan)
+        sections, reused = await aget_time_series_sections(user_goal, user_plan, further_info, request.final_plan,
+                                                           previous_sections, validate=validate)
+        result = merge_tasks([s.tasks for s in sections], [s.heading for s in sections])
+        _report_headers(response, report)
+        added, updated, removed = diff_tasks(previous, result)
+        await _save_session(response, request.session_id, final_plan=request.final_plan,
+                      time_series=to_document_tasks(result), time_series_sections=to_document_sections(sections))
+        return TimeSeriesPatch(added=added, updated=updated, removed=removed, reused_sections=reused,
+                               regenerated_sections=len(sections) - reused, tasks=result)
+    except Exception as e:
+        raise _http_error(e, "Time series update failed")
+
+@app.post("/expand-occurrences", summary="Expand the tasks' recurrences into dated occurrences, streamed as NDJSON")
+async def expand_occurrences_endpoint(request: ExpandOccurrencesRequest):
+    tasks = request.tasks
+    if tasks is None:
+        stored = _required((await _load_session(request.session_id)).get("time_series"), "tasks")
+        tasks = from_document_tasks(stored)
+    try:
+        days = window_days(request.start_date, request.end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date window: {str(e)}")
+    if not 1 <= days <= OCCURRENCE_MAX_WINDOW_DAYS:
+        raise HTTPException(status_code=400, detail=f"The window must span 1 to {OCCURRENCE_MAX_WINDOW_DAYS} days")
+    return StreamingResponse(
+        iter_occurrence_lines(tasks, request.start_date, request.end_date),
+        media_type="application/x-ndjson",
+    )
+
+@app.post("/batch/check-policy", summary="Check many goal/plan pairs, streamed as NDJSON in completion order")
+async def check_policy_batch_endpoint(request: GoalBatchRequest, use_cache: bool = Depends(allow_cached_response)):
+    # Items are checked MODERATION_BATCH_SIZE at a time, one upstream moderation call per pack.
+    indexed = list(enumerate(request.items))
+    packs = [indexed[i:i + MODERATION_BATCH_SIZE] for i in range(0, len(indexed), MODERATION_BATCH_SIZE)]
+
+    async def check(pack):
+        results, known = [], []
+        for index, item in pack:
+            try:
+                await _load_session(item.session_id)
+                known.append((index, item))
+            except HTTPException as e:
+                results.append((index, e))
+        compliant = await acheck_policy_batch([(item.goal, item.plan) for _, item in known], use_cache) if known else []
+        for (index, item), result in zip(known, compliant):
+            session_id = (await get_plan_store().aupdate(item.session_id, goal=item.goal, plan=item.plan, compliant=result))["_id"]
+            results.append((index, {"result": {"compliant": result}, "session_id": session_id}))
+        return results
+
+    return _batch_response(request, packs, check, "Policy check failed")
+
+@app.post("/batch/get-further-info", summary="Analyze many goal/plan pairs, streamed as NDJSON in completion order")
+async def further_info_batch_endpoint(request: GoalBatchRequest, use_cache: bool = Depends(allow_cached_response)):
+    async def analyze(pack):
+        (index, item), = pack
+        await _load_session(item.session_id)
+        result, report, session_id = await _further_info_stage(item, use_cache)
+        return [(index, {"result": result.model_dump(), "validation": report.model_dump(), "session_id": session_id})]
+
+    return _batch_response(request, [[pair] for pair in enumerate(request.items)], analyze, "Failed to get further info")
+
+@app.post("/batch/get-final-plan", summary="Generate many final plans, streamed as NDJSON in completion order")
+async def final_plan_batch_endpoint(request: FinalPlanBatchRequest):
+    async def generate(pack):
+        (index, item), = pack
+        session = await _load_session(item.session_id)
+        goal = _required(item.goal or session.get("goal"), "goal")
+        result, session_id = await _final_plan_stage(item, goal)
+        return [(index, {"result": {"plan": result}, "session_id": session_id})]
+
+    return _batch_response(request, [[pair] for pair in enumerate(request.items)], generate, "Plan generation failed")
+
+@app.post("/plan", response_model=PlanPipelineResponse, summary="Run the planning pipeline in one call with overlapping stages")
+async def plan_pipeline_endpoint(request: PlanPipelineRequest, response: Response, use_cache: bool = Depends(allow_cached_response)):
+    await _load_session(request.session_id)
+    try:
+        result = await run_plan_pipeline(request.goal, request.plan, request.details, use_cache)
+        outputs = {"compliant": result.compliant}
+        if result.further_info is not None:
+            outputs["further_info"] = result.further_info.model_dump()
+        if result.final_plan is not None:
+            outputs.update(details=request.details, final_plan=result.final_plan)
+        if result.time_series is not None:
+            outputs["time_series"] = to_document_tasks(result.time_series)
+        await _save_session(response, request.session_id, goal=request.goal, plan=request.plan, **outputs)
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Time series generation failed: {str(e)}")
+        raise _http_error(e, "Plan pipeline failed")
+
+@app.get("/ready", summary="200 once the model clients and schemas are warm, 503 before")
+async def ready_endpoint(response: Response):
+    if not is_ready():
+        response.status_code = 503
+    return warmup_status()
+
+@app.get("/sessions/stats", summary="Plan store size and read/write/flush counters")
+async def session_stats_endpoint():
+    return get_plan_store().stats()
+
+@app.get("/sessions/{session_id}", summary="The stored planning session, in the document shape of mongo/schema.mongo.js")
+async def get_session_endpoint(session_id: str):
+    return await _load_session(session_id)
+
+@app.delete("/sessions/{session_id}", summary="Delete a planning session")
+async def delete_session_endpoint(session_id: str):
+    if not await get_plan_store().adelete(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session: {session_id}")
+    return {"deleted": session_id}
+
+@app.get("/cache/stats", summary="Response cache and request coalescing counters")
+async def cache_stats_endpoint():
+    index = get_similar_goal_index(FURTHER_INFO_PROMPT_VERSION)
+    return {**get_response_cache().stats(), "coalescing": singleflight_stats(),
+            "similar_goals": index.stats() if index is not None else None}
+
+@app.get("/moderation/stats", summary="Policy checks decided locally, sent upstream or settled by the failure mode")
+async def moderation_stats_endpoint():
+    return moderation_stats()
+
+@app.get("/scheduler/stats", summary="Admission, queueing and upstream rate-limit counters per model")
+async def scheduler_stats_endpoint():
+    return get_scheduler().stats()
+
+@app.get("/router/stats", summary="Model tier choices, hedged and fallback calls, deadlines and rolling latency per stage")
+async def router_stats_endpoint():
+    return get_router().stats()
+
+@app.get("/validation/stats", summary="Items repaired locally, regenerated or dropped by output validation")
+async def validation_stats_endpoint():
+    return validation_stats()
+
+def _service_gauges():
+    # The counters behind the /*/stats endpoints, read at scrape time.
+    for model, stats in get_scheduler().stats().items():
+        for key, value in stats.items():
+            yield f"planning_scheduler_{key}", "Scheduler counters per model (see /scheduler/stats)", {"model": model}, value
+    cache = get_response_cache().stats()
+    for tier, stats in cache["tiers"].items():
+        for key, value in stats.items():
+            yield f"planning_cache_{key}", "Response cache counters per tier (see /cache/stats)", {"tier": tier}, value
+    index = get_similar_goal_index(FURTHER_INFO_PROMPT_VERSION)
+    for key, value in (index.stats() if index is not None else {}).items():
+        yield f"planning_similar_goals_{key}", "Near-duplicate further-info index counters (see /cache/stats)", {}, value
+    for group, stats in singleflight_stats().items():
+        for key, value in stats.items():
+            yield f"planning_coalescing_{key}", "Request coalescing counters per stage", {"stage": group}, value
+    moderation = moderation_stats()
+    for verdict, value in moderation.pop("pre_moderation").items():
+        yield "planning_pre_moderation_parts", "Goal and plan texts by local pre-moderation verdict", {"verdict": verdict}, value
+    for key, value in moderation.items():
+        yield f"planning_moderation_{key}", "Policy check totals (see /moderation/stats)", {}, value
+    for stage, stats in get_router().stats().items():
+        for model, model_stats in stats.pop("models").items():
+            for key, value in model_stats.items():
+                yield f"planning_router_model_{key}", "Calls routed and rolling latency per stage and model (see /router/stats)", {"stage": stage, "model": model}, value
+        for key, value in stats.items():
+            yield f"planning_router_{key}", "Model router counters per stage (see /router/stats)", {"stage": stage}, value
+    for key, value in validation_stats().items():
+        yield f"planning_validation_{key}", "Output validation totals (see /validation/stats)", {}, value
+    for key, value in get_plan_store().stats().items():
+        if isinstance(value, (int, float)):
+            yield f"planning_sessions_{key}", "Plan store counters (see /sessions/stats)", {}, value
+
+register_collector(_service_gauges)
+
+@app.get("/metrics", summary="Latency, queue wait, token, cost and service counters in Prometheus text format")
+async def metrics_endpoint():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 # ---------------------------
 # Run the service
@@ -0,0 +1,260 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import json
+import math
+import os
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+
+load_dotenv()
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+# Add a Server-Timing header (queue wait and model time per stage) to responses. This is the
+# default; a request can ask for it or turn it off with "X-Server-Timing: 1" or "0".
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "0").lower() in ("1", "true", "yes")
+# USD per million tokens, used for the cost estimate; override with a JSON object in LLM_PRICES,
+# e.g. {"gpt-4o": {"prompt": 2.5, "completion": 10}}. Model names match by prefix.
+DEFAULT_PRICES: Dict[str, Dict[str, float]] = {
+    "gpt-4o": {"prompt": 2.5, "completion": 10.0},
+    "gpt-4o-mini": {"prompt": 0.15, "completion": 0.6},
+}
+LLM_PRICES = {**DEFAULT_PRICES, **json.loads(os.getenv("LLM_PRICES", "{}"))}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+# ---------- Metric types (Prometheus text exposition format) ----------
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    return "+Inf" if value == math.inf else repr(float(value))
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_text(self.labels, k)} {_number(v)}" for k, v in sorted(self._values.items())]
+        return lines
+
+class Histogram:
+    """Fixed-bucket histogram; observing is a bisect and two additions."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            # Per-bucket counts (the last one is +Inf), sum, count.
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+REQUEST_SECONDS = Histogram("planning_request_duration_seconds", "HTTP request latency by endpoint",
+                            ["method", "endpoint", "status"])
+MODEL_CALL_SECONDS = Histogram("planning_model_call_duration_seconds", "Upstream model call latency, excluding queueing",
+                               ["model", "stage", "outcome"])
+QUEUE_WAIT_SECONDS = Histogram("planning_model_queue_wait_seconds", "Time spent waiting for admission by the scheduler",
+                               ["model", "stage"])
+MODEL_TOKENS = Counter("planning_model_tokens_total", "Tokens reported by the model responses", ["model", "stage", "kind"])
+MODEL_COST = Counter("planning_model_cost_usd_total", "Estimated spend from token usage and LLM_PRICES", ["model", "stage"])
+STRUCTURED_FAILURES = Counter("planning_structured_output_failures_total",
+                              "Model responses that failed to parse or validate against their schema", ["model", "stage"])
+
+_METRICS = [REQUEST_SECONDS, MODEL_CALL_SECONDS, QUEUE_WAIT_SECONDS, MODEL_TOKENS, MODEL_COST, STRUCTURED_FAILURES]
+_collectors: List[Callable[[], Iterator[Tuple[str, str, Dict[str, str], float]]]] = []
+
+def register_collector(collect: Callable[[], Iterator[Tuple[str, str, Dict[str, str], float]]]) -> None:
+    """Add a source of gauges read at scrape time; it yields (name, help, labels, value)."""
+    _collectors.append(collect)
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines += metric.render()
+    described = set()
+    for collect in _collectors:
+        for name, help, labels, value in collect():
+            if name not in described:
+                described.add(name)
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            lines.append(f"{name}{_label_text(list(labels), list(labels.values()))} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------- Hot-path hooks ----------
+
+# (model, stage) of the model call running in this task, so token usage can be attributed.
+_current_call: ContextVar[Optional[Tuple[str, str]]] = ContextVar("current_model_call", default=None)
+# Server-Timing entries of the request being served: name -> [seconds, count].
+_request_timings: ContextVar[Optional[Dict[str, list]]] = ContextVar("request_timings", default=None)
+
+def _add_timing(name: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+def record_queue_wait(model: str, stage: str, seconds: float) -> None:
+    if METRICS_ENABLED:
+        QUEUE_WAIT_SECONDS.observe(seconds, model, stage)
+        _add_timing(f"{stage}-queue", seconds)
+
+def record_structured_failure(model: str, stage: str) -> None:
+    if METRICS_ENABLED:
+        STRUCTURED_FAILURES.inc(model, stage)
+
+class ModelCall:
+    # Set by a caller that handles the call's error itself (e.g. a retried rate limit).
+    outcome: Optional[str] = None
+
+@contextmanager
+def model_call(model: str, stage: str):
+    """Time one upstream call and attribute the token usage reported while it runs."""
+    call = ModelCall()
+    if not METRICS_ENABLED:
+        yield call
+        return
+    # Restored by value rather than with a reset token: a streaming generator may be closed from another context.
+    previous = _current_call.get()
+    _current_call.set((model, stage))
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield call
+        outcome = call.outcome or "ok"
+    except ValueError:
+        # Parsing happens inside the call for structured output; pydantic errors are ValueErrors.
+        STRUCTURED_FAILURES.inc(model, stage)
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        _current_call.set(previous)
+        MODEL_CALL_SECONDS.observe(elapsed, model, stage, outcome)
+        _add_timing(stage, elapsed)
+
+def _price(model: str) -> Optional[Dict[str, float]]:
+    matches = [name for name in LLM_PRICES if model.startswith(name)]
+    return LLM_PRICES[max(matches, key=len)] if matches else None
+
+def record_usage(prompt_tokens: int, completion_tokens: int) -> None:
+    call = _current_call.get()
+    if call is None:
+        return
+    model, stage = call
+    MODEL_TOKENS.inc(model, stage, "prompt", amount=prompt_tokens)
+    MODEL_TOKENS.inc(model, stage, "completion", amount=completion_tokens)
+    price = _price(model)
+    if price:
+        MODEL_COST.inc(model, stage, amount=(prompt_tokens * price["prompt"] + completion_tokens * price["completion"]) / 1e6)
+
+class UsageCallback(BaseCallbackHandler):
+    """Reads token usage off every chat model response, streamed or not."""
+
+    # Run in the caller's context (not a thread pool) so the current stage is visible.
+    run_inline = True
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        if not METRICS_ENABLED:
+            return
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        if usage:
+            record_usage(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+            return
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        if token_usage:
+            record_usage(token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0))
+
+
+# ---------- ASGI middleware ----------
+
+class MetricsMiddleware:
+    """Times every HTTP request by route template and, if requested, adds a Server-Timing header.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, which would add a
+    task and a memory stream to every request and buffer streaming responses.
+    """
+
+    def __init__(self, app, server_timing: bool = METRICS_SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        timings: Dict[str, list] = {}
+        token = _request_timings.set(timings)
+        status = 500
+        server_timing = _wants_server_timing(scope, self.server_timing)
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if server_timing:
+                    message = {**message, "headers": list(message.get("headers", []))
+                               + [(b"server-timing", _server_timing(timings, started).encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], endpoint, str(status))
+
+def _wants_server_timing(scope, default: bool) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-server-timing":
+            value = value.decode("latin-1").strip().lower()
+            if value in ("1", "true", "yes"):
+                return True
+            if value in ("0", "false", "no"):
+                return False
+    return default
+
+def _server_timing(timings: Dict[str, list], started: float) -> str:
+    entries = [f'{name};dur={seconds * 1000:.1f};desc="{count} call(s)"' for name, (seconds, count) in timings.items()]
+    entries.append(f"app;dur={(time.perf_counter() - started) * 1000:.1f}")
+    return ", ".join(entries)
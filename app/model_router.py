@@ -0,0 +1,224 @@
+from collections import Counter, deque
+from contextvars import Context, ContextVar, copy_context
+from dotenv import load_dotenv
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import asyncio
+import json
+import os
+import time
+
+load_dotenv()
+# Models for each stage, from preferred to fastest; "default" covers the stages not listed. The
+# first tier whose rolling p95 fits the remaining budget is called; later tiers are the hedge
+# and fallback targets. Override with a JSON object in LLM_MODEL_TIERS.
+DEFAULT_MODEL_TIERS: Dict[str, List[str]] = {
+    "default": ["gpt-4o", "gpt-4o-mini"],
+    "check_policy": ["moderation"],
+}
+LLM_MODEL_TIERS = {**DEFAULT_MODEL_TIERS, **json.loads(os.getenv("LLM_MODEL_TIERS", "{}"))}
+# Seconds an endpoint may take, queueing included; a request can ask for another budget with the
+# X-Latency-Budget header. Override with a JSON object in LLM_LATENCY_BUDGETS.
+DEFAULT_LATENCY_BUDGETS: Dict[str, float] = {
+    "/check-policy/": 15,
+    "/get-further-info/": 45,
+    "/get-final-plan/": 120,
+    "/get-time-series/": 180,
+    "/update-time-series/": 180,
+    "/plan": 300,
+}
+LLM_LATENCY_BUDGETS = {**DEFAULT_LATENCY_BUDGETS, **json.loads(os.getenv("LLM_LATENCY_BUDGETS", "{}"))}
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "1").lower() not in ("0", "false", "no")
+# Samples needed before a model's p95 is trusted for routing and hedging.
+LLM_ROUTER_MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "20"))
+# Latest call durations kept per model and stage.
+LLM_ROUTER_WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "200"))
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's latency budget runs out; maps to 504."""
+
+    status_code = 504
+
+# Absolute time.monotonic() by which the request being served must finish, if it has a budget.
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+def set_deadline(seconds: Optional[float]) -> None:
+    """Give the current request ``seconds`` from now; an earlier deadline already set is kept."""
+    if seconds is None:
+        return
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    _deadline.set(at if current is None else min(current, at))
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline (None when it has none)."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+def detached_context() -> Context:
+    """A copy of the current context without the request's deadline, for work shared by several requests."""
+    context = copy_context()
+    context.run(_deadline.set, None)
+    return context
+
+async def within_deadline(awaitable: Awaitable[Any], stage: str) -> Any:
+    """Await ``awaitable`` until the current request's deadline, then cancel it and raise DeadlineExceeded."""
+    future = asyncio.ensure_future(awaitable)
+    left = remaining()
+    try:
+        done, _ = await asyncio.wait({future}, timeout=None if left is None else max(0.0, left))
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    if not done:
+        future.cancel()
+        get_router().counts[(stage, "deadline_exceeded")] += 1
+        raise DeadlineExceeded(f"{stage} did not finish within the latency budget")
+    return future.result()
+
+def _percentile(values: Deque[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class ModelRouter:
+    """Picks a model tier per call from rolling latency, hedges slow calls and enforces deadlines."""
+
+    def __init__(self, tiers: Dict[str, List[str]] = LLM_MODEL_TIERS, hedge: bool = LLM_HEDGE_ENABLED,
+                 min_samples: int = LLM_ROUTER_MIN_SAMPLES, window: int = LLM_ROUTER_WINDOW):
+        self.tiers = tiers
+        self.hedge = hedge
+        self.min_samples = min_samples
+        self.window = window
+        self._latency: Dict[Tuple[str, str], Deque[float]] = {}
+        self.counts: Counter = Counter()
+        self.routed: Counter = Counter()
+
+    def tiers_for(self, stage: str) -> List[str]:
+        return self.tiers.get(stage) or self.tiers["default"]
+
+    def preferred(self, stage: str) -> str:
+        return self.tiers_for(stage)[0]
+
+    def p95(self, model: str, stage: str) -> Optional[float]:
+        samples = self._latency.get((model, stage))
+        if not samples or len(samples) < self.min_samples:
+            return None
+        return _percentile(samples, 95)
+
+    def record(self, model: str, stage: str, seconds: float) -> None:
+        samples = self._latency.get((model, stage))
+        if samples is None:
+            samples = self._latency[(model, stage)] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def choose(self, stage: str, budget: Optional[float]) -> List[str]:
+        """Tiers to use, in order: the first whose p95 fits ``budget`` (unknown counts as fitting), then the faster ones."""
+        tiers = self.tiers_for(stage)
+        if budget is None:
+            return list(tiers)
+        for index, model in enumerate(tiers):
+            p95 = self.p95(model, stage)
+            if p95 is None or p95 <= budget:
+                return list(tiers[index:])
+        return [tiers[-1]]
+
+    async def run(self, stage: str, call: Callable[[str], Awaitable[Any]]) -> Tuple[Any, str]:
+        """Run ``call(model)`` on the chosen tier and return (result, model).
+
+        Once the primary has run for its rolling p95, the next tier is called
+        as well and the first success wins. If the call fails, the next tier
+        is tried. When the request's deadline passes, whatever is still
+        running is cancelled and DeadlineExceeded is raised.
+        """
+        budget = remaining()
+        if budget is not None and budget <= 0:
+            self.counts[(stage, "deadline_exceeded")] += 1
+            raise DeadlineExceeded(f"latency budget exhausted before {stage}")
+        tiers = self.choose(stage, budget)
+        primary, spare = tiers[0], tiers[1:]
+        self.routed[(stage, primary)] += 1
+        hedge_at = self.p95(primary, stage) if self.hedge and spare else None
+        started = time.monotonic()
+        running: Dict[asyncio.Task, str] = {}
+        hedges = set()
+
+        async def attempt(model: str) -> Any:
+            began = time.monotonic()
+            try:
+                result = await call(model)
+            except asyncio.CancelledError:
+                # A lower bound, but dropping cancelled calls would pull the p95 of slow models down.
+                self.record(model, stage, time.monotonic() - began)
+                raise
+            self.record(model, stage, time.monotonic() - began)
+            return result
+
+        def start(model: str) -> asyncio.Task:
+            task = asyncio.ensure_future(attempt(model))
+            running[task] = model
+            return task
+
+        start(primary)
+        error: Optional[BaseException] = None
+        try:
+            while running:
+                until_hedge = None if hedge_at is None else started + hedge_at - time.monotonic()
+                waits = [w for w in (remaining(), until_hedge) if w is not None]
+                done, _ = await asyncio.wait(running, timeout=max(0.0, min(waits)) if waits else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    left = remaining()
+                    if left is not None and left <= 0:
+                        self.counts[(stage, "deadline_exceeded")] += 1
+                        raise DeadlineExceeded(f"{stage} did not finish within the latency budget")
+                    if hedge_at is not None and time.monotonic() - started >= hedge_at:
+                        # The primary is slower than its p95: race it against the next tier.
+                        hedge_at = None
+                        self.counts[(stage, "hedged")] += 1
+                        hedges.add(start(spare.pop(0)))
+                    continue
+                for task in done:
+                    model = running.pop(task)
+                    if task.exception() is None:
+                        if model != primary:
+                            # By how it was started: a hedge can win after the primary has failed.
+                            self.counts[(stage, "hedge_won" if task in hedges else "fallback_won")] += 1
+                        return task.result(), model
+                    error = task.exception()
+                if not running and spare:
+                    hedge_at = None
+                    self.counts[(stage, "fallback")] += 1
+                    start(spare.pop(0))
+            raise error
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        stages: Dict[str, Any] = {}
+        for (stage, event), value in self.counts.items():
+            stages.setdefault(stage, {"models": {}})[event] = value
+        for (stage, model), value in self.routed.items():
+            stages.setdefault(stage, {"models": {}})["models"][model] = {"routed": value}
+        for (model, stage), samples in self._latency.items():
+            stages.setdefault(stage, {"models": {}})["models"].setdefault(model, {"routed": 0}).update(
+                samples=len(samples),
+                p50_ms=round(_percentile(samples, 50) * 1000, 1),
+                p95_ms=round(_percentile(samples, 95) * 1000, 1),
+            )
+        return stages
+
+
+_router: Optional[ModelRouter] = None
+
+def get_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        _router = ModelRouter()
+    return _router
+
+def set_router(router: Optional[ModelRouter]) -> None:
+    global _router
+    _router = router
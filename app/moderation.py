@@ -1,14 +1,163 @@
-from langchain.chains import OpenAIModerationChain
-from dotenv import load_dotenv
+from llm_clients import get_clients
+from llm_cache import get_response_cache, make_cache_key
+from singleflight import SingleFlight
+from scheduler import get_scheduler
+from model_router import DeadlineExceeded, get_router
+from pre_moderation import Verdict, get_pre_moderator
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
 import os
 
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+VIOLATION_OUTPUT = "Text was found that violates OpenAI's content policy."
+# Bump when the moderation input or interpretation changes so old cache entries are not reused.
+# 2: goal and plan are moderated (and cached) separately.
+MODERATION_PROMPT_VERSION = "2"
+# Inputs sent in one moderation request by acheck_policy_batch.
+MODERATION_BATCH_SIZE = int(os.getenv("MODERATION_BATCH_SIZE", "32"))
+# What an upstream moderation failure means: "error" raises it, "open" treats the text as
+# compliant, "closed" as a violation.
+MODERATION_FAILURE_MODE = os.getenv("MODERATION_FAILURE_MODE", "error").lower()
+
+_moderation_flight = SingleFlight("check_policy")
+_totals: Counter = Counter()
+
+def _is_compliant(result: dict) -> bool:
+    # Returns False if prohibited content is found, True if safe
+    return result["output"] != VIOLATION_OUTPUT
+
+def _part_key(text: str) -> str:
+    return make_cache_key("check_policy", "moderation", MODERATION_PROMPT_VERSION, {}, text)
+
+def _pre_moderate(goal: str, plan: str) -> Tuple[Optional[bool], List[str]]:
+    """Local verdict for a goal and plan: (decision, parts left for the moderation model).
+
+    The decision is False when either part is blocked, True when both are
+    allowed, and None when some part has to go upstream.
+    """
+    pre_moderator = get_pre_moderator()
+    verdicts = [(text, pre_moderator.classify(text)) for text in (goal, plan)]
+    _totals["checked"] += 1
+    if any(verdict is Verdict.BLOCK for _, verdict in verdicts):
+        _totals["short_circuited"] += 1
+        return False, []
+    upstream = [text for text, verdict in verdicts if verdict is Verdict.UPSTREAM]
+    if not upstream:
+        _totals["short_circuited"] += 1
+        return True, []
+    return None, upstream
+
+def _on_failure(e: Exception) -> bool:
+    # A spent latency budget says nothing about the text, so it is never turned into a verdict.
+    if isinstance(e, DeadlineExceeded):
+        raise e
+    if MODERATION_FAILURE_MODE == "open":
+        _totals["failed_open"] += 1
+        return True
+    if MODERATION_FAILURE_MODE == "closed":
+        _totals["failed_closed"] += 1
+        return False
+    raise e
+
+def moderation_stats() -> Dict[str, int]:
+    """Process-wide policy check totals and the local pre-moderation verdicts per part."""
+    totals = {key: _totals[key] for key in ("checked", "short_circuited", "upstream_calls", "failed_open", "failed_closed")}
+    return {**totals, "pre_moderation": get_pre_moderator().stats()}
 
 def check_policy(goal: str, plan: str) -> bool:
     """Uses OpenAI's Moderation API via LangChain to check content safety."""
-    moderation_chain = OpenAIModerationChain(error_on_moderation=False, openai_api_key=OPENAI_API_KEY)
-    result = moderation_chain.invoke(goal + plan)
-    if result["output"] == "Text was found that violates OpenAI's content policy.":
-        return False
-    return True  # Returns False if prohibited content is found, True if safe
\ No newline at end of file
+    decision, parts = _pre_moderate(goal, plan)
+    if decision is not None:
+        return decision
+    moderation_chain = get_clients().moderation()
+    for text in parts:
+        _totals["upstream_calls"] += 1
+        try:
+            compliant = _is_compliant(moderation_chain.invoke(text))
+        except Exception as e:
+            compliant = _on_failure(e)
+        if not compliant:
+            return False
+    return True
+
+async def _flagged(texts: List[str]) -> List[bool]:
+    clients = get_clients()
+
+    async def call(model: str) -> List[bool]:
+        return await get_scheduler().run(model, "check_policy", 0, lambda: clients.amoderate(texts))
+
+    _totals["upstream_calls"] += 1
+    flagged, _ = await get_router().run("check_policy", call)
+    return flagged
+
+async def _amoderate(missing: Dict[str, str]) -> bool:
+    # Parts not in the cache go up in one request (the endpoint takes a list) but are cached one by one.
+    cache = get_response_cache()
+
+    async def moderate() -> bool:
+        flagged = await _flagged(list(missing.values()))
+        for key, is_flagged in zip(missing, flagged):
+            await cache.aset(key, not is_flagged)
+        return not any(flagged)
+
+    try:
+        return await _moderation_flight.do("|".join(missing), moderate)
+    except Exception as e:
+        return _on_failure(e)
+
+async def acheck_policy(goal: str, plan: str, use_cache: bool = True) -> bool:
+    """Async variant of check_policy that awaits the shared moderation client.
+
+    Clear cases are decided locally by pre_moderation. Otherwise goal and plan
+    are cached separately, so a known goal is not moderated again with a new
+    plan; pass use_cache=False to skip the lookup and store a fresh result.
+    Identical checks already in flight share one upstream call.
+    """
+    decision, parts = _pre_moderate(goal, plan)
+    if decision is not None:
+        return decision
+    cache = get_response_cache()
+    missing = {}
+    for text in parts:
+        key = _part_key(text)
+        cached = await cache.alookup(key, use_cache)
+        if cached is False:
+            return False
+        if cached is None:
+            missing[key] = text
+    return await _amoderate(missing) if missing else True
+
+async def acheck_policy_batch(items: List[Tuple[str, str]], use_cache: bool = True) -> List[bool]:
+    """Check several (goal, plan) pairs with one moderation call for everything not cached.
+
+    The moderation endpoint takes a list of inputs, so a batch costs one upstream
+    request (and one unit of the rate budget) instead of one per item. Parts
+    decided locally are not sent, and repeated parts within the batch are sent
+    once. Callers keep batches within MODERATION_BATCH_SIZE.
+    """
+    cache = get_response_cache()
+    decisions, results, missing = [], {}, {}
+    for goal, plan in items:
+        decision, parts = _pre_moderate(goal, plan)
+        keys = [_part_key(text) for text in parts]
+        decisions.append((decision, keys))
+        for key, text in zip(keys, parts):
+            if key in results or key in missing:
+                continue
+            cached = await cache.alookup(key, use_cache)
+            if cached is not None:
+                results[key] = cached
+            else:
+                missing[key] = text
+
+    if missing:
+        try:
+            flagged = await _flagged(list(missing.values()))
+        except Exception as e:
+            # Not cached: a failure decides this batch only.
+            compliant = _on_failure(e)
+            results.update((key, compliant) for key in missing)
+        else:
+            for key, is_flagged in zip(missing, flagged):
+                results[key] = not is_flagged
+                await cache.aset(key, results[key])
+    return [decision if decision is not None else all(results[key] for key in keys) for decision, keys in decisions]
@@ -0,0 +1,153 @@
+from pydantic import BaseModel, Field
+from typing import Iterator, List, Tuple
+from datetime import date
+import json
+import os
+import numpy as np
+from time_series_tasks_generator import Tasks, TimeSeriesTask, RepeatType
+from task_validation import normalize_date
+
+# Days expanded per step; bounds memory for multi-year windows.
+OCCURRENCE_CHUNK_DAYS = int(os.getenv("OCCURRENCE_CHUNK_DAYS", "92"))
+# Longest window /expand-occurrences accepts.
+OCCURRENCE_MAX_WINDOW_DAYS = int(os.getenv("OCCURRENCE_MAX_WINDOW_DAYS", "3660"))
+
+class Occurrence(BaseModel):
+    task_index: int = Field(description="Position of the task in the Tasks payload")
+    task_name: str = Field(description="The name of the task")
+    date: str = Field(description="The date of the occurrence in YYYY-MM-DD format")
+    time_in_day: str = Field(description="The time of the day in HH:MM format")
+
+_WEEKLY, _MONTHLY, _PERIODIC, _DATED = range(4)
+
+def day_number(value: str) -> int:
+    """Days since 1970-01-01 of a YYYY-MM-DD date."""
+    normalized = normalize_date(value)
+    if normalized is None:
+        raise ValueError(f"{value!r} is not a YYYY-MM-DD date")
+    return int(np.datetime64(normalized, "D").astype(np.int64))
+
+def _bits(values: List[int], low: int, high: int, offset: int) -> int:
+    return sum(1 << (v - offset) for v in set(values) if low <= v <= high)
+
+class _Rules:
+    """All tasks' recurrences as parallel arrays, so a chunk is evaluated for every task at once.
+
+    Weekly patterns (everyday, workday, weekend, weekday) are a 7-bit mask
+    indexed by weekday (bit 0 = Monday), monthly ones a 31-bit mask indexed
+    by day of month, periodic ones a period counted from the start date.
+    Single dates and specific lists are kept as (task, day) pairs.
+    """
+
+    def __init__(self, tasks: Tasks):
+        rows, pairs = [], []
+        for index, task in enumerate(tasks.tasks):
+            try:
+                row = self._parse(index, task, pairs)
+            except ValueError:
+                # Unparseable dates; run the task through task_validation first to repair them.
+                continue
+            rows.append(row)
+        columns = list(zip(*rows)) or [()] * 6
+        self.index, self.kind, self.start, self.end, self.mask, self.period = (np.array(c, dtype=np.int64) for c in columns)
+        self.monthday_max = np.array([m.bit_length() for m in self.mask.tolist()], dtype=np.int64)
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        self.dated_index, self.dated_day = pairs[:, 0], pairs[:, 1]
+
+    @staticmethod
+    def _parse(index: int, task: TimeSeriesTask, pairs: list) -> tuple:
+        duration = task.task_duration
+        if hasattr(duration, "date"):
+            day = day_number(duration.date)
+            pairs.append((index, day))
+            return index, _DATED, day, day, 0, 1
+        start, end = day_number(duration.start_date), day_number(duration.end_date)
+        schedule = duration.schedule
+        if duration.repeat == RepeatType.EVERYDAY:
+            return index, _WEEKLY, start, end, 0b1111111, 1
+        if hasattr(schedule, "on_workday"):
+            return index, _WEEKLY, start, end, _bits(schedule.on_workday, 1, 5, 1), 1
+        if hasattr(schedule, "on_weekend"):
+            # 1 = Saturday, 2 = Sunday.
+            return index, _WEEKLY, start, end, _bits(schedule.on_weekend, 1, 2, -4), 1
+        if hasattr(schedule, "on_weekday"):
+            return index, _WEEKLY, start, end, _bits(schedule.on_weekday, 1, 7, 1), 1
+        if hasattr(schedule, "on_monthday"):
+            return index, _MONTHLY, start, end, _bits(schedule.on_monthday, 1, 31, 1), 1
+        if hasattr(schedule, "periodic"):
+            return index, _PERIODIC, start, end, 0, max(1, schedule.periodic)
+        for item in schedule.specific:
+            day = day_number(item.date)
+            if start <= day <= end:
+                pairs.append((index, day))
+        return index, _DATED, start, end, 0, 1
+
+    def hits(self, first: int, last: int, task_count: int) -> np.ndarray:
+        """Boolean (days x tasks) matrix of occurrences in [first, last]."""
+        days = np.arange(first, last + 1, dtype=np.int64)
+        hits = np.zeros((len(days), task_count), dtype=bool)
+        active = (self.start <= last) & (self.end >= first)
+        in_range = lambda rows: (days[:, None] >= self.start[rows]) & (days[:, None] <= self.end[rows])
+
+        rows = np.flatnonzero(active & (self.kind == _WEEKLY))
+        if len(rows):
+            # 1970-01-01 was a Thursday.
+            weekday = (days + 3) % 7
+            hits[:, self.index[rows]] = ((self.mask[rows] >> weekday[:, None]) & 1).astype(bool) & in_range(rows)
+
+        rows = np.flatnonzero(active & (self.kind == _MONTHLY))
+        if len(rows):
+            dates = days.astype("datetime64[D]")
+            months = dates.astype("datetime64[M]")
+            monthday = (dates - months.astype("datetime64[D]")).astype(np.int64) + 1
+            length = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(np.int64)
+            listed = ((self.mask[rows] >> (monthday[:, None] - 1)) & 1).astype(bool)
+            # A day past the end of a short month (e.g. 31 in April) falls on its last day.
+            clamped = (monthday == length)[:, None] & (self.monthday_max[rows] > length[:, None])
+            hits[:, self.index[rows]] = (listed | clamped) & in_range(rows)
+
+        rows = np.flatnonzero(active & (self.kind == _PERIODIC))
+        if len(rows):
+            due = (days[:, None] - self.start[rows]) % self.period[rows] == 0
+            hits[:, self.index[rows]] = due & in_range(rows)
+
+        dated = (self.dated_day >= first) & (self.dated_day <= last)
+        hits[self.dated_day[dated] - first, self.dated_index[dated]] = True
+        return hits
+
+def iter_occurrence_chunks(tasks: Tasks, start_date: str, end_date: str,
+                           chunk_days: int = OCCURRENCE_CHUNK_DAYS) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Yield ``(task_indexes, dates)`` array pairs covering [start_date, end_date], in date order.
+
+    The window is processed ``chunk_days`` at a time, so memory follows the
+    chunk rather than the window. Occurrences on the same day are in task
+    order. Tasks whose dates cannot be parsed are skipped.
+    """
+    rules = _Rules(tasks)
+    first, last = day_number(start_date), day_number(end_date)
+    while first <= last:
+        chunk_last = min(first + chunk_days - 1, last)
+        day_offsets, indexes = np.nonzero(rules.hits(first, chunk_last, len(tasks.tasks)))
+        if len(indexes):
+            yield indexes, (day_offsets + first).astype("datetime64[D]")
+        first = chunk_last + 1
+
+def iter_occurrences(tasks: Tasks, start_date: str, end_date: str) -> Iterator[Occurrence]:
+    for indexes, dates in iter_occurrence_chunks(tasks, start_date, end_date):
+        for index, day in zip(indexes.tolist(), dates.astype(str).tolist()):
+            task = tasks.tasks[index]
+            yield Occurrence(task_index=index, task_name=task.task_name, date=day, time_in_day=task.time_in_day)
+
+def iter_occurrence_lines(tasks: Tasks, start_date: str, end_date: str) -> Iterator[str]:
+    """NDJSON lines of occurrences, one block per chunk, for streaming responses."""
+    # Serialize the per-task part of each line once instead of once per occurrence.
+    prefixes = [
+        '{"task_index": %d, "task_name": %s, "time_in_day": %s, "date": "' % (
+            index, json.dumps(task.task_name), json.dumps(task.time_in_day))
+        for index, task in enumerate(tasks.tasks)
+    ]
+    for indexes, dates in iter_occurrence_chunks(tasks, start_date, end_date):
+        yield "".join(f'{prefixes[i]}{d}"}}\n' for i, d in zip(indexes.tolist(), dates.astype(str).tolist()))
+
+def window_days(start_date: str, end_date: str) -> int:
+    return (date.fromisoformat(end_date) - date.fromisoformat(start_date)).days + 1
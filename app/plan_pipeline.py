@@ -0,0 +1,116 @@
+from pydantic import BaseModel, Field
+from typing import Awaitable, List, Optional
+import asyncio
+import time
+from model_router import DeadlineExceeded
+from moderation import acheck_policy
+from further_info_analyzer import aget_further_info_fc_pydantic_schema, FurtherInfoResponse
+from final_plan_generator import aget_final_plan
+from time_series_tasks_generator import aget_time_series_data_tool_call, Tasks
+from task_validation import avalidate_tasks, repair_further_info, ValidationReport
+
+class StageTiming(BaseModel):
+    stage: str = Field(description="Name of the pipeline stage")
+    status: str = Field(description="ok, error, cancelled or deadline")
+    start_ms: float = Field(description="Start offset from the beginning of the pipeline in milliseconds")
+    end_ms: float = Field(description="End offset from the beginning of the pipeline in milliseconds")
+    duration_ms: float = Field(description="Time spent in the stage in milliseconds")
+
+class PlanPipelineResponse(BaseModel):
+    compliant: bool = Field(description="Whether the goal and plan passed the policy check")
+    further_info: Optional[FurtherInfoResponse] = Field(default=None, description="Further information needed, when no details were supplied")
+    final_plan: Optional[str] = Field(default=None, description="The generated markdown plan, when details were supplied")
+    time_series: Optional[Tasks] = Field(default=None, description="Time series tasks for the final plan, when details were supplied")
+    validation: Optional[ValidationReport] = Field(default=None, description="Local repairs and regenerations applied to the returned further info or tasks")
+    partial: bool = Field(default=False, description="True when the latency budget ran out after the final plan, so time_series is left out")
+    timings: List[StageTiming] = Field(description="Per-stage timing breakdown")
+    total_ms: float = Field(description="Wall-clock time of the whole pipeline in milliseconds")
+    sequential_ms: float = Field(description="Sum of stage durations, i.e. the time the stages would take back to back")
+
+class _Timer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: List[StageTiming] = []
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    async def run(self, stage: str, coro: Awaitable):
+        start = self.elapsed_ms()
+        status = "error"
+        try:
+            result = await coro
+            status = "ok"
+            return result
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except DeadlineExceeded:
+            status = "deadline"
+            raise
+        finally:
+            end = self.elapsed_ms()
+            self.timings.append(StageTiming(stage=stage, status=status, start_ms=round(start, 2),
+                                            end_ms=round(end, 2), duration_ms=round(end - start, 2)))
+
+async def _cancel(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+
+async def run_plan_pipeline(user_goal: str, user_plan: str, user_details: Optional[list] = None,
+                            use_cache: bool = True) -> PlanPipelineResponse:
+    """Run the planning stages in one call, overlapping them with the policy check.
+
+    Without details, the further-info analysis starts alongside the moderation
+    check. With details, the analysis is not needed, so final-plan generation
+    starts alongside the moderation check instead, followed by time-series
+    generation. Either way the speculative work is cancelled if moderation
+    fails. If the request's latency budget runs out once the final plan is
+    ready, the plan is returned with partial=True; earlier, DeadlineExceeded
+    is raised.
+    """
+    timer = _Timer()
+    moderation = asyncio.create_task(timer.run("check_policy", acheck_policy(user_goal, user_plan, use_cache)))
+    if user_details:
+        speculative = asyncio.create_task(timer.run("final_plan", aget_final_plan(user_goal, user_details)))
+    else:
+        speculative = asyncio.create_task(timer.run("further_info", aget_further_info_fc_pydantic_schema(user_goal, user_plan, use_cache)))
+
+    try:
+        compliant = await moderation
+    except BaseException:
+        await _cancel(speculative)
+        raise
+    if not compliant:
+        await _cancel(speculative)
+        return _response(timer, compliant=False)
+
+    if not user_details:
+        further_info, report = repair_further_info(await speculative)
+        return _response(timer, compliant=True, further_info=further_info, validation=report)
+
+    final_plan = await speculative
+    further_info = {"info_needed": user_details}
+    try:
+        time_series = await timer.run(
+            "time_series", aget_time_series_data_tool_call(user_goal, user_plan, further_info, final_plan)
+        )
+        time_series, report = await timer.run(
+            "validation", avalidate_tasks(time_series, user_goal, further_info, final_plan)
+        )
+    except DeadlineExceeded:
+        # Unvalidated tasks may still hold the items validation was regenerating; the plan alone is sound.
+        return _response(timer, compliant=True, final_plan=final_plan, partial=True)
+    return _response(timer, compliant=True, final_plan=final_plan, time_series=time_series, validation=report)
+
+def _response(timer: _Timer, **fields) -> PlanPipelineResponse:
+    timings = sorted(timer.timings, key=lambda t: t.start_ms)
+    return PlanPipelineResponse(
+        timings=timings,
+        total_ms=round(timer.elapsed_ms(), 2),
+        sequential_ms=round(sum(t.duration_ms for t in timings if t.status == "ok"), 2),
+        **fields,
+    )
@@ -0,0 +1,69 @@
+from pydantic import BaseModel, Field
+from typing import List
+from collections import Counter
+import hashlib
+import re
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+class PlanSection(BaseModel):
+    heading: str = Field(description="The heading text of the section, empty for a plan without headings")
+    content: str = Field(description="The markdown of the section, including its heading line")
+
+    @property
+    def key(self) -> str:
+        """Stable identity of the section's text, used to tell edited sections from unchanged ones."""
+        normalized = "\n".join(line.rstrip() for line in self.content.strip().splitlines())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+class SplitPlan(BaseModel):
+    overview: str = Field(description="Markdown before the first section heading (title, summary)")
+    sections: List[PlanSection] = Field(description="Sections in plan order")
+
+def _headings(lines: List[str]) -> List[tuple]:
+    found, in_fence = [], False
+    for index, line in enumerate(lines):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+            continue
+        match = None if in_fence else _HEADING.match(line)
+        if match:
+            found.append((index, len(match.group(1)), match.group(2)))
+    return found
+
+def split_plan_sections(final_plan: str) -> SplitPlan:
+    """Split a markdown plan into its top-level sections (phases, weeks, topics...).
+
+    The section level is the shallowest heading level used at least twice,
+    not counting a title heading on the plan's first line, so "# Plan" does not
+    swallow the "## Phase" headings under it. Everything before the first
+    section heading is the overview; later headings at the section level or
+    shallower start new sections, deeper ones stay inside their section. A
+    shallower heading with no body of its own (e.g. "# Part 2") is folded into
+    the section that follows it. A plan without repeated headings is returned as
+    one section.
+    """
+    lines = final_plan.splitlines()
+    headings = _headings(lines)
+    first_line = next((index for index, line in enumerate(lines) if line.strip()), None)
+    counted = [h for h in headings if h[0] != first_line]
+    counts = Counter(level for _, level, _ in counted)
+    repeated = [level for level, count in counts.items() if count >= 2]
+    if not repeated:
+        return SplitPlan(overview="", sections=[PlanSection(heading="", content=final_plan.strip())])
+    section_level = min(repeated)
+
+    first = next(index for index, level, _ in counted if level == section_level)
+    starts = [(index, text) for index, level, text in headings if index >= first and level <= section_level]
+    overview = "\n".join(lines[:first]).strip()
+    sections, carried = [], []
+    for position, (index, text) in enumerate(starts):
+        end = starts[position + 1][0] if position + 1 < len(starts) else len(lines)
+        body = lines[index:end]
+        if not any(line.strip() for line in body[1:]) and position + 1 < len(starts):
+            carried.extend(body)
+            continue
+        sections.append(PlanSection(heading=text, content="\n".join(carried + body).strip()))
+        carried = []
+    return SplitPlan(overview=overview, sections=sections)
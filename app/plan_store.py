@@ -0,0 +1,369 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from time_series_tasks_generator import Tasks, SectionTasks
+
+load_dotenv()
+PLAN_STORE_TTL_SECONDS = float(os.getenv("PLAN_STORE_TTL_SECONDS", "604800"))
+PLAN_STORE_MAX_SESSIONS = int(os.getenv("PLAN_STORE_MAX_SESSIONS", "100000"))
+# Optional SQLite backend, kept across restarts.
+PLAN_STORE_SQLITE_PATH = os.getenv("PLAN_STORE_SQLITE_PATH") or None
+# Writes are buffered and committed together at most this often, or sooner once a batch fills up.
+# Buffered writes are only visible to the worker that made them: with several uvicorn workers on
+# one file, set this to 0 so that every update is committed before the request returns.
+PLAN_STORE_FLUSH_SECONDS = float(os.getenv("PLAN_STORE_FLUSH_SECONDS", "0.05"))
+PLAN_STORE_BATCH_SIZE = int(os.getenv("PLAN_STORE_BATCH_SIZE", "256"))
+PLAN_STORE_CLEANUP_SECONDS = float(os.getenv("PLAN_STORE_CLEANUP_SECONDS", "60"))
+# How often the SQLite store recounts its sessions for /sessions/stats and /metrics.
+_COUNT_SECONDS = 1.0
+
+
+# ---------- Document shape (mongo/schema.mongo.js) ----------
+
+# Schedule member key -> (schedule_type, sub-document key) of the mongo ScheduleUnionSchema.
+_SCHEDULE_TYPES = {
+    "specific": ("Specific", "specificType"),
+    "on_workday": ("On workday", "onWorkdayType"),
+    "on_weekend": ("On Weekend", "onWeekendType"),
+    "on_weekday": ("On weekday", "onWeekdayType"),
+    "on_monthday": ("On monthday", "onMonthdayType"),
+    "periodic": ("Periodic", "periodicType"),
+}
+_SCHEDULE_KEYS = {sub_key: member for member, (_, sub_key) in _SCHEDULE_TYPES.items()}
+
+def to_document_tasks(tasks: Tasks) -> Dict[str, Any]:
+    """Tasks in the stored shape: tagged unions with duration_type/schedule_type, as in mongo/example_json.json."""
+    documents = []
+    for task in tasks.model_dump(mode="json")["tasks"]:
+        duration = task["task_duration"]
+        if "date" in duration:
+            task["task_duration"] = {"duration_type": "single", "singleTime": duration}
+        else:
+            member, value = next(iter(duration["schedule"].items()))
+            schedule_type, sub_key = _SCHEDULE_TYPES[member]
+            schedule = {"schedule_type": schedule_type, sub_key: {member: value}}
+            task["task_duration"] = {"duration_type": "across", "acrossTime": {**duration, "schedule": schedule}}
+        documents.append(task)
+    return {"tasks_name": tasks.tasks_name, "tasks": documents}
+
+def from_document_tasks(document: Dict[str, Any]) -> Tasks:
+    tasks = []
+    for task in document["tasks"]:
+        duration = task["task_duration"]
+        if duration["duration_type"] == "single":
+            task_duration = duration["singleTime"]
+        else:
+            across = duration["acrossTime"]
+            sub_key = next(key for key in across["schedule"] if key in _SCHEDULE_KEYS)
+            task_duration = {**across, "schedule": across["schedule"][sub_key]}
+        tasks.append({**task, "task_duration": task_duration})
+    return Tasks(tasks_name=document["tasks_name"], tasks=tasks)
+
+def to_document_sections(sections: List[SectionTasks]) -> List[Dict[str, Any]]:
+    return [{"key": s.key, "heading": s.heading, "tasks": to_document_tasks(s.tasks)} for s in sections]
+
+def from_document_sections(documents: List[Dict[str, Any]]) -> List[SectionTasks]:
+    return [SectionTasks(key=d["key"], heading=d["heading"], tasks=from_document_tasks(d["tasks"])) for d in documents]
+
+
+# ---------- Stores ----------
+
+class UnknownSession(Exception):
+    """An update named a session that does not exist (never created, expired or deleted)."""
+    status_code = 404
+
+class PlanStore:
+    """Planning sessions keyed by id; each stage merges its output into the session document.
+
+    Documents expire ``ttl`` seconds after their last update.
+    """
+
+    name = "store"
+
+    def __init__(self, ttl: float = PLAN_STORE_TTL_SECONDS):
+        self.ttl = ttl
+        self.reads = 0
+        self.writes = 0
+        self.expirations = 0
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _put(self, session_id: str, document: Dict[str, Any], expires_at: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    # The endpoints call these; a store doing blocking I/O runs the sync methods in a thread.
+
+    async def aget(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.get(session_id)
+
+    async def aupdate(self, session_id: Optional[str], **fields: Any) -> Dict[str, Any]:
+        return self.update(session_id, **fields)
+
+    async def adelete(self, session_id: str) -> bool:
+        return self.delete(session_id)
+
+    def update(self, session_id: Optional[str], **fields: Any) -> Dict[str, Any]:
+        """Merge ``fields`` into the session (created when ``session_id`` is None) and return it.
+
+        Raises UnknownSession for an id that is not stored: clients cannot pick session ids.
+        """
+        now = time.time()
+        if session_id is None:
+            document = {"_id": uuid.uuid4().hex, "created_at": now}
+        else:
+            document = self.get(session_id)
+            if document is None:
+                raise UnknownSession(f"Unknown or expired session: {session_id}")
+        document.update(fields, updated_at=now)
+        self._put(document["_id"], document, now + self.ttl)
+        self.writes += 1
+        return document
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "sessions": len(self),
+            "reads": self.reads,
+            "writes": self.writes,
+            "expirations": self.expirations,
+        }
+
+class MemoryPlanStore(PlanStore):
+    """In-process store; entries are kept in update order, so expired ones are always at the front."""
+
+    name = "memory"
+
+    def __init__(self, ttl: float = PLAN_STORE_TTL_SECONDS, max_sessions: int = PLAN_STORE_MAX_SESSIONS):
+        super().__init__(ttl)
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        self.reads += 1
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        expires_at, document = entry
+        if expires_at <= time.time():
+            del self._entries[session_id]
+            self.expirations += 1
+            return None
+        return dict(document)
+
+    def _put(self, session_id: str, document: Dict[str, Any], expires_at: float) -> None:
+        self._entries[session_id] = (expires_at, document)
+        self._entries.move_to_end(session_id)
+        self._cleanup(time.time())
+
+    def _cleanup(self, now: float) -> None:
+        while self._entries:
+            session_id, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_sessions:
+                break
+            del self._entries[session_id]
+            self.expirations += 1
+
+    def delete(self, session_id: str) -> bool:
+        return self._entries.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLitePlanStore(PlanStore):
+    """File-backed store with write batching.
+
+    Updates land in an in-memory buffer that reads consult first, and a
+    background thread commits the buffer in one transaction every
+    ``flush_seconds`` (or as soon as ``batch_size`` sessions are pending), so
+    a burst of stage writes costs one commit instead of one per request. A
+    crash loses at most the last ``flush_seconds`` of updates.
+
+    The buffer belongs to one process, so batching suits a single worker. With
+    ``flush_seconds=0`` every update and deletion is committed before it
+    returns, and workers sharing the file see each other's sessions at once.
+    The session count for stats is refreshed by the background thread.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, ttl: float = PLAN_STORE_TTL_SECONDS, flush_seconds: float = PLAN_STORE_FLUSH_SECONDS,
+                 batch_size: int = PLAN_STORE_BATCH_SIZE, cleanup_seconds: float = PLAN_STORE_CLEANUP_SECONDS):
+        super().__init__(ttl)
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.cleanup_seconds = cleanup_seconds
+        self.flushes = 0
+        self._sessions = 0
+        self._counted_at = 0.0
+        self._lock = threading.Lock()
+        self._pending: Dict[str, tuple] = {}
+        self._deleted: set = set()
+        self._last_cleanup = time.time()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plan_sessions ("
+            "session_id TEXT PRIMARY KEY, document TEXT NOT NULL, updated_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS plan_sessions_expires ON plan_sessions (expires_at)")
+        self._count()
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._run, name="plan-store-flush", daemon=True)
+        self._flusher.start()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        self.reads += 1
+        now = time.time()
+        with self._lock:
+            if session_id in self._deleted:
+                return None
+            pending = self._pending.get(session_id)
+            if pending is not None:
+                return dict(pending[0])
+            row = self._conn.execute(
+                "SELECT document, expires_at FROM plan_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            self.expirations += 1
+            return None
+        return json.loads(row[0])
+
+    def _put(self, session_id: str, document: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._deleted.discard(session_id)
+            self._pending[session_id] = (dict(document), expires_at)
+            full = len(self._pending) >= self.batch_size
+        if self.flush_seconds <= 0:
+            self.flush()
+        elif full:
+            self._wake.set()
+
+    def delete(self, session_id: str) -> bool:
+        existed = self.get(session_id) is not None
+        with self._lock:
+            self._pending.pop(session_id, None)
+            self._deleted.add(session_id)
+        if self.flush_seconds <= 0:
+            self.flush()
+        return existed
+
+    async def aget(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def aupdate(self, session_id: Optional[str], **fields: Any) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.update, session_id, **fields)
+
+    async def adelete(self, session_id: str) -> bool:
+        return await asyncio.to_thread(self.delete, session_id)
+
+    def flush(self) -> None:
+        """Commit buffered updates and deletions in one transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            deleted, self._deleted = self._deleted, set()
+            if not pending and not deleted:
+                return
+            now = time.time()
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO plan_sessions (session_id, document, updated_at, expires_at) VALUES (?, ?, ?, ?)",
+                    [(sid, json.dumps(doc), doc.get("updated_at", now), exp) for sid, (doc, exp) in pending.items()],
+                )
+                self._conn.executemany("DELETE FROM plan_sessions WHERE session_id = ?", [(sid,) for sid in deleted])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                # Keep the updates for the next attempt unless newer ones replaced them.
+                for sid, entry in pending.items():
+                    self._pending.setdefault(sid, entry)
+                self._deleted |= deleted
+                raise
+            self.flushes += 1
+
+    def _cleanup(self, now: float) -> None:
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM plan_sessions WHERE expires_at <= ?", (now,)).rowcount
+        self.expirations += max(removed, 0)
+        self._last_cleanup = now
+
+    def _count(self) -> None:
+        with self._lock:
+            self._sessions = self._conn.execute(
+                "SELECT COUNT(*) FROM plan_sessions WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        self._counted_at = time.time()
+
+    def _run(self) -> None:
+        while not self._closed:
+            # Write-through stores only wake up here for cleanup and the session count.
+            self._wake.wait(self.flush_seconds if self.flush_seconds > 0 else _COUNT_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.time() - self._last_cleanup >= self.cleanup_seconds:
+                    self._cleanup(time.time())
+                if time.time() - self._counted_at >= _COUNT_SECONDS:
+                    self._count()
+            except sqlite3.Error:
+                # Another worker holds the write lock; the buffer is retried on the next tick.
+                continue
+
+    def __len__(self) -> int:
+        """Unexpired sessions in the file as of the last count, at most about _COUNT_SECONDS old."""
+        return self._sessions
+
+    def close(self) -> None:
+        self._closed = True
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "flushes": self.flushes, "pending": len(self._pending)}
+
+
+_store: Optional[PlanStore] = None
+
+def get_plan_store() -> PlanStore:
+    """Return the process-wide plan store, built from the PLAN_STORE_* settings."""
+    global _store
+    if _store is None:
+        if PLAN_STORE_SQLITE_PATH:
+            _store = SQLitePlanStore(PLAN_STORE_SQLITE_PATH)
+        else:
+            _store = MemoryPlanStore()
+    return _store
+
+def set_plan_store(store: Optional[PlanStore]) -> None:
+    global _store
+    _store = store
+
+def close_plan_store() -> None:
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
@@ -0,0 +1,253 @@
+from collections import Counter, deque
+from dotenv import load_dotenv
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import re
+import unicodedata
+
+load_dotenv()
+PRE_MODERATION_ENABLED = os.getenv("PRE_MODERATION_ENABLED", "1").lower() not in ("0", "false", "no")
+# Longer texts always go upstream: there is room to bury anything in them.
+PRE_MODERATION_MAX_CHARS = int(os.getenv("PRE_MODERATION_MAX_CHARS", "400"))
+# Extra terms, one per line ("#" starts a comment), added to the built-in lists below.
+PRE_MODERATION_BLOCKLIST_PATH = os.getenv("PRE_MODERATION_BLOCKLIST_PATH") or None
+PRE_MODERATION_SENSITIVE_PATH = os.getenv("PRE_MODERATION_SENSITIVE_PATH") or None
+PRE_MODERATION_ALLOWLIST_PATH = os.getenv("PRE_MODERATION_ALLOWLIST_PATH") or None
+
+# Phrases that are never acceptable in a plan; a match is rejected without an upstream call.
+# Whole words only, and nothing that an everyday goal could contain ("kill my sugar cravings",
+# "a bomb-proof routine", "meth-free meals"): those are left to the sensitive terms below.
+DEFAULT_BLOCKLIST = (
+    "child porn$", "child pornography$", "child sexual abuse$", "sexual content involving minors$",
+    "pipe bomb$", "pipe bombs$", "buy an illegal gun$", "hire a hitman$", "join isis$", "ethnic cleansing$",
+)
+# Words that need the real moderation model even in otherwise harmless text. Terms match at the
+# start of a word, so "kill" also covers "killing" and "drug" covers "drugs"; a trailing "$"
+# makes a term match the whole word only ("dead$" leaves "deadline" alone).
+DEFAULT_SENSITIVE = (
+    "kill", "murder", "suicid", "self harm", "self-harm", "harm$", "harmed", "harming", "harmful", "hurt",
+    "cut myself", "die$", "died", "dies", "dying", "death", "dead$", "deadly",
+    "weapon", "gun", "rifle", "bomb", "explosive", "attack", "terror", "shoot", "stab$", "stabb", "poison", "blood",
+    "drug", "meth", "cocaine", "heroin", "fentanyl", "overdose", "porn", "sex", "nude", "naked", "escort",
+    "hate", "racis", "nazi", "slur", "abuse", "stalk", "revenge", "steal", "fraud", "launder", "hack",
+    "starv", "purge", "laxative", "vomit", "pro ana", "thinspo", "fast for", "lose weight fast",
+    "minor", "child", "kid", "teen", "gambl", "betting", "extort", "blackmail", "scam",
+    "eliminat", "destroy", "torture", "threat", "assault", "rape", "genocide", "extremis", "explod", "arson",
+    "burn down", "smuggl", "traffick", "counterfeit", "forger", "alcohol", "drunk", "vape",
+)
+# Everyday planning vocabulary, as whole words. Text is accepted locally only when it contains one
+# of these and every other word is one of these or DEFAULT_COMMON_WORDS (or a number): a single
+# unknown word ("cutting", "assassinate", "ricin") sends it to the moderation model.
+DEFAULT_ALLOWLIST = (
+    "learn", "learning", "study", "studying", "practice", "practicing", "practise", "practising", "read", "reading",
+    "book", "books", "write", "writing", "run", "running", "runner", "marathon", "jog", "jogging", "train", "training",
+    "exercise", "exercising", "workout", "workouts", "gym", "yoga", "meditate", "meditating", "meditation",
+    "stretch", "stretching", "walk", "walking", "hike", "hiking", "swim", "swimming", "cycle", "cycling", "bike",
+    "cook", "cooking", "bake", "baking", "recipe", "recipes", "meal", "meals", "prep", "garden", "gardening",
+    "language", "languages", "spanish", "french", "english", "japanese", "chinese", "german", "italian", "korean",
+    "speak", "speaking", "fluent", "fluently", "conversational", "piano", "guitar", "violin", "instrument",
+    "sing", "singing", "music", "play", "playing", "paint", "painting", "draw", "drawing", "photography",
+    "code", "coding", "programming", "python", "javascript", "software", "math", "maths", "science",
+    "history", "exam", "exams", "course", "courses", "class", "classes", "degree", "certificate", "certification",
+    "career", "job", "interview", "interviews", "resume", "startup", "budget", "budgeting", "save", "saving",
+    "savings", "money", "personal", "finance", "finances", "habit", "habits", "sleep", "routine", "routines",
+    "productive", "productivity", "organize", "organise", "organized", "organised", "clean", "cleaning",
+    "declutter", "travel", "traveling", "travelling", "trip", "vacation", "wedding", "move", "house",
+    "renovate", "renovation", "skill", "skills", "hobby", "hobbies", "fitness", "health", "nutrition",
+    "vegetable", "vegetables", "homework", "lesson", "lessons", "tutor", "tutoring", "portfolio", "novel",
+    "chess", "knit", "knitting", "sew", "sewing",
+)
+# Function and time words that are harmless around planning vocabulary but never enough on their own.
+DEFAULT_COMMON_WORDS = (
+    "i", "me", "my", "we", "our", "you", "your", "a", "an", "the", "this", "that", "it", "is", "am", "are", "be",
+    "to", "in", "on", "at", "by", "for", "of", "with", "within", "and", "or", "from", "per", "each", "every", "how",
+    "want", "would", "like", "can", "could", "will", "should", "need", "get", "become", "start", "begin", "finish",
+    "improve", "keep", "try", "make", "new", "better", "more", "least", "first", "next", "basic", "basics",
+    "plan", "goal", "goals", "level", "minutes", "minute", "min", "mins", "hour", "hours", "time", "times",
+    "day", "days", "daily", "week", "weeks", "weekly", "weekday", "weekdays", "weekend", "weekends", "month",
+    "months", "monthly", "year", "years", "morning", "mornings", "evening", "evenings", "once", "twice",
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "half", "full",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "mondays", "tuesdays", "wednesdays", "thursdays", "fridays", "saturdays", "sundays",
+    "january", "february", "march", "april", "may", "june", "july", "august", "september", "october",
+    "november", "december",
+)
+
+_WORD_BREAKS = re.compile(r"[^\w]+")
+_NUMBER_WORD = re.compile(r"\d+(?:k|km|st|nd|rd|th)?")
+_URL = re.compile(r"https?://|www\.", re.I)
+_ALLOWED_SYMBOLS = set(".,;:!?'\"()-/&%+$€£@#*\n\r\t ")
+_ODD_ASCII = re.compile(r"[^A-Za-z0-9.,;:!?'\"()\-/&%+$@#*\s]")
+
+
+class Verdict(str, Enum):
+    ALLOW = "allow"
+    BLOCK = "block"
+    # Not decidable locally; ask the moderation model.
+    UPSTREAM = "upstream"
+
+
+def normalize(text: str) -> str:
+    """Casefolded NFKC text with every run of non-word characters replaced by one space, padded by spaces."""
+    return " " + _WORD_BREAKS.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip() + " "
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every pattern it contains.
+
+    Patterns are matched on normalized text with a leading space, so each one
+    must start at a word boundary ("kill" matches "killing", not "skill"); a
+    pattern ending in "$" must also end at one.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, str]]):
+        # State 0 is the root. _goto[s] maps a character to the next state; _out[s] holds the kinds
+        # of the patterns ending in s (or in any state reachable through its failure links).
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[frozenset] = [frozenset()]
+        for pattern, kind in patterns:
+            whole_word = pattern.endswith("$")
+            self._add(" " + normalize(pattern.rstrip("$")).strip() + (" " if whole_word else ""), kind)
+        self._link()
+
+    def _add(self, pattern: str, kind: str) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(frozenset())
+            state = nxt
+        self._out[state] = self._out[state] | {kind}
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] | self._out[self._fail[nxt]]
+
+    def kinds(self, normalized: str, stop: Optional[str] = None) -> set:
+        """Kinds of the patterns found in ``normalized``; returns as soon as ``stop`` is found."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: set = set()
+        state = 0
+        for ch in normalized:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+                if stop in found:
+                    break
+        return found
+
+
+def _read_terms(path: Optional[str]) -> List[str]:
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+
+
+def _suspicious(text: str) -> bool:
+    """Character-level signs of obfuscation: invisible characters, mixed scripts, symbol soup, links."""
+    if _URL.search(text):
+        return True
+    if text.isascii():
+        return len(_ODD_ASCII.findall(text)) * 10 > len(text)
+    scripts = set()
+    symbols = 0
+    for ch in text:
+        if ch.isalnum():
+            if ord(ch) > 0x7F:
+                category = unicodedata.category(ch)
+                if category.startswith("L"):
+                    scripts.add(unicodedata.name(ch, "?").split(" ")[0])
+                else:
+                    return True
+            else:
+                scripts.add("LATIN")
+        elif ch not in _ALLOWED_SYMBOLS:
+            if unicodedata.category(ch) in ("Cf", "Co", "Cn"):
+                return True
+            symbols += 1
+    return len(scripts) > 1 or symbols * 10 > len(text)
+
+
+class PreModerator:
+    """Decides clear cases locally and counts how often it did.
+
+    Only BLOCK is decided by a single match. ALLOW needs every word of the text
+    to be known vocabulary, since a harmful goal can be phrased with one
+    harmless verb ("Train to ...") and words no term list anticipates.
+    """
+
+    def __init__(self, blocklist: Iterable[str] = (), sensitive: Iterable[str] = (), allowlist: Iterable[str] = (),
+                 common_words: Iterable[str] = DEFAULT_COMMON_WORDS,
+                 max_chars: int = PRE_MODERATION_MAX_CHARS, enabled: bool = PRE_MODERATION_ENABLED):
+        self.enabled = enabled
+        self.max_chars = max_chars
+        self._matcher = AhoCorasick([(t, "block") for t in blocklist] + [(t, "sensitive") for t in sensitive])
+        self._planning = {word for term in allowlist for word in normalize(term).split()}
+        self._known = self._planning | {word for term in common_words for word in normalize(term).split()}
+        self.counts: Counter = Counter()
+
+    @classmethod
+    def from_settings(cls) -> "PreModerator":
+        return cls(
+            blocklist=DEFAULT_BLOCKLIST + tuple(_read_terms(PRE_MODERATION_BLOCKLIST_PATH)),
+            sensitive=DEFAULT_SENSITIVE + tuple(_read_terms(PRE_MODERATION_SENSITIVE_PATH)),
+            allowlist=DEFAULT_ALLOWLIST + tuple(_read_terms(PRE_MODERATION_ALLOWLIST_PATH)),
+        )
+
+    def classify(self, text: str) -> Verdict:
+        """ALLOW, BLOCK or UPSTREAM for one piece of user text; empty text is allowed."""
+        verdict = self._classify(text)
+        self.counts[verdict.value] += 1
+        return verdict
+
+    def _classify(self, text: str) -> Verdict:
+        if not text.strip():
+            return Verdict.ALLOW
+        if not self.enabled:
+            return Verdict.UPSTREAM
+        normalized = normalize(text)
+        kinds = self._matcher.kinds(normalized, stop="block")
+        if "block" in kinds:
+            return Verdict.BLOCK
+        if "sensitive" in kinds or len(text) > self.max_chars or _suspicious(text):
+            return Verdict.UPSTREAM
+        words = normalized.split()
+        if not self._planning.intersection(words):
+            return Verdict.UPSTREAM
+        if not all(word in self._known or _NUMBER_WORD.fullmatch(word) for word in words):
+            return Verdict.UPSTREAM
+        return Verdict.ALLOW
+
+    def stats(self) -> Dict[str, int]:
+        return {key: self.counts[key] for key in ("allow", "block", "upstream")}
+
+
+_pre_moderator: Optional[PreModerator] = None
+
+def get_pre_moderator() -> PreModerator:
+    """Return the process-wide pre-moderator, built from the PRE_MODERATION_* settings."""
+    global _pre_moderator
+    if _pre_moderator is None:
+        _pre_moderator = PreModerator.from_settings()
+    return _pre_moderator
+
+def set_pre_moderator(pre_moderator: Optional[PreModerator]) -> None:
+    global _pre_moderator
+    _pre_moderator = pre_moderator
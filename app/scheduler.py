@@ -0,0 +1,326 @@
+from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+from collections import Counter
+import heapq
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from metrics import model_call, record_queue_wait
+
+load_dotenv()
+
+# Requests and tokens per minute for each model; override with a JSON object in LLM_RATE_LIMITS,
+# e.g. {"gpt-4o": {"rpm": 500, "tpm": 30000}}. A missing "tpm" means tokens are not limited.
+DEFAULT_RATE_LIMITS: Dict[str, Dict[str, Optional[int]]] = {
+    "gpt-4o": {"rpm": 5000, "tpm": 450000},
+    "gpt-4o-mini": {"rpm": 5000, "tpm": 2000000},
+    "moderation": {"rpm": 1000, "tpm": None},
+}
+LLM_RATE_LIMITS = {**DEFAULT_RATE_LIMITS, **json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))}
+# Burst allowance of each bucket in seconds of quota. OpenAI enforces limits over windows shorter
+# than a minute, so admitting a full minute's quota at once would still trip upstream 429s.
+LLM_SCHEDULER_BURST_SECONDS = float(os.getenv("LLM_SCHEDULER_BURST_SECONDS", "10"))
+LLM_SCHEDULER_MAX_CONCURRENCY = int(os.getenv("LLM_SCHEDULER_MAX_CONCURRENCY", "256"))
+LLM_SCHEDULER_MAX_QUEUE = int(os.getenv("LLM_SCHEDULER_MAX_QUEUE", "1000"))
+LLM_SCHEDULER_MAX_WAIT_SECONDS = float(os.getenv("LLM_SCHEDULER_MAX_WAIT_SECONDS", "30"))
+LLM_SCHEDULER_RETRIES = int(os.getenv("LLM_SCHEDULER_RETRIES", "3"))
+LLM_SCHEDULER_BACKOFF_SECONDS = float(os.getenv("LLM_SCHEDULER_BACKOFF_SECONDS", "0.5"))
+LLM_SCHEDULER_MAX_BACKOFF_SECONDS = float(os.getenv("LLM_SCHEDULER_MAX_BACKOFF_SECONDS", "20"))
+
+# Lower value = served first. Cheap checks must not wait behind long generations.
+STAGE_PRIORITIES = {
+    "check_policy": 0,
+    "further_info": 1,
+    "final_plan": 2,
+    "time_series": 3,
+    "time_series_section": 3,
+    "task_repair": 3,
+}
+
+# Rough completion sizes used to estimate a call's token cost before it is made.
+EXPECTED_COMPLETION_TOKENS = {
+    "check_policy": 0,
+    "further_info": 600,
+    "final_plan": 2000,
+    "time_series": 3000,
+    "time_series_section": 800,
+    "task_repair": 400,
+}
+
+def _retry_outcome(error: Exception) -> Optional[str]:
+    """"rate_limited" or "error" for upstream errors worth retrying, None for the rest."""
+    # The openai SDK is imported lazily by the model clients; if it is not loaded, error is not one of its.
+    openai = sys.modules.get("openai")
+    if openai is None:
+        return None
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limited"
+    if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+        return "error"
+    return None
+
+class SchedulerSaturated(Exception):
+    """Raised when a model call cannot be admitted; maps to 429/503 with Retry-After."""
+
+    def __init__(self, message: str, retry_after: float, status_code: int = 503):
+        super().__init__(message)
+        self.retry_after = max(1.0, retry_after)
+        self.status_code = status_code
+
+def estimate_tokens(messages: List[Any], stage: str) -> int:
+    """Prompt tokens (~4 characters per token) plus the expected completion size of the stage."""
+    chars = sum(len(getattr(m, "content", m) or "") for m in messages)
+    return chars // 4 + EXPECTED_COMPLETION_TOKENS.get(stage, 1000)
+
+class TokenBucket:
+    """Continuously refilled bucket holding at most ``burst_seconds`` worth of capacity."""
+
+    def __init__(self, per_minute: int, burst_seconds: float = LLM_SCHEDULER_BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` can be taken (0 if available now)."""
+        self._refill(time.monotonic())
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def drain_for(self, seconds: float) -> None:
+        """Empty the bucket so nothing is admitted for roughly ``seconds`` (after an upstream 429)."""
+        self._refill(time.monotonic())
+        self.level = min(self.level, -seconds * self.rate)
+
+class _Waiter:
+    def __init__(self, future: asyncio.Future, tokens: int, priority: int):
+        self.future = future
+        self.tokens = tokens
+        self.priority = priority
+
+class ModelScheduler:
+    """Admits calls to one model in priority order within its RPM/TPM budget and concurrency cap."""
+
+    def __init__(self, model: str, rpm: int, tpm: Optional[int], max_concurrency: int, max_queue: int,
+                 burst_seconds: float = LLM_SCHEDULER_BURST_SECONDS):
+        self.model = model
+        self.requests = TokenBucket(rpm, burst_seconds)
+        self.tokens = TokenBucket(tpm, burst_seconds) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.upstream_rate_limited = 0
+        self._queue: list = []
+        self._queued = 0
+        self._queued_by_priority: Counter = Counter()
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def _expected_wait(self, priority: int) -> float:
+        # Everything queued at the same or a higher priority is admitted first.
+        ahead = sum(n for p, n in self._queued_by_priority.items() if p <= priority)
+        return max(ahead / self.requests.rate, self.requests.wait_time(1))
+
+    async def acquire(self, priority: int, tokens: int, max_wait: float) -> None:
+        if self.queue_depth() >= self.max_queue:
+            self.rejected += 1
+            raise SchedulerSaturated(f"{self.model} queue is full", self._expected_wait(priority), 503)
+        expected_wait = self._expected_wait(priority)
+        if expected_wait > max_wait:
+            # Shed load up front instead of holding the request until it times out.
+            self.rejected += 1
+            raise SchedulerSaturated(f"{self.model} rate limit budget exhausted", expected_wait, 429)
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tokens, priority)
+        heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+        self._queued += 1
+        self._queued_by_priority[priority] += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), max_wait)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.rejected += 1
+            raise SchedulerSaturated(f"{self.model} rate limit budget exhausted", self._expected_wait(priority), 429)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if waiter.future.done() and not waiter.future.cancelled():
+            # Admitted in the same instant the caller gave up: hand the slot back.
+            self.release()
+        else:
+            waiter.future.cancel()
+            self._dequeued(waiter)
+            self._dispatch()
+
+    def _dequeued(self, waiter: "_Waiter") -> None:
+        self._queued -= 1
+        self._queued_by_priority[waiter.priority] -= 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def pause(self, seconds: float) -> None:
+        """Stop admitting for ``seconds``; used when upstream says we are over the limit."""
+        self.upstream_rate_limited += 1
+        self.requests.drain_for(seconds)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._queue:
+            _, _, waiter = self._queue[0]
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+            if self.in_flight >= self.max_concurrency:
+                return
+            wait = self.requests.wait_time(1)
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.wait_time(waiter.tokens))
+            if wait > 0:
+                self._schedule(wait)
+                return
+            heapq.heappop(self._queue)
+            self._dequeued(waiter)
+            self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(waiter.tokens)
+            self.in_flight += 1
+            self.admitted += 1
+            waiter.future.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        if self._timer is not None:
+            # Keep the pending wake-up unless the new head of the queue can go sooner.
+            if self._timer.when() <= loop.time() + delay:
+                return
+            self._timer.cancel()
+
+        def fire():
+            self._timer = None
+            self._dispatch()
+
+        self._timer = loop.call_later(delay, fire)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queue_depth(),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "upstream_rate_limited": self.upstream_rate_limited,
+        }
+
+class AdmissionScheduler:
+    """Front door for every model call: rate budgets, priorities, backpressure and 429 retries."""
+
+    def __init__(
+        self,
+        limits: Dict[str, Dict[str, Optional[int]]] = LLM_RATE_LIMITS,
+        max_concurrency: int = LLM_SCHEDULER_MAX_CONCURRENCY,
+        max_queue: int = LLM_SCHEDULER_MAX_QUEUE,
+        max_wait: float = LLM_SCHEDULER_MAX_WAIT_SECONDS,
+        retries: int = LLM_SCHEDULER_RETRIES,
+        burst_seconds: float = LLM_SCHEDULER_BURST_SECONDS,
+    ):
+        self.limits = limits
+        self.burst_seconds = burst_seconds
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retries = retries
+        self._models: Dict[str, ModelScheduler] = {}
+
+    def for_model(self, model: str) -> ModelScheduler:
+        scheduler = self._models.get(model)
+        if scheduler is None:
+            limit = self.limits.get(model) or self.limits["gpt-4o"]
+            scheduler = ModelScheduler(model, limit["rpm"], limit.get("tpm"), self.max_concurrency,
+                                       self.max_queue, self.burst_seconds)
+            self._models[model] = scheduler
+        return scheduler
+
+    @asynccontextmanager
+    async def slot(self, model: str, stage: str, tokens: int = 0):
+        """Hold an admission slot for the duration of the block (used for streaming calls).
+
+        Yields the metrics.ModelCall timing the block.
+        """
+        scheduler = self.for_model(model)
+        queued = time.perf_counter()
+        await scheduler.acquire(STAGE_PRIORITIES.get(stage, len(STAGE_PRIORITIES)), tokens, self.max_wait)
+        record_queue_wait(model, stage, time.perf_counter() - queued)
+        try:
+            with model_call(model, stage) as call:
+                yield call
+        finally:
+            scheduler.release()
+
+    async def run(self, model: str, stage: str, tokens: int, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Admit and run ``fn``, retrying upstream rate limits and transient errors with jittered backoff."""
+        scheduler = self.for_model(model)
+        for attempt in range(self.retries + 1):
+            async with self.slot(model, stage, tokens) as call:
+                try:
+                    return await fn()
+                except Exception as e:
+                    outcome = _retry_outcome(e)
+                    if outcome is None:
+                        raise
+                    call.outcome = outcome
+                    delay = _backoff(attempt, e)
+                    if outcome == "rate_limited":
+                        scheduler.pause(delay)
+                    if attempt == self.retries:
+                        if outcome == "rate_limited":
+                            raise SchedulerSaturated(f"{model} is rate limited upstream", delay, 429) from e
+                        raise
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {model: scheduler.stats() for model, scheduler in self._models.items()}
+
+def _backoff(attempt: int, error: Exception) -> float:
+    # Honour the server's Retry-After when it sends one, otherwise jittered exponential backoff.
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after) * random.uniform(1.0, 1.25)
+        except ValueError:
+            pass
+    ceiling = min(LLM_SCHEDULER_MAX_BACKOFF_SECONDS, LLM_SCHEDULER_BACKOFF_SECONDS * 2 ** attempt)
+    return random.uniform(ceiling / 2, ceiling)
+
+
+_scheduler: Optional[AdmissionScheduler] = None
+
+def get_scheduler() -> AdmissionScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = AdmissionScheduler()
+    return _scheduler
+
+def set_scheduler(scheduler: Optional[AdmissionScheduler]) -> None:
+    global _scheduler
+    _scheduler = scheduler
@@ -0,0 +1,340 @@
+from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+import numpy as np
+from llm_cache import normalize_text
+
+load_dotenv()
+SIMILAR_GOALS_ENABLED = os.getenv("SIMILAR_GOALS_ENABLED", "1").lower() not in ("0", "false", "no")
+# Estimated Jaccard similarity of the character 4-gram sets above which a stored result is reused.
+SIMILAR_GOALS_THRESHOLD = float(os.getenv("SIMILAR_GOALS_THRESHOLD", "0.8"))
+# The goal alone must also be this similar: in goal plus plan, a long plan outweighs a one-word
+# change in a short goal ("Gain weight" / "Lose weight", "Swedish" / "Spanish", "do NOT want").
+SIMILAR_GOALS_GOAL_THRESHOLD = float(os.getenv("SIMILAR_GOALS_GOAL_THRESHOLD", "0.9"))
+SIMILAR_GOALS_MAX_ENTRIES = int(os.getenv("SIMILAR_GOALS_MAX_ENTRIES", "100000"))
+# Optional SQLite file the index is written to and reloaded from at startup. Access times of hits
+# are saved with the next add, so a lookup never touches the file.
+SIMILAR_GOALS_SQLITE_PATH = os.getenv("SIMILAR_GOALS_SQLITE_PATH") or None
+
+SHINGLE = 4
+# 64 MinHash values in 16 bands of 4: texts with Jaccard 0.8 share a band with probability
+# 1 - (1 - 0.8**4)**16 > 0.999, texts with 0.3 with about 0.12.
+PERMUTATIONS = 64
+BANDS = 16
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20250106)
+_A = _rng.integers(1, int(_PRIME), PERMUTATIONS, dtype=np.uint64)[:, None]
+_B = _rng.integers(0, int(_PRIME), PERMUTATIONS, dtype=np.uint64)[:, None]
+_ROW_MIX = _rng.integers(1, 1 << 63, (1, BANDS, PERMUTATIONS // BANDS), dtype=np.uint64) | np.uint64(1)
+_BAND_SALT = _rng.integers(0, 1 << 63, (1, BANDS), dtype=np.uint64)
+_NUMBERS_MIX = np.uint64(_rng.integers(1, 1 << 63) | 1)
+# Merge newly added entries into the sorted band table once this many are pending.
+_MERGE_EVERY = 1024
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def signature(text: str) -> np.ndarray:
+    """MinHash signature of the character 4-grams of the normalized text."""
+    text = normalize_text(text)
+    if len(text) < SHINGLE:
+        text = text.ljust(SHINGLE)
+    shingles = {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+    hashed = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((_A * hashed[None, :] + _B) % _PRIME).min(axis=1).astype(np.uint32)
+
+def numbers_key(text: str) -> int:
+    """Fingerprint of the numbers in the text; "run 5k" and "run 50k" must not share questions."""
+    return zlib.crc32(" ".join(sorted(set(_NUMBER.findall(text)))).encode())
+
+def band_keys(signatures: np.ndarray, numbers: np.ndarray) -> np.ndarray:
+    """One 64-bit key per band and signature row (wrapping arithmetic is intended).
+
+    The numbers fingerprint is mixed into every band, so texts that differ in
+    their numbers never become candidates for each other.
+    """
+    rows = signatures.reshape(len(signatures), BANDS, PERMUTATIONS // BANDS).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        return (rows * _ROW_MIX).sum(axis=2) + _BAND_SALT + numbers.astype(np.uint64)[:, None] * _NUMBERS_MIX
+
+
+class SimilarGoalIndex:
+    """Bounded near-duplicate index from text to a stored result, using MinHash LSH.
+
+    Band keys of all entries live in one sorted array, so a lookup is a
+    ``searchsorted`` per band plus a signature comparison of the few
+    candidates. New entries are checked directly until they are merged in
+    batches. When full, the least recently used entry is replaced.
+
+    An entry may carry a ``goal``, a short part of the text that must match on
+    its own (at ``goal_threshold``) for the entry to be returned.
+    """
+
+    def __init__(self, max_entries: int = SIMILAR_GOALS_MAX_ENTRIES, threshold: float = SIMILAR_GOALS_THRESHOLD,
+                 path: Optional[str] = SIMILAR_GOALS_SQLITE_PATH, version: str = "",
+                 goal_threshold: float = SIMILAR_GOALS_GOAL_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.goal_threshold = goal_threshold
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        capacity = min(max_entries, 1024)
+        self._signatures = np.zeros((capacity, PERMUTATIONS), dtype=np.uint32)
+        self._goal_signatures = np.zeros((capacity, PERMUTATIONS), dtype=np.uint32)
+        self._band_keys = np.zeros((capacity, BANDS), dtype=np.uint64)
+        self._accessed = np.zeros(capacity, dtype=np.float64)
+        self._numbers = np.zeros(capacity, dtype=np.uint32)
+        self._ids: List[Optional[str]] = []
+        self._values: List[Any] = []
+        self._slot_of: Dict[str, int] = {}
+        # Sorted band keys of merged entries and the slot each belongs to. Entries of a slot that was
+        # since reused stay until the next rebuild; lookups skip them by re-checking the slot's key.
+        self._sorted_keys = np.zeros(0, dtype=np.uint64)
+        self._sorted_slots = np.zeros(0, dtype=np.int64)
+        self._stale = 0
+        self._pending: List[int] = []
+        self._lock = threading.Lock()
+        # Access times of hits, written with the next add rather than one UPDATE per hit.
+        self._touched: Dict[str, float] = {}
+        self._writes = 0
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS similar_goals ("
+                "id TEXT PRIMARY KEY, version TEXT NOT NULL, signature BLOB NOT NULL, numbers INTEGER NOT NULL, "
+                "value TEXT NOT NULL, accessed_at REAL NOT NULL, goal_signature BLOB)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(similar_goals)")}
+            if "goal_signature" not in columns:
+                self._conn.execute("ALTER TABLE similar_goals ADD COLUMN goal_signature BLOB")
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # ---------- Lookup ----------
+
+    def lookup(self, text: str, goal: Optional[str] = None) -> Optional[Tuple[float, Any]]:
+        """(similarity, value) of the most similar stored text at or above the threshold, else None.
+
+        With ``goal``, only entries whose goal reaches ``goal_threshold`` against it count.
+        """
+        if not self._ids:
+            self.misses += 1
+            return None
+        query = signature(text)
+        numbers = numbers_key(text)
+        keys = band_keys(query[None, :], np.array([numbers]))[0]
+        left = np.searchsorted(self._sorted_keys, keys, "left")
+        counts = np.searchsorted(self._sorted_keys, keys, "right") - left
+        # Every position of every matching run, then drop entries of reused slots.
+        positions = np.arange(counts.sum()) + np.repeat(left - np.cumsum(counts) + counts, counts)
+        slots = self._sorted_slots[positions]
+        bands = np.repeat(np.arange(BANDS), counts)
+        slots = slots[self._band_keys[slots, bands] == keys[bands]]
+        if self._pending:
+            pending = np.array(self._pending)
+            slots = np.concatenate([slots, pending[(self._band_keys[pending] == keys).any(axis=1)]])
+        slots = np.unique(slots)
+        slots = slots[self._numbers[slots] == numbers]
+        if not len(slots):
+            self.misses += 1
+            return None
+        similarity = (self._signatures[slots] == query).mean(axis=1)
+        if goal is not None:
+            goal_similarity = (self._goal_signatures[slots] == signature(goal)).mean(axis=1)
+            similarity = np.where(goal_similarity >= self.goal_threshold, similarity, 0.0)
+        best = int(np.argmax(similarity))
+        if similarity[best] < self.threshold:
+            self.misses += 1
+            return None
+        slot = int(slots[best])
+        self.hits += 1
+        self._touch(slot)
+        return float(similarity[best]), self._values[slot]
+
+    def _touch(self, slot: int) -> None:
+        now = time.time()
+        self._accessed[slot] = now
+        if self._conn is not None:
+            self._touched[self._ids[slot]] = now
+
+    # ---------- Insertion ----------
+
+    def add(self, text: str, value: Any, goal: Optional[str] = None) -> None:
+        row = self._add(text, value, goal)
+        if row is not None:
+            self._write(row, self._take_touched())
+
+    async def aadd(self, text: str, value: Any, goal: Optional[str] = None) -> None:
+        """add() for request paths: the index is updated inline, the SQLite write runs in a thread."""
+        row = self._add(text, value, goal)
+        if row is not None:
+            await asyncio.to_thread(self._write, row, self._take_touched())
+
+    def _add(self, text: str, value: Any, goal: Optional[str]) -> Optional[tuple]:
+        """Place the entry in memory; returns its SQLite row when the index is persisted."""
+        entry_id = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        query = signature(text)
+        goal_query = query if goal is None else signature(goal)
+        numbers = numbers_key(text)
+        now = time.time()
+        self._place(entry_id, query, goal_query, numbers, value, now)
+        if self._conn is None:
+            return None
+        return entry_id, self.version, query.tobytes(), goal_query.tobytes(), numbers, json.dumps(value), now
+
+    def _take_touched(self) -> List[Tuple[float, str]]:
+        touched, self._touched = self._touched, {}
+        return [(accessed_at, entry_id) for entry_id, accessed_at in touched.items()]
+
+    def _write(self, row: Optional[tuple], touched: List[Tuple[float, str]]) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            if row is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO similar_goals (id, version, signature, goal_signature, numbers, value, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", row,
+                )
+                self._writes += 1
+            if touched:
+                self._conn.executemany("UPDATE similar_goals SET accessed_at = ? WHERE id = ?", touched)
+            # Trim occasionally rather than on every write to keep writes cheap.
+            if row is not None and self._writes % 256 == 0:
+                self._prune()
+
+    def _place(self, entry_id: str, query: np.ndarray, goal_query: np.ndarray, numbers: int, value: Any,
+               accessed_at: float) -> int:
+        slot = self._slot_of.get(entry_id)
+        if slot is None:
+            if len(self._ids) < self.max_entries:
+                slot = len(self._ids)
+                if slot == len(self._signatures):
+                    self._grow()
+                self._ids.append(entry_id)
+                self._values.append(value)
+            else:
+                slot = int(np.argmin(self._accessed))
+                del self._slot_of[self._ids[slot]]
+                self._ids[slot] = entry_id
+                self.evictions += 1
+                self._stale += BANDS
+            self._slot_of[entry_id] = slot
+        else:
+            self._stale += BANDS
+        self._values[slot] = value
+        self._signatures[slot] = query
+        self._goal_signatures[slot] = goal_query
+        self._numbers[slot] = numbers
+        self._band_keys[slot] = band_keys(query[None, :], np.array([numbers]))[0]
+        self._accessed[slot] = accessed_at
+        self._pending.append(slot)
+        if len(self._pending) >= _MERGE_EVERY:
+            self._merge()
+        return slot
+
+    def _grow(self) -> None:
+        capacity = min(self.max_entries, 2 * len(self._signatures))
+        for name in ("_signatures", "_goal_signatures", "_band_keys", "_accessed", "_numbers"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _merge(self) -> None:
+        if self._stale > len(self._sorted_keys) // 2:
+            self._rebuild()
+            return
+        slots = np.array(sorted(set(self._pending)), dtype=np.int64)
+        keys = self._band_keys[slots].ravel()
+        owners = np.repeat(slots, BANDS)
+        order = np.argsort(keys, kind="stable")
+        keys, owners = keys[order], owners[order]
+        positions = np.searchsorted(self._sorted_keys, keys)
+        self._sorted_keys = np.insert(self._sorted_keys, positions, keys)
+        self._sorted_slots = np.insert(self._sorted_slots, positions, owners)
+        self._pending = []
+
+    def _rebuild(self) -> None:
+        count = len(self._ids)
+        keys = self._band_keys[:count].ravel()
+        order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[order]
+        self._sorted_slots = np.repeat(np.arange(count, dtype=np.int64), BANDS)[order]
+        self._stale = 0
+        self._pending = []
+
+    # ---------- Persistence ----------
+
+    def _load(self) -> None:
+        rows = self._conn.execute(
+            "SELECT id, signature, goal_signature, numbers, value, accessed_at FROM similar_goals WHERE version = ? "
+            "ORDER BY accessed_at DESC LIMIT ?", (self.version, self.max_entries)
+        ).fetchall()
+        for entry_id, blob, goal_blob, numbers, value, accessed_at in reversed(rows):
+            slot = len(self._ids)
+            if slot == len(self._signatures):
+                self._grow()
+            self._ids.append(entry_id)
+            self._values.append(json.loads(value))
+            self._slot_of[entry_id] = slot
+            self._signatures[slot] = np.frombuffer(blob, dtype=np.uint32)
+            # Rows written before goals were stored only match their own full text as a goal.
+            self._goal_signatures[slot] = np.frombuffer(goal_blob or blob, dtype=np.uint32)
+            self._numbers[slot] = numbers
+            self._accessed[slot] = accessed_at
+        if rows:
+            self._band_keys[:len(rows)] = band_keys(self._signatures[:len(rows)], self._numbers[:len(rows)])
+        self._rebuild()
+
+    def _prune(self) -> None:
+        self._conn.execute("DELETE FROM similar_goals WHERE version != ?", (self.version,))
+        overflow = self._conn.execute("SELECT COUNT(*) FROM similar_goals").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM similar_goals WHERE id IN (SELECT id FROM similar_goals ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._write(None, self._take_touched())
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self)}
+
+
+_index: Optional[SimilarGoalIndex] = None
+
+def get_similar_goal_index(version: str = "") -> Optional[SimilarGoalIndex]:
+    """Return the process-wide index built from the SIMILAR_GOALS_* settings, or None when disabled."""
+    global _index
+    if _index is None and SIMILAR_GOALS_ENABLED:
+        _index = SimilarGoalIndex(version=version)
+    return _index
+
+def set_similar_goal_index(index: Optional[SimilarGoalIndex]) -> None:
+    global _index
+    _index = index
+
+def close_similar_goal_index() -> None:
+    global _index
+    if _index is not None:
+        _index.close()
+        _index = None
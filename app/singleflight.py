@@ -0,0 +1,71 @@
+from typing import Any, Awaitable, Callable, Dict
+import asyncio
+from model_router import DeadlineExceeded, detached_context, within_deadline
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one upstream call.
+
+    The first caller for a key starts the work as a task; callers that arrive
+    while it is running wait on the same task and receive its result or its
+    exception. A waiter that is cancelled only detaches itself; the shared task
+    is cancelled once no waiters are left.
+
+    The shared task runs without a latency budget, since it serves requests
+    with different ones; each waiter gives up at its own deadline instead.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._inflight: Dict[str, _Call] = {}
+        _groups[name] = self
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._inflight.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn(), context=detached_context()))
+            self._inflight[key] = call
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        try:
+            return await within_deadline(asyncio.shield(call.task), self.name)
+        except (asyncio.CancelledError, DeadlineExceeded):
+            if not call.task.done() and call.waiters == 1:
+                # Forget the call now rather than in _finish, so a caller arriving
+                # before the task winds down starts afresh instead of joining it.
+                if self._inflight.get(key) is call:
+                    del self._inflight[key]
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _finish(self, key: str, call: _Call) -> None:
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        if not call.task.cancelled() and call.task.exception() is not None:
+            self.errors += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+def singleflight_stats() -> Dict[str, Dict[str, int]]:
+    return {name: group.stats() for name, group in _groups.items()}
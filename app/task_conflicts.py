@@ -0,0 +1,200 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
+from math import gcd
+import copy
+import os
+import numpy as np
+from time_series_tasks_generator import Tasks, TimeSeriesTask, RepeatType
+from task_validation import normalize_time
+from occurrence_expander import day_number
+
+# Tasks carry a start time but no length; each one is assumed to occupy this many minutes.
+CONFLICT_SLOT_MINUTES = int(os.getenv("CONFLICT_SLOT_MINUTES", "30"))
+
+_DAY_MINUTES = 24 * 60
+
+class TaskConflict(BaseModel):
+    task_indexes: List[int] = Field(description="Positions of the two tasks in the Tasks payload")
+    task_names: List[str] = Field(description="Names of the two tasks")
+    times_in_day: List[str] = Field(description="Start times of the two tasks in HH:MM format")
+    first_date: str = Field(description="The first date the tasks overlap on (of the earlier start when they span midnight), in YYYY-MM-DD format")
+    shared_days: int = Field(description="Number of days the tasks overlap on")
+
+class _Recurrence:
+    """The days a task occurs on, in the most analytic form its schedule allows.
+
+    Everyday, weekly and periodic schedules are a set of residues of the day
+    number modulo ``modulus``; monthday schedules keep their day-of-month set;
+    single dates and specific lists keep their days.
+    """
+
+    def __init__(self, task: TimeSeriesTask):
+        duration = task.task_duration
+        self.modulus, self.residues = 0, ()
+        self.monthdays: Optional[frozenset] = None
+        self.dates: Optional[np.ndarray] = None
+        self._days: Optional[np.ndarray] = None
+        # Days added before looking up a monthday, see shifted().
+        self._monthday_offset = 0
+        if hasattr(duration, "date"):
+            self.start = self.end = day_number(duration.date)
+            self.dates = np.array([self.start])
+            return
+        self.start, self.end = day_number(duration.start_date), day_number(duration.end_date)
+        schedule = duration.schedule
+        if duration.repeat == RepeatType.EVERYDAY:
+            self.modulus, self.residues = 1, (0,)
+        elif hasattr(schedule, "on_workday"):
+            self._weekly(v for v in schedule.on_workday if 1 <= v <= 5)
+        elif hasattr(schedule, "on_weekend"):
+            # 1 = Saturday, 2 = Sunday.
+            self._weekly(v + 5 for v in schedule.on_weekend if 1 <= v <= 2)
+        elif hasattr(schedule, "on_weekday"):
+            self._weekly(v for v in schedule.on_weekday if 1 <= v <= 7)
+        elif hasattr(schedule, "on_monthday"):
+            self.monthdays = frozenset(v for v in schedule.on_monthday if 1 <= v <= 31)
+        elif hasattr(schedule, "periodic"):
+            period = max(1, schedule.periodic)
+            self.modulus, self.residues = period, (self.start % period,)
+        else:
+            days = {day_number(d.date) for d in schedule.specific}
+            self.dates = np.array(sorted(d for d in days if self.start <= d <= self.end), dtype=np.int64)
+
+    def between(self, lo: int, hi: int) -> np.ndarray:
+        """Occurrence mask for day numbers lo..hi (within the task's range), computed once per task."""
+        if self._days is None:
+            self._days = self.mask(np.arange(self.start, self.end + 1, dtype=np.int64))
+        return self._days[lo - self.start:hi - self.start + 1]
+
+    def shifted(self, days: int) -> "_Recurrence":
+        """The recurrence moved ``days`` earlier: it occurs on d when this one occurs on d + days."""
+        moved = copy.copy(self)
+        moved.start, moved.end = self.start - days, self.end - days
+        if self.residues:
+            moved.residues = tuple(sorted({(r - days) % self.modulus for r in self.residues}))
+        if self.dates is not None:
+            moved.dates = self.dates - days
+        moved._monthday_offset = self._monthday_offset + days
+        moved._days = None
+        return moved
+
+    def _weekly(self, isoweekdays) -> None:
+        # Day 0 (1970-01-01) was a Thursday, ISO weekday 4.
+        self.modulus, self.residues = 7, tuple(sorted({(v - 4) % 7 for v in isoweekdays}))
+
+    def mask(self, days: np.ndarray) -> np.ndarray:
+        """Whether the task occurs on each of ``days`` (day numbers), ignoring its date range."""
+        # Lookup tables rather than np.isin: this runs once per candidate pair.
+        if self.dates is not None:
+            if not len(self.dates):
+                return np.zeros(len(days), dtype=bool)
+            found = self.dates[np.minimum(np.searchsorted(self.dates, days), len(self.dates) - 1)]
+            return found == days
+        if self.monthdays is not None:
+            dates = (days + self._monthday_offset).astype("datetime64[D]")
+            months = dates.astype("datetime64[M]")
+            monthday = (dates - months.astype("datetime64[D]")).astype(np.int64) + 1
+            length = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(np.int64)
+            listed = np.zeros(32, dtype=bool)
+            listed[list(self.monthdays)] = True
+            # A day past the end of a short month falls on its last day, as in occurrence_expander.
+            clamped = (monthday == length) & (max(self.monthdays, default=0) > length)
+            return listed[monthday] | clamped
+        listed = np.zeros(max(self.modulus, 1), dtype=bool)
+        listed[list(self.residues)] = True
+        return listed[days % max(self.modulus, 1)]
+
+def _crt(r1: int, m1: int, r2: int, m2: int) -> Optional[Tuple[int, int]]:
+    """The residue class satisfying x = r1 (mod m1) and x = r2 (mod m2), or None."""
+    g = gcd(m1, m2)
+    if (r2 - r1) % g:
+        return None
+    lcm = m1 // g * m2
+    # Solve m1 * k = r2 - r1 (mod m2) for k.
+    k = (r2 - r1) // g * pow(m1 // g, -1, m2 // g) % (m2 // g) if m2 // g > 1 else 0
+    return (r1 + m1 * k) % lcm, lcm
+
+def _shared_days(a: _Recurrence, b: _Recurrence) -> Tuple[Optional[int], int]:
+    """First common day number and number of common days of two recurrences."""
+    lo, hi = max(a.start, b.start), min(a.end, b.end)
+    if lo > hi:
+        return None, 0
+    if a.residues and b.residues:
+        first, count = None, 0
+        for r1 in a.residues:
+            for r2 in b.residues:
+                solved = _crt(r1, a.modulus, r2, b.modulus)
+                if solved is None:
+                    continue
+                residue, modulus = solved
+                day = lo + (residue - lo) % modulus
+                if day <= hi:
+                    first = day if first is None else min(first, day)
+                    count += (hi - day) // modulus + 1
+        return first, count
+    # Monthday and dated schedules: intersect the day masks over the overlap.
+    shared = a.between(lo, hi) & b.between(lo, hi)
+    count = int(np.count_nonzero(shared))
+    return (lo + int(np.argmax(shared)) if count else None), count
+
+def _slot_pairs(minutes: List[Tuple[int, int]], width: int) -> List[Tuple[int, int, Optional[int]]]:
+    """Pairs of tasks starting less than ``width`` minutes apart, wrapping around midnight.
+
+    The third item is None for a pair on the same day; for a pair across
+    midnight (23:50 and 00:10) it is the task whose start is on the next day.
+    """
+    ordered = [(minute, index, False) for minute, index in sorted(minutes)]
+    ordered += [(minute + _DAY_MINUTES, index, True) for minute, index, _ in ordered if minute < width]
+    pairs = set()
+    for position, (minute, index, wrapped) in enumerate(ordered):
+        if wrapped:
+            # Both on the next day: the same pair as on the first one.
+            break
+        for later, other, next_day in ordered[position + 1:]:
+            if later - minute >= width:
+                break
+            if other != index:
+                pairs.add((min(index, other), max(index, other), other if next_day else None))
+    return sorted(pairs, key=lambda pair: (pair[0], pair[1], pair[2] is not None))
+
+def find_conflicts(tasks: Tasks, slot_minutes: int = CONFLICT_SLOT_MINUTES) -> List[TaskConflict]:
+    """Pairs of tasks that overlap in time of day on at least one shared date.
+
+    Candidate pairs come from a sweep over start times, so only tasks within
+    ``slot_minutes`` of each other are compared. Their schedules are then
+    intersected analytically where possible (weekday sets and periods as
+    residue classes combined with the Chinese remainder theorem) instead of
+    expanding every day. Tasks with unparseable dates or times are skipped.
+    """
+    recurrences, minutes = {}, []
+    for index, task in enumerate(tasks.tasks):
+        time_in_day = normalize_time(task.time_in_day)
+        try:
+            recurrence = _Recurrence(task)
+        except ValueError:
+            continue
+        if time_in_day is None:
+            continue
+        hours, mins = time_in_day.split(":")
+        recurrences[index] = recurrence
+        minutes.append((int(hours) * 60 + int(mins), index))
+
+    conflicts = []
+    for i, j, next_day in _slot_pairs(minutes, slot_minutes):
+        a, b = recurrences[i], recurrences[j]
+        # Across midnight the next-day task's day d + 1 meets the other's day d.
+        if next_day == i:
+            a = a.shifted(1)
+        elif next_day == j:
+            b = b.shifted(1)
+        first, count = _shared_days(a, b)
+        if first is None:
+            continue
+        conflicts.append(TaskConflict(
+            task_indexes=[i, j],
+            task_names=[tasks.tasks[i].task_name, tasks.tasks[j].task_name],
+            times_in_day=[tasks.tasks[i].time_in_day, tasks.tasks[j].time_in_day],
+            first_date=str(np.datetime64(first, "D")),
+            shared_days=count,
+        ))
+    return conflicts
@@ -0,0 +1,322 @@
+from pydantic import BaseModel, Field, ValidationError
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from collections import Counter
+from datetime import date
+from langchain_core.messages import SystemMessage, HumanMessage
+from llm_clients import get_clients
+from scheduler import get_scheduler, estimate_tokens
+from model_router import get_router
+from time_series_tasks_generator import Tasks, TimeSeriesTask, RepeatType
+from further_info_analyzer import FurtherInfoResponse
+import asyncio
+import json
+import re
+
+# The further-info prompt asks for between 1 and 8 questions.
+MAX_INFO_NEEDED = 8
+
+_DATE = re.compile(r"^\s*(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?:[T ][\d:.+\-Z]*)?\s*$")
+_TIME = re.compile(r"^(\d{1,2})(?:[:.h](\d{2}))?(?::\d{2})?\s*(?:([ap])\.?\s*m\.?)?$", re.IGNORECASE)
+_TIME_RANGE = re.compile(r"\s*(?:-|–|~|\bto\b)\s*", re.IGNORECASE)
+_TIME_WORDS = {
+    "morning": "08:00",
+    "noon": "12:00",
+    "midday": "12:00",
+    "afternoon": "15:00",
+    "evening": "19:00",
+    "night": "21:00",
+}
+
+# Which repeat type each schedule member implies; "Everyday" has no schedule member of its own.
+_SCHEDULE_REPEAT = {
+    "specific": RepeatType.SPECIFIC,
+    "on_workday": RepeatType.ON_WORKDAY,
+    "on_weekend": RepeatType.ON_WEEKEND,
+    "on_weekday": RepeatType.ON_WEEKDAY,
+    "on_monthday": RepeatType.ON_MONTHDAY,
+    "periodic": RepeatType.PERIODIC,
+}
+
+class ValidationReport(BaseModel):
+    repaired: int = Field(default=0, description="Items fixed locally without another model call")
+    regenerated: int = Field(default=0, description="Tasks that could not be fixed locally and were regenerated")
+    dropped: int = Field(default=0, description="Items removed because they were duplicates or still invalid after regeneration")
+    problems: List[str] = Field(default_factory=list, description="What was found, one entry per problem")
+
+    def include(self, other: "ValidationReport") -> None:
+        """Add the counts and problems of ``other``, e.g. of one plan section."""
+        self.repaired += other.repaired
+        self.regenerated += other.regenerated
+        self.dropped += other.dropped
+        self.problems.extend(other.problems)
+
+_totals: Counter = Counter()
+
+def validation_stats() -> Dict[str, int]:
+    """Process-wide totals of repaired, regenerated and dropped items."""
+    return {key: _totals[key] for key in ("validated", "repaired", "regenerated", "dropped")}
+
+def _record(report: ValidationReport, validated: int) -> ValidationReport:
+    _totals.update(validated=validated, repaired=report.repaired, regenerated=report.regenerated, dropped=report.dropped)
+    return report
+
+# ---------- Field repairs ----------
+def normalize_date(value: str) -> Optional[str]:
+    """Return ``value`` as YYYY-MM-DD, or None if it is not a real calendar date."""
+    match = _DATE.match(value or "")
+    if not match:
+        return None
+    try:
+        return date(*(int(part) for part in match.groups())).isoformat()
+    except ValueError:
+        return None
+
+def normalize_time(value: str) -> Optional[str]:
+    """Return ``value`` as HH:MM ("7pm", "19h30", "07:00-08:00" and "morning" are accepted), or None."""
+    text = (value or "").strip().lower()
+    if text in _TIME_WORDS:
+        return _TIME_WORDS[text]
+    match = _TIME.match(_TIME_RANGE.split(text, maxsplit=1)[0])
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    meridiem = (match.group(3) or "").lower()
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+def _days(values: List[int], low: int, high: int) -> List[int]:
+    return sorted({v for v in values if low <= v <= high})
+
+def _repair_schedule(schedule: dict, fixes: List[str], problems: List[str]) -> dict:
+    kind, values = next(iter(schedule.items())) if len(schedule) == 1 else (None, None)
+    if kind == "on_workday":
+        if any(v in (6, 7) for v in values) and all(1 <= v <= 7 for v in values):
+            # Saturday/Sunday in a workday list: the model meant the full-week convention.
+            fixes.append("on_workday contained weekend days; converted to on_weekday")
+            return {"on_weekday": _days(values, 1, 7)}
+        kept = _days(values, 1, 5)
+    elif kind == "on_weekend":
+        # 6/7 are Saturday/Sunday in the weekday numbering; 1/2 in the weekend one.
+        kept = sorted({v - 5 if v in (6, 7) else v for v in values if 1 <= v <= 2 or v in (6, 7)})
+    elif kind == "on_weekday":
+        # Some models number Sunday 0.
+        kept = _days([7 if v == 0 else v for v in values], 1, 7)
+    elif kind == "on_monthday":
+        kept = _days(values, 1, 31)
+    elif kind == "specific":
+        dates = {normalize_date(item.get("date", "")) for item in values}
+        dates.discard(None)
+        kept = [{"date": d} for d in sorted(dates)]
+        if kept != values:
+            fixes.append("specific dates normalized, sorted and deduplicated")
+        if not kept:
+            problems.append("schedule.specific has no valid date")
+        return {"specific": kept}
+    elif kind == "periodic":
+        if values < 1:
+            problems.append(f"schedule.periodic must be at least 1 day, got {values}")
+        return schedule
+    else:
+        problems.append("schedule must have exactly one of " + ", ".join(_SCHEDULE_REPEAT))
+        return schedule
+
+    if kept != values:
+        fixes.append(f"{kind} values {values} corrected to {kept}")
+    if not kept:
+        problems.append(f"{kind} has no valid day")
+    return {kind: kept}
+
+def _repair_duration(duration: dict, fixes: List[str], problems: List[str]) -> dict:
+    if "date" in duration:
+        fixed = normalize_date(duration["date"])
+        if fixed is None:
+            problems.append(f"date {duration['date']!r} is not a YYYY-MM-DD date")
+            return duration
+        if fixed != duration["date"]:
+            fixes.append(f"date {duration['date']!r} normalized")
+        return {"date": fixed}
+
+    start, end = normalize_date(duration["start_date"]), normalize_date(duration["end_date"])
+    if start is None or end is None:
+        problems.append(f"start_date/end_date {duration['start_date']!r}/{duration['end_date']!r} are not YYYY-MM-DD dates")
+        return duration
+    if (start, end) != (duration["start_date"], duration["end_date"]):
+        fixes.append("start_date/end_date normalized")
+    if end < start:
+        fixes.append("end_date was before start_date; swapped")
+        start, end = end, start
+
+    schedule = _repair_schedule(duration["schedule"], fixes, problems)
+    repeat = duration["repeat"]
+    implied = _SCHEDULE_REPEAT.get(next(iter(schedule), None))
+    # An "Everyday" repeat ignores its schedule, so there is nothing to reconcile.
+    if implied and repeat != RepeatType.EVERYDAY.value and repeat != implied.value:
+        fixes.append(f"repeat {repeat!r} did not match the {next(iter(schedule))} schedule; set to {implied.value!r}")
+        repeat = implied.value
+    return {**duration, "start_date": start, "end_date": end, "repeat": repeat, "schedule": schedule}
+
+# ---------- Model repairs ----------
+def repair_task(task: TimeSeriesTask) -> Tuple[TimeSeriesTask, List[str], List[str]]:
+    """Fix what can be fixed deterministically.
+
+    Returns the (possibly) repaired task, the fixes applied and the problems
+    that remain; a task with remaining problems needs regenerating.
+    """
+    data = task.model_dump(mode="json")
+    fixes: List[str] = []
+    problems: List[str] = []
+
+    if not data["task_name"].strip():
+        problems.append("task_name is empty")
+    elif data["task_name"] != data["task_name"].strip():
+        fixes.append("task_name whitespace trimmed")
+        data["task_name"] = data["task_name"].strip()
+
+    time_in_day = normalize_time(data["time_in_day"])
+    if time_in_day is None:
+        problems.append(f"time_in_day {data['time_in_day']!r} is not an HH:MM time")
+    elif time_in_day != data["time_in_day"]:
+        fixes.append(f"time_in_day {data['time_in_day']!r} normalized to {time_in_day}")
+        data["time_in_day"] = time_in_day
+
+    data["task_duration"] = _repair_duration(data["task_duration"], fixes, problems)
+
+    quantization = data["quantization"]
+    if quantization and quantization["goal"] < quantization["progress_start"]:
+        fixes.append("quantization goal was below progress_start; swapped")
+        data["quantization"] = {"progress_start": quantization["goal"], "goal": quantization["progress_start"]}
+
+    if not fixes:
+        return task, fixes, problems
+    try:
+        return TimeSeriesTask.model_validate(data), fixes, problems
+    except ValidationError as e:
+        return task, [], problems + [f"repair produced an invalid task: {e.error_count()} errors"]
+
+def repair_further_info(response: FurtherInfoResponse) -> Tuple[FurtherInfoResponse, ValidationReport]:
+    """Drop empty and repeated questions, keep at most MAX_INFO_NEEDED and make ``flag`` agree with the list."""
+    report = ValidationReport()
+    seen = set()
+    kept = []
+    for info in response.info_needed:
+        keyword = info.keyword.strip()
+        identity = keyword.casefold()
+        if not keyword or identity in seen:
+            report.dropped += 1
+            report.problems.append(f"info_needed entry {info.keyword!r} is empty or repeated")
+            continue
+        seen.add(identity)
+        if keyword != info.keyword:
+            report.repaired += 1
+            info = info.model_copy(update={"keyword": keyword})
+        kept.append(info)
+    if len(kept) > MAX_INFO_NEEDED:
+        report.dropped += len(kept) - MAX_INFO_NEEDED
+        report.problems.append(f"{len(kept)} questions asked; kept the first {MAX_INFO_NEEDED}")
+        kept = kept[:MAX_INFO_NEEDED]
+    flag = bool(kept)
+    if flag != response.flag:
+        report.repaired += 1
+        report.problems.append(f"flag was {response.flag} with {len(kept)} questions")
+    _record(report, len(response.info_needed))
+    if report.repaired or report.dropped:
+        return FurtherInfoResponse(flag=flag, info_needed=kept), report
+    return response, report
+
+# ---------- Targeted regeneration ----------
+def _build_regeneration_messages(user_goal: str, further_info: dict, final_plan: str,
+                                 task: TimeSeriesTask, problems: List[str]) -> list:
+    system_prompt = (
+        "You are a helpful assistant that fixes one task of a time series tasks list generated from the final plan."
+        "Return the corrected task only, keeping its name and intent, and fix every listed problem."
+        "*Dates are in YYYY-MM-DD format and time_in_day is in HH:MM format."
+        "*The repeat type must match the schedule, and the end date must not be before the start date."
+    )
+    user_prompt = (
+        "The user's goal:"
+        f"{user_goal}"
+        "The further information:"
+        f"{json.dumps(further_info)}"
+        "The final plan:"
+        f"{final_plan}"
+        "The task to fix:"
+        f"{task.model_dump_json()}"
+        "The problems:"
+        f"{'; '.join(problems)}"
+    )
+    return [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=user_prompt)
+    ]
+
+async def aregenerate_task(user_goal: str, further_info: dict, final_plan: str,
+                           task: TimeSeriesTask, problems: List[str]) -> TimeSeriesTask:
+    """Ask the model again for a single task, with the problems that need fixing."""
+    messages = _build_regeneration_messages(user_goal, further_info, final_plan, task, problems)
+
+    async def call(model_name: str) -> TimeSeriesTask:
+        model = get_clients().structured(model_name, TimeSeriesTask)
+        return await get_scheduler().run(
+            model_name, "task_repair", estimate_tokens(messages, "task_repair"), lambda: model.ainvoke(messages)
+        )
+
+    regenerated, _ = await get_router().run("task_repair", call)
+    return regenerated
+
+async def avalidate_tasks(tasks: Tasks, user_goal: str, further_info: dict, final_plan: str,
+                          regenerate: Optional[Callable[..., Awaitable[TimeSeriesTask]]] = None) -> Tuple[Tasks, ValidationReport]:
+    """Repair ``tasks`` locally and regenerate only the tasks that cannot be repaired.
+
+    A regenerated task that is still invalid after its own repair pass is
+    dropped rather than failing the whole list. ``tasks_name`` is rebuilt from
+    the surviving tasks.
+    """
+    regenerate = regenerate or aregenerate_task
+    report = ValidationReport()
+    results: List[Optional[TimeSeriesTask]] = []
+    broken: List[Tuple[int, TimeSeriesTask, List[str]]] = []
+    for index, task in enumerate(tasks.tasks):
+        repaired, fixes, problems = repair_task(task)
+        if problems:
+            broken.append((index, repaired, problems))
+            report.problems.extend(f"{task.task_name}: {p}" for p in problems)
+        elif fixes:
+            report.repaired += 1
+            report.problems.extend(f"{task.task_name}: {f}" for f in fixes)
+        results.append(repaired)
+
+    async def fix(index: int, task: TimeSeriesTask, problems: List[str]) -> None:
+        try:
+            fresh = await regenerate(user_goal, further_info, final_plan, task, problems)
+        except ValueError:
+            fresh = None
+        if fresh is not None:
+            fresh, _, remaining = repair_task(fresh)
+            if not remaining:
+                report.regenerated += 1
+                results[index] = fresh
+                return
+        report.dropped += 1
+        results[index] = None
+
+    fixes = [asyncio.create_task(fix(*item)) for item in broken]
+    try:
+        await asyncio.gather(*fixes)
+    except BaseException:
+        # Anything but a bad answer (saturation, upstream error, deadline) fails the whole list,
+        # so the other regenerations are not worth their tokens.
+        for task in fixes:
+            task.cancel()
+        await asyncio.gather(*fixes, return_exceptions=True)
+        raise
+    kept = [task for task in results if task is not None]
+    names = [task.task_name for task in kept]
+    if names != tasks.tasks_name:
+        report.problems.append("tasks_name rebuilt to match the tasks")
+    _record(report, len(tasks.tasks))
+    return Tasks(tasks_name=names, tasks=kept), report
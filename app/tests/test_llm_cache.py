@@ -0,0 +1,36 @@
+import asyncio
+import threading
+import time
+
+from llm_cache import MemoryLRUCache, ResponseCache, SQLiteCache
+
+
+def test_disk_tier_does_not_block_the_event_loop(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    cache = ResponseCache([MemoryLRUCache(), disk], ttl=60)
+    disk.set("key", {"answer": 42}, 60)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        running = asyncio.create_task(ticker())
+        # Another worker's transaction, as far as this process is concerned.
+        disk._lock.acquire()
+        threading.Timer(0.2, disk._lock.release).start()
+        started = time.perf_counter()
+        value = await cache.alookup("key")
+        running.cancel()
+        return value, time.perf_counter() - started, ticks
+
+    value, elapsed, ticks = asyncio.run(scenario())
+    assert value == {"answer": 42} and elapsed >= 0.2
+    assert ticks >= 5
+    # Promoted to the memory tier, which answers inline from now on.
+    assert cache.tiers[0].get("key") == {"answer": 42}
+    disk.close()
@@ -0,0 +1,28 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from metrics import MetricsMiddleware
+
+
+def _client(default: bool) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, server_timing=default)
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("default, header, expected", [
+    (False, None, False),
+    (False, "1", True),
+    (True, None, True),
+    (True, "0", False),
+])
+def test_server_timing_is_chosen_per_request(default, header, expected):
+    headers = {"X-Server-Timing": header} if header else {}
+    response = _client(default).get("/ping", headers=headers)
+    assert ("server-timing" in response.headers) is expected
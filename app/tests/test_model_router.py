@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+from model_router import ModelRouter
+
+
+def _router(hedge: bool) -> ModelRouter:
+    router = ModelRouter(tiers={"default": ["primary", "spare"]}, hedge=hedge, min_samples=5)
+    for _ in range(5):
+        router.record("primary", "stage", 0.02)
+    return router
+
+
+async def _call(model: str) -> str:
+    if model == "primary":
+        await asyncio.sleep(0.05)
+        raise RuntimeError("primary failed")
+    await asyncio.sleep(0.06)
+    return model
+
+
+@pytest.mark.parametrize("hedge, event", [(True, "hedge_won"), (False, "fallback_won")])
+def test_win_is_labelled_by_how_the_winner_was_started(hedge, event):
+    router = _router(hedge)
+    result, model = asyncio.run(router.run("stage", _call))
+    assert (result, model) == ("spare", "spare")
+    assert router.counts[("stage", event)] == 1
+    assert router.counts[("stage", "hedge_won")] + router.counts[("stage", "fallback_won")] == 1
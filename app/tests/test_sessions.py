@@ -0,0 +1,41 @@
+import pytest
+
+from plan_store import MemoryPlanStore, UnknownSession
+
+
+def test_update_creates_a_session_only_without_an_id():
+    store = MemoryPlanStore()
+    created = store.update(None, goal="Learn Spanish")
+    assert store.update(created["_id"], plan="Daily lessons")["goal"] == "Learn Spanish"
+    with pytest.raises(UnknownSession):
+        store.update("chosen-by-the-client", goal="Learn Spanish")
+    assert store.get("chosen-by-the-client") is None
+
+
+@pytest.mark.parametrize("path", ["/get-final-plan/", "/get-final-plan/stream"])
+def test_final_plan_with_unknown_session_is_404(monkeypatch, path):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    from fastapi.testclient import TestClient
+    import main
+    from plan_store import set_plan_store
+
+    set_plan_store(MemoryPlanStore())
+    try:
+        response = TestClient(main.app).post(path, json={"goal": "Learn Spanish", "info_needed": [], "session_id": "nope"})
+        assert response.status_code == 404
+    finally:
+        set_plan_store(None)
+
+
+def test_sqlite_write_through_is_visible_to_another_worker(tmp_path):
+    from plan_store import SQLitePlanStore
+
+    path = str(tmp_path / "plans.sqlite3")
+    first, second = SQLitePlanStore(path, flush_seconds=0), SQLitePlanStore(path, flush_seconds=0)
+    try:
+        session = first.update(None, goal="Learn Spanish")
+        assert second.get(session["_id"])["goal"] == "Learn Spanish"
+        assert first.delete(session["_id"]) and second.get(session["_id"]) is None
+    finally:
+        first.close()
+        second.close()
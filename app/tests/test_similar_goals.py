@@ -0,0 +1,48 @@
+import pytest
+
+from similar_goals import SimilarGoalIndex
+
+PLAN = ("Practice every day for 45 minutes, follow a structured course with weekly reviews, track progress in a "
+        "journal, join a community group for accountability, and schedule a monthly checkpoint to adjust the "
+        "routine based on results.")
+
+
+def _index(goal: str) -> SimilarGoalIndex:
+    index = SimilarGoalIndex(path=None)
+    index.add(f"{goal}\n{PLAN}", {"goal": goal}, goal=goal)
+    return index
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("Gain weight and build muscle in 3 months", "Lose weight and build muscle in 3 months"),
+    ("I want to learn Swedish in 6 months", "I want to learn Spanish in 6 months"),
+    ("I want to learn Spanish in 6 months", "I do NOT want to learn Spanish in 6 months"),
+])
+def test_different_goal_with_the_same_plan_is_not_reused(stored, asked):
+    index = _index(stored)
+    assert index.lookup(f"{asked}\n{PLAN}", goal=asked) is None
+
+
+def test_same_goal_with_reworded_plan_is_reused():
+    goal = "I want to learn Spanish in 6 months"
+    index = _index(goal)
+    reworded = PLAN.replace("every day", "daily").replace("a community group", "a local club")
+    similar = index.lookup(f"{goal.lower()}\n{reworded}", goal=goal.lower())
+    assert similar is not None and similar[1] == {"goal": goal}
+
+
+def test_persisted_index_does_no_sqlite_io_on_a_hit(tmp_path):
+    import asyncio
+
+    path = str(tmp_path / "similar.sqlite3")
+    goal = "I want to learn Spanish in 6 months"
+    index = SimilarGoalIndex(path=path)
+    asyncio.run(index.aadd(f"{goal}\n{PLAN}", {"goal": goal}, goal=goal))
+    # A hit while another worker holds the file must not wait for it.
+    with index._lock:
+        assert index.lookup(f"{goal}\n{PLAN}", goal=goal) is not None
+    index.close()
+
+    reloaded = SimilarGoalIndex(path=path)
+    assert reloaded.lookup(f"{goal}\n{PLAN}", goal=goal)[1] == {"goal": goal}
+    reloaded.close()
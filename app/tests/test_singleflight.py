@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import pytest
+
+from model_router import DeadlineExceeded, remaining, set_deadline
+from singleflight import SingleFlight
+
+
+async def _slow_call() -> str:
+    # The shared call must not see any caller's budget.
+    assert remaining() is None
+    await asyncio.sleep(0.3)
+    return "done"
+
+
+async def _caller(flight: SingleFlight, budget, delay: float = 0.0):
+    await asyncio.sleep(delay)
+    set_deadline(budget)
+    started = time.perf_counter()
+    try:
+        return await flight.do("same input", _slow_call), time.perf_counter() - started
+    except DeadlineExceeded:
+        return "deadline", time.perf_counter() - started
+
+
+@pytest.mark.parametrize("short_first", [True, False])
+def test_coalesced_callers_keep_their_own_budgets(short_first):
+    async def scenario():
+        flight = SingleFlight("test")
+        short = asyncio.create_task(_caller(flight, 0.1, delay=0 if short_first else 0.01))
+        long = asyncio.create_task(_caller(flight, None, delay=0.01 if short_first else 0))
+        results = await asyncio.gather(short, long)
+        return flight, results
+
+    flight, ((short_result, short_s), (long_result, long_s)) = asyncio.run(scenario())
+    assert flight.calls == 1 and flight.coalesced == 1
+    assert short_result == "deadline" and short_s < 0.2
+    assert long_result == "done"
+
+
+def test_shared_call_is_cancelled_when_every_waiter_gives_up():
+    async def scenario():
+        flight = SingleFlight("test")
+        cancelled = asyncio.Event()
+
+        async def call():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        set_deadline(0.05)
+        with pytest.raises(DeadlineExceeded):
+            await flight.do("key", call)
+        await asyncio.wait_for(cancelled.wait(), 0.5)
+
+    asyncio.run(scenario())
+
+
+def test_caller_after_the_last_waiter_gives_up_starts_a_new_call():
+    async def scenario():
+        flight = SingleFlight("test")
+        started = []
+
+        async def call():
+            started.append(len(started))
+            if started[-1] == 0:
+                await asyncio.sleep(1)
+            return started[-1]
+
+        set_deadline(0.05)
+        with pytest.raises(DeadlineExceeded):
+            await flight.do("key", call)
+        # The first task is cancelled but has not finished yet.
+        set_deadline(None)
+        assert await flight.do("key", call) == 1
+        assert flight.calls == 2 and flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,37 @@
+from task_conflicts import find_conflicts
+from time_series_tasks_generator import Tasks, TimeSeriesTask
+
+
+def _task(name: str, time_in_day: str, duration: dict) -> TimeSeriesTask:
+    return TimeSeriesTask.model_validate({
+        "task_name": name, "description": name, "time_in_day": time_in_day, "quantization": None, "notes": "",
+        "task_duration": duration,
+    })
+
+
+def _weekly(weekday: int) -> dict:
+    # January 2025: the 6th is a Monday.
+    return {"start_date": "2025-01-01", "end_date": "2025-01-31", "repeat": "On weekday",
+            "schedule": {"on_weekday": [weekday]}}
+
+
+def _conflicts(*tasks: TimeSeriesTask):
+    return find_conflicts(Tasks(tasks_name=[t.task_name for t in tasks], tasks=list(tasks)))
+
+
+def test_pair_across_midnight_meets_on_consecutive_days():
+    # Monday 23:50 runs into Tuesday 00:10.
+    conflicts = _conflicts(_task("Read", "23:50", _weekly(1)), _task("Stretch", "00:10", _weekly(2)))
+    assert [(c.task_indexes, c.first_date, c.shared_days) for c in conflicts] == [([0, 1], "2025-01-06", 4)]
+
+
+def test_pair_across_midnight_on_the_same_day_does_not_meet():
+    # Monday 00:10 is a day before Monday 23:50.
+    assert _conflicts(_task("Read", "23:50", _weekly(1)), _task("Stretch", "00:10", _weekly(1))) == []
+
+
+def test_pair_across_midnight_with_dates_and_monthdays():
+    monthly = {"start_date": "2025-01-01", "end_date": "2025-03-31", "repeat": "On monthday",
+               "schedule": {"on_monthday": [1]}}
+    conflicts = _conflicts(_task("Review", "00:10", monthly), _task("Pack", "23:50", {"date": "2025-01-31"}))
+    assert [(c.task_indexes, c.first_date, c.shared_days) for c in conflicts] == [([0, 1], "2025-01-31", 1)]
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from task_validation import avalidate_tasks
+from time_series_tasks_generator import Tasks, TimeSeriesTask
+
+
+def _broken_task() -> TimeSeriesTask:
+    # An empty name cannot be repaired locally, so the task goes to regeneration.
+    return TimeSeriesTask.model_validate({
+        "task_name": "", "description": "Run", "time_in_day": "07:00", "quantization": None, "notes": "",
+        "task_duration": {"date": "2025-01-01"},
+    })
+
+
+def test_failed_regeneration_cancels_the_others():
+    cancelled = []
+
+    async def regenerate(user_goal, further_info, final_plan, task, problems):
+        if not cancelled:
+            cancelled.append(False)
+            raise RuntimeError("upstream failed")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        tasks = Tasks(tasks_name=["", ""], tasks=[_broken_task(), _broken_task()])
+        with pytest.raises(RuntimeError):
+            await avalidate_tasks(tasks, "Run a marathon", {}, "", regenerate=regenerate)
+        # Checked before asyncio.run cancels whatever is left.
+        assert cancelled == [False, True]
+
+    asyncio.run(asyncio.wait_for(scenario(), 2))
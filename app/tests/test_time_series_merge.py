@@ -0,0 +1,42 @@
+from time_series_tasks_generator import Tasks, TimeSeriesTask, diff_tasks, merge_tasks
+
+
+def _task(name: str, start: str, end: str, time_in_day: str = "07:00") -> TimeSeriesTask:
+    return TimeSeriesTask.model_validate({
+        "task_name": name, "description": name, "time_in_day": time_in_day, "quantization": None, "notes": "",
+        "task_duration": {"start_date": start, "end_date": end, "repeat": "On weekday",
+                          "schedule": {"on_weekday": [7]}},
+    })
+
+
+def _tasks(*tasks: TimeSeriesTask) -> Tasks:
+    return Tasks(tasks_name=[task.task_name for task in tasks], tasks=list(tasks))
+
+
+def test_task_recurring_across_phases_is_kept():
+    phase_1 = _tasks(_task("Long run", "2025-01-01", "2025-02-28"))
+    phase_2 = _tasks(_task("Long run", "2025-03-01", "2025-04-30"))
+    merged = merge_tasks([phase_1, phase_2], ["Phase 1: January-February", "Phase 2: March-April"])
+    assert merged.tasks_name == ["Long run", "Long run (Phase 2: March-April)"]
+    assert [task.task_duration.start_date for task in merged.tasks] == ["2025-01-01", "2025-03-01"]
+
+
+def test_exact_repeat_is_dropped():
+    repeated = _task("Long run", "2025-01-01", "2025-02-28")
+    merged = merge_tasks([_tasks(repeated), _tasks(repeated.model_copy(update={"task_name": "long run"}))])
+    assert merged.tasks_name == ["Long run"]
+
+
+def test_diff_matches_recurring_tasks_by_schedule():
+    previous = _tasks(_task("Long run", "2025-01-01", "2025-02-28"), _task("Long run", "2025-03-01", "2025-04-30"))
+    moved = _task("Long run", "2025-03-01", "2025-04-30", time_in_day="08:00")
+    added, updated, removed = diff_tasks(previous, _tasks(previous.tasks[0], moved, _task("Race", "2025-05-01", "2025-05-01")))
+    assert [task.task_name for task in added] == ["Race"]
+    assert updated == [moved]
+    assert removed == []
+
+
+def test_diff_reports_removed_phase():
+    previous = _tasks(_task("Long run", "2025-01-01", "2025-02-28"), _task("Long run", "2025-03-01", "2025-04-30"))
+    added, updated, removed = diff_tasks(previous, _tasks(previous.tasks[1]))
+    assert (added, updated, removed) == ([], [], ["Long run"])
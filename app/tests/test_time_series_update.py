@@ -0,0 +1,46 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import time_series_tasks_generator
+from plan_store import MemoryPlanStore, set_plan_store
+from time_series_tasks_generator import Tasks, TimeSeriesTask
+
+PLAN = "# Plan\n## Phase 1\n- Easy runs\n## Phase 2\n- Long runs\n"
+
+
+@pytest.fixture
+def generated(monkeypatch):
+    """Sections generated so far; each gets one task whose time needs a local repair."""
+    calls = []
+
+    async def generate(user_goal, user_plan, further_info, overview, section):
+        calls.append(section.heading)
+        task = TimeSeriesTask.model_validate({
+            "task_name": f"Run {len(calls)}", "description": "Run", "time_in_day": "7am", "quantization": None,
+            "notes": "", "task_duration": {"date": "2025-01-01"},
+        })
+        return Tasks(tasks_name=[task.task_name], tasks=[task])
+
+    monkeypatch.setattr(time_series_tasks_generator, "_agenerate_section", generate)
+    set_plan_store(MemoryPlanStore())
+    yield calls
+    set_plan_store(None)
+
+
+def test_update_validates_only_regenerated_sections(generated):
+    client = TestClient(main.app)
+    body = {"user_goal": "Run a marathon", "final_plan": PLAN, "further_info": {}, "chunked": True}
+    first = client.post("/get-time-series/", json=body)
+    assert first.status_code == 200 and first.headers["x-validation-repaired"] == "2"
+    session_id = first.headers["x-session-id"]
+
+    unchanged = client.post("/update-time-series/", json={"session_id": session_id, "final_plan": PLAN})
+    assert unchanged.headers["x-validation-repaired"] == "0"
+    assert unchanged.json()["added"] == unchanged.json()["updated"] == unchanged.json()["removed"] == []
+
+    edited = client.post("/update-time-series/", json={"session_id": session_id,
+                                                      "final_plan": PLAN.replace("Long runs", "Longer runs")})
+    assert edited.headers["x-validation-repaired"] == "1"
+    assert generated == ["Phase 1", "Phase 2", "Phase 2"]
+    assert [task["time_in_day"] for task in edited.json()["tasks"]["tasks"]] == ["07:00", "07:00"]
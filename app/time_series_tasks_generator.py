@@ -1,9 +1,20 @@
 from pydantic import BaseModel, Field
-from typing import Union
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from enum import Enum
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
+from langchain_core.messages import SystemMessage, HumanMessage
+from llm_clients import get_clients
+from scheduler import get_scheduler, estimate_tokens
+from model_router import get_router
+from plan_sections import PlanSection, split_plan_sections
+import asyncio
 import json
+import os
+import re
+
+# Maximum number of plan sections generated concurrently in chunked mode.
+TIME_SERIES_MAX_FANOUT = int(os.getenv("TIME_SERIES_MAX_FANOUT", "8"))
+# Characters of the plan overview repeated into every section prompt for context.
+TIME_SERIES_OVERVIEW_CHARS = int(os.getenv("TIME_SERIES_OVERVIEW_CHARS", "2000"))
 class Ymd(BaseModel):
     date: str = Field(
         description="The date of the task in YYYY-MM-DD format"
@@ -84,7 +95,7 @@ class Tasks(BaseModel):
     tasks_name: list[str] = Field(description="The name of the tasks")
     tasks: list[TimeSeriesTask] = Field(description="The list of tasks")
 
-def get_time_series_data_tool_call(user_goal: str, user_plan: str, further_info: dict, final_plan: str) -> dict:
+def _build_messages(user_goal: str, user_plan: str, further_info: dict, final_plan: str) -> list:
 
     system_prompt = (
         #"You are a helpful assistant that analyzes the final plan and generates the time series tasks list(due to the plan's content, generate 3-12 tasks)."
@@ -106,11 +117,211 @@ def get_time_series_data_tool_call(user_goal: str, user_plan: str, further_info:
         f"{final_plan}"
     )
 
-    messages = [
+    return [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=user_prompt)
+    ]
+
+def _structured_model(model_name: str = "gpt-4o"):
+    return get_clients().structured(model_name, Tasks)
+
+def get_time_series_data_tool_call(user_goal: str, user_plan: str, further_info: dict, final_plan: str) -> Tasks:
+    messages = _build_messages(user_goal, user_plan, further_info, final_plan)
+    return _structured_model().invoke(messages)
+
+async def aget_time_series_data_tool_call(user_goal: str, user_plan: str, further_info: dict, final_plan: str) -> Tasks:
+    messages = _build_messages(user_goal, user_plan, further_info, final_plan)
+
+    async def call(model_name: str) -> Tasks:
+        model = _structured_model(model_name)
+        return await get_scheduler().run(
+            model_name, "time_series", estimate_tokens(messages, "time_series"), lambda: model.ainvoke(messages)
+        )
+
+    tasks, _ = await get_router().run("time_series", call)
+    return tasks
+
+
+# ---------- Chunked generation: one structured call per plan section ----------
+
+def _build_section_messages(user_goal: str, user_plan: str, further_info: dict, overview: str, section: PlanSection) -> list:
+
+    system_prompt = (
+        "You are a helpful assistant that analyzes one section of the final plan and generates the time series tasks list for that section."
+        "Step1: Analyze the section that how many tasks it needs to be done, then put the task names into the tasks_name list."
+        "Step2: For each task, generate the details of the task, including the description, duration, time of the day, quantization, and notes."
+        "*Only create tasks for the content of this section; the other sections of the plan are handled separately."
+        "*Make sure the tasks are independent and not overlapping with each other and cover all the section's content."
+        "*The tasks should be in the order of the section's content."
+    )
+    further_info_str = json.dumps(further_info)
+    user_prompt = (
+        "The user's goal:"
+        f"{user_goal}"
+        "The user's plan:"
+        f"{user_plan}"
+        "The further information:"
+        f"{further_info_str}"
+        "The plan overview:"
+        f"{overview[:TIME_SERIES_OVERVIEW_CHARS]}"
+        "The section of the final plan:"
+        f"{section.content}"
+    )
+
+    return [
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_prompt)
     ]
-    model = ChatOpenAI(model_name="gpt-4o", temperature=1.0)
-    model = model.with_structured_output(Tasks)
-    response = model.invoke(messages)
-    return response.tasks
\ No newline at end of file
+
+async def _agenerate_section(user_goal: str, user_plan: str, further_info: dict, overview: str, section: PlanSection) -> Tasks:
+    messages = _build_section_messages(user_goal, user_plan, further_info, overview, section)
+
+    async def call(model_name: str) -> Tasks:
+        model = _structured_model(model_name)
+        return await get_scheduler().run(
+            model_name, "time_series_section", estimate_tokens(messages, "time_series_section"),
+            lambda: model.ainvoke(messages)
+        )
+
+    tasks, _ = await get_router().run("time_series_section", call)
+    return tasks
+
+async def agenerate_section_tasks(user_goal: str, user_plan: str, further_info: dict, overview: str,
+                                  sections: List[PlanSection], max_fanout: int = TIME_SERIES_MAX_FANOUT,
+                                  validate: Optional[Callable[[Tasks], Awaitable[Tasks]]] = None) -> List[Tasks]:
+    """Generate tasks for each section concurrently, at most ``max_fanout`` at a time.
+
+    A section whose output fails validation is retried once on its own, so one bad
+    field no longer throws away the tasks of every other section. ``validate``,
+    if given, is applied to each section's tasks as soon as they arrive.
+    """
+    semaphore = asyncio.Semaphore(max_fanout)
+
+    async def generate(section: PlanSection) -> Tasks:
+        async with semaphore:
+            try:
+                tasks = await _agenerate_section(user_goal, user_plan, further_info, overview, section)
+            except ValueError:
+                # pydantic's ValidationError is a ValueError; anything else is not worth a retry.
+                tasks = await _agenerate_section(user_goal, user_plan, further_info, overview, section)
+        return await validate(tasks) if validate is not None else tasks
+
+    return list(await asyncio.gather(*(generate(section) for section in sections)))
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def _name_key(name: str) -> str:
+    return _NON_WORD.sub(" ", name.casefold()).strip()
+
+def _task_identity(task: TimeSeriesTask) -> Tuple[str, str, str]:
+    """Name, schedule and time of day: a name alone recurs across phases ("Long run" in each)."""
+    return _name_key(task.task_name), task.task_duration.model_dump_json(), task.time_in_day.strip()
+
+def merge_tasks(parts: List[Tasks], headings: Optional[List[str]] = None) -> Tasks:
+    """Concatenate per-section results in plan order, dropping tasks repeated with the same schedule.
+
+    A name that comes back with a different schedule is a separate task (the
+    same exercise in a later phase); it is kept and named after its section's
+    heading so that task names stay unique.
+    """
+    seen = set()
+    names = set()
+    merged: List[TimeSeriesTask] = []
+    for index, part in enumerate(parts):
+        heading = (headings[index] if headings else "").strip() or f"part {index + 1}"
+        for task in part.tasks:
+            identity = _task_identity(task)
+            if identity in seen:
+                continue
+            seen.add(identity)
+            if _name_key(task.task_name) in names:
+                name = f"{task.task_name} ({heading})"
+                suffix = 2
+                while _name_key(name) in names:
+                    name = f"{task.task_name} ({heading}, {suffix})"
+                    suffix += 1
+                task = task.model_copy(update={"task_name": name})
+            names.add(_name_key(task.task_name))
+            merged.append(task)
+    return Tasks(tasks_name=[task.task_name for task in merged], tasks=merged)
+
+class SectionTasks(BaseModel):
+    key: str = Field(description="PlanSection.key of the section the tasks were generated from")
+    heading: str = Field(description="The heading of the section")
+    tasks: Tasks = Field(description="The tasks generated for the section, before merging")
+
+class TimeSeriesPatch(BaseModel):
+    added: List[TimeSeriesTask] = Field(description="Tasks that were not in the previous result")
+    updated: List[TimeSeriesTask] = Field(description="Tasks whose name was in the previous result but whose details changed")
+    removed: List[str] = Field(description="Names of previous tasks that are gone")
+    reused_sections: int = Field(description="Sections whose tasks were kept without a model call")
+    regenerated_sections: int = Field(description="Sections that were added or edited and generated again")
+    tasks: Tasks = Field(description="The full, updated task list")
+
+async def aget_time_series_sections(user_goal: str, user_plan: str, further_info: dict, final_plan: str,
+                                    previous: Optional[List[SectionTasks]] = None,
+                                    max_fanout: int = TIME_SERIES_MAX_FANOUT,
+                                    validate: Optional[Callable[[Tasks], Awaitable[Tasks]]] = None,
+                                    ) -> Tuple[List[SectionTasks], int]:
+    """Generate tasks per plan section, reusing ``previous`` results for sections whose text is unchanged.
+
+    Returns the sections in plan order and how many were reused. Sections of
+    ``previous`` that no longer exist are dropped. The overview is context for
+    every section, so an edit that only touches the overview regenerates nothing.
+    ``validate`` runs on generated sections only: reused ones were validated
+    when they were generated.
+    """
+    split = split_plan_sections(final_plan)
+    reusable: Dict[str, List[SectionTasks]] = {}
+    for part in previous or []:
+        reusable.setdefault(part.key, []).append(part)
+    results: List[Optional[SectionTasks]] = []
+    changed: List[PlanSection] = []
+    for section in split.sections:
+        matches = reusable.get(section.key)
+        if matches:
+            results.append(matches.pop(0).model_copy(update={"heading": section.heading}))
+        else:
+            results.append(None)
+            changed.append(section)
+
+    generated = iter(await agenerate_section_tasks(user_goal, user_plan, further_info, split.overview, changed,
+                                                   max_fanout, validate))
+    sections = [
+        result or SectionTasks(key=section.key, heading=section.heading, tasks=next(generated))
+        for section, result in zip(split.sections, results)
+    ]
+    return sections, len(split.sections) - len(changed)
+
+async def aget_time_series_data_chunked(user_goal: str, user_plan: str, further_info: dict, final_plan: str,
+                                        max_fanout: int = TIME_SERIES_MAX_FANOUT) -> Tasks:
+    """Chunked variant of aget_time_series_data_tool_call for long plans.
+
+    The plan is split by its headings and each section is generated separately,
+    so latency follows the longest section rather than the whole plan.
+    """
+    sections, _ = await aget_time_series_sections(user_goal, user_plan, further_info, final_plan, max_fanout=max_fanout)
+    return merge_tasks([section.tasks for section in sections], [section.heading for section in sections])
+
+def diff_tasks(previous: Tasks, current: Tasks) -> Tuple[List[TimeSeriesTask], List[TimeSeriesTask], List[str]]:
+    """Added, updated and removed tasks between two results.
+
+    Tasks are matched on name, schedule and time of day first; a task left over
+    after that is an update of a previous task with the same normalized name,
+    or else a new one.
+    """
+    unmatched = list(range(len(previous.tasks)))
+    matches: Dict[int, int] = {}
+    for key in (_task_identity, lambda task: _name_key(task.task_name)):
+        for index, task in enumerate(current.tasks):
+            if index in matches:
+                continue
+            old = next((i for i in unmatched if key(previous.tasks[i]) == key(task)), None)
+            if old is not None:
+                unmatched.remove(old)
+                matches[index] = old
+    added = [task for index, task in enumerate(current.tasks) if index not in matches]
+    updated = [task for index, task in enumerate(current.tasks)
+               if index in matches and previous.tasks[matches[index]] != task]
+    removed = [previous.tasks[i].task_name for i in unmatched]
+    return added, updated, removed
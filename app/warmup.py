@@ -0,0 +1,85 @@
+from dotenv import load_dotenv
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import os
+import time
+
+load_dotenv()
+# "background" serves right away and warms up in a thread, "blocking" warms up before the
+# server accepts connections, "off" leaves everything to the first request that needs it.
+# GET /ready answers 200 only once the warm-up has finished.
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background").lower()
+
+_state: Dict[str, Any] = {"ready": False, "error": None, "steps_ms": {}}
+
+
+def _steps() -> List[Tuple[str, Callable[[], None]]]:
+    # Imported here so that importing this module stays cheap.
+    from llm_clients import get_clients
+    from model_router import get_router
+    from further_info_analyzer import further_info_json_schema
+    from pre_moderation import get_pre_moderator
+    from time_series_tasks_generator import Tasks, TimeSeriesTask
+
+    router = get_router()
+    chat_models = sorted({model for tiers in router.tiers.values() for model in tiers} - {"moderation"})
+
+    def chat() -> None:
+        for model in chat_models:
+            get_clients().chat(model)
+
+    def structured_output() -> None:
+        for stage, schema in (("time_series", Tasks), ("time_series_section", Tasks), ("task_repair", TimeSeriesTask)):
+            for model in router.tiers_for(stage):
+                get_clients().structured(model, schema)
+        get_clients().structured("gpt-4o", further_info_json_schema)
+
+    return [
+        # The first chat model imports langchain_openai and the openai SDK resources, most of the cold start.
+        ("chat_models", chat),
+        ("moderation", lambda: get_clients().moderation()),
+        ("structured_output", structured_output),
+        ("pre_moderation", get_pre_moderator),
+    ]
+
+
+def warm_up() -> Dict[str, float]:
+    """Build the model clients, structured-output runnables and local checks; returns ms per step."""
+    for name, step in _steps():
+        started = time.perf_counter()
+        step()
+        _state["steps_ms"][name] = round((time.perf_counter() - started) * 1000, 1)
+    return _state["steps_ms"]
+
+
+async def _run() -> None:
+    started = time.perf_counter()
+    try:
+        # In a thread, so the event loop keeps answering /ready and early requests meanwhile.
+        await asyncio.to_thread(warm_up)
+    except Exception as e:
+        # Not ready: /ready reports the error, and requests hit it again when they get there.
+        _state["error"] = f"{type(e).__name__}: {e}"
+        return
+    _state["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _state["ready"] = True
+
+
+async def start_warm_up(mode: str = WARMUP_MODE) -> Optional[asyncio.Task]:
+    """Warm up according to ``mode``; returns the background task, if there is one."""
+    _state["mode"] = mode
+    if mode == "off":
+        _state["ready"] = True
+        return None
+    if mode == "blocking":
+        await _run()
+        return None
+    return asyncio.create_task(_run())
+
+
+def is_ready() -> bool:
+    return _state["ready"]
+
+
+def warmup_status() -> Dict[str, Any]:
+    return dict(_state, steps_ms=dict(_state["steps_ms"]))